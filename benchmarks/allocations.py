@@ -0,0 +1,39 @@
+# Checks that the SPI accessors allocate nothing per call, against a mock
+# SPIDevice that does no work of its own.
+#
+#   python -m benchmarks.allocations
+
+from cpc.cpc import *
+from benchmarks.bytes_api import NullSPIDevice, allocated
+
+
+def run():
+    radio = CC1101(None, None, None, 50000, 434400000, "666A", device=NullSPIDevice())
+    fifo = bytearray(64)
+
+    def transaction():
+        with radio.device:
+            pass
+
+    cases = (
+        ("writeSingleByte", lambda: radio.writeSingleByte(PKTLEN, 0x19)),
+        ("readSingleByte", lambda: radio.readSingleByte(MARCSTATE)),
+        ("strobe", lambda: radio.strobe(SNOP)),
+        ("readBurstInto", lambda: radio.readBurstInto(RXFIFO, fifo, 64)),
+        ("writeBurst", lambda: radio.writeBurst(TXFIFO, fifo)),
+    )
+    # CPython allocates the bound __exit__ method of every "with" block, which
+    # MicroPython/CircuitPython do not, so a bare transaction is the baseline
+    transaction()
+    baseline = allocated(transaction)
+    results = []
+    for name, fn in cases:
+        fn() # warm up
+        results.append((name, max(allocated(fn) for _ in range(3)) - baseline))
+    return results
+
+
+if __name__ == "__main__":
+    for name, nbytes in run():
+        print("%-16s %d bytes per call" % (name, nbytes))
+        assert nbytes == 0, "%s allocates per call" % name
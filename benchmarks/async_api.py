@@ -0,0 +1,83 @@
+# Event loop responsiveness while a transmit is in flight: a ticker task wants
+# to run every TICK seconds and records how late it gets, once next to the
+# blocking sendBytes() and once next to AsyncCC1101.sendBytesAsync(), on the
+# simulated chip.
+#
+#   python -m benchmarks.async_api
+
+import time
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from cpc.cpc import *
+from cpc.aio import AsyncCC1101
+from cpc.sim import SimCC1101
+
+TICK = 0.002
+SIZES = (62, 300)
+
+
+def newRadio():
+    chip = SimCC1101()
+    radio = AsyncCC1101(None, None, chip.gdo0, 50000, 434400000, "666A", device=chip.device)
+    return radio, chip
+
+
+async def ticker(lateness, stop):
+    expected = time.monotonic() + TICK
+    while not stop:
+        await asyncio.sleep(max(0, expected - time.monotonic()))
+        now = time.monotonic()
+        lateness.append(now - expected)
+        expected = max(expected + TICK, now)
+
+
+async def measure(send):
+    lateness = []
+    stop = []
+    task = asyncio.create_task(ticker(lateness, stop))
+    await asyncio.sleep(TICK * 3)
+    started = time.monotonic()
+    sent = await send()
+    elapsed = time.monotonic() - started
+    stop.append(True)
+    await task
+    return {
+        "sent": sent,
+        "seconds": elapsed,
+        "ticks": len(lateness),
+        "maxLateness": max(lateness),
+        "meanLateness": sum(lateness) / len(lateness),
+    }
+
+
+async def main():
+    results = []
+    for size in SIZES:
+        payload = bytes(range(256))[:size] if size <= 256 else bytes(size)
+        radio, chip = newRadio()
+        await radio.setupTXAsync()
+
+        async def blocking():
+            return radio.sendBytes(payload)
+
+        async def cooperative():
+            return await radio.sendBytesAsync(payload)
+
+        results.append(("sendBytes", size, await measure(blocking)))
+        results.append(("sendBytesAsync", size, await measure(cooperative)))
+    return results
+
+
+def run():
+    return asyncio.run(main())
+
+
+if __name__ == "__main__":
+    for name, size, result in run():
+        print("%-15s %3d bytes: %6.1f ms on air, %4d ticks, tick lateness max %7.2f ms mean %6.2f ms" % (
+            name, size, result["seconds"] * 1000, result["ticks"],
+            result["maxLateness"] * 1000, result["meanLateness"] * 1000))
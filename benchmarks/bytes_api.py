@@ -0,0 +1,109 @@
+# Memory allocated and time per 64 byte frame: the bitstring API (sendData /
+# receiveData) versus the bytes API (sendBytes / receiveInto). The driver runs
+# against a mock SPIDevice that does no work of its own, so only the driver's
+# allocations and time are counted, not a simulator's.
+#
+#   python -m benchmarks.bytes_api
+
+import gc
+import time
+
+from cpc.cpc import *
+
+try:
+    import tracemalloc
+except ImportError: # CircuitPython
+    tracemalloc = None
+
+ROUNDS = 20
+
+
+class TogglePin:
+    # GDO0 stand-in that changes level on every read, so each edge the driver
+    # waits for arrives immediately
+    def __init__(self):
+        self._value = False
+
+    @property
+    def value(self):
+        self._value = not self._value
+        return self._value
+
+
+class NullSPIDevice:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def write(self, buf, start=0, end=None):
+        pass
+
+    def readinto(self, buf, start=0, end=None, write_value=0):
+        pass
+
+    def write_readinto(self, buffer_out, buffer_in, out_start=0, out_end=None, in_start=0, in_end=None):
+        pass
+
+
+class IdleSPIDevice(NullSPIDevice):
+    # Register reads return 0: empty FIFOs, and with the status byte left
+    # at 0 the chip always reports IDLE
+    def readinto(self, buf, start=0, end=None, write_value=0):
+        buf[start] = 0
+
+
+def allocated(fn):
+    # Bytes allocated while fn() runs. CPython: peak traced memory,
+    # CircuitPython: heap used with the garbage collector off.
+    gc.collect()
+    if tracemalloc is None:
+        gc.disable()
+        before = gc.mem_free()
+        fn()
+        used = before - gc.mem_free()
+        gc.enable()
+        return used
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def timed(fn):
+    start = time.monotonic()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.monotonic() - start) / ROUNDS
+
+
+def run():
+    radio = CC1101(None, None, TogglePin(), 50000, 434400000, "666A", device=IdleSPIDevice())
+    radio.pollMinDelay = 0
+    payload = bytes(range(62))
+    bitstring = ''.join(["{0:0>8}".format(bin(x)[2:]) for x in payload])
+    rxbuf = bytearray(62)
+
+    cases = (
+        ("sendData", lambda: radio.sendData(bitstring, "666A")),
+        ("sendBytes", lambda: radio.sendBytes(payload)),
+        ("receiveData", lambda: radio.receiveData(62)),
+        ("receiveInto", lambda: radio.receiveInto(rxbuf)),
+    )
+    results = []
+    for name, fn in cases:
+        fn() # warm up
+        results.append((name, allocated(fn), timed(fn)))
+    return results
+
+
+if __name__ == "__main__":
+    results = {}
+    for name, nbytes, seconds in run():
+        results[name] = nbytes
+        print("%-12s %6d bytes allocated  %8.1f us per frame" % (name, nbytes, seconds * 1e6))
+    for bytesApi, bitstringApi in (("sendBytes", "sendData"), ("receiveInto", "receiveData")):
+        print("%-12s %5.1f%% of the allocations of %s" % (bytesApi, 100.0 * results[bytesApi] / results[bitstringApi], bitstringApi))
+        assert results[bytesApi] < results[bitstringApi], "%s allocates as much as %s" % (bytesApi, bitstringApi)
@@ -0,0 +1,92 @@
+# Burst capture: BURST packets sent back to back, each of which costs WORK
+# seconds to process (logging it to flash, say). A receiveInto() loop handles
+# every packet before it goes back to RX and misses the ones that started in
+# the meantime; capture() keeps the radio in RX, only files the packets into a
+# CaptureRing and the ring is drained after the burst. Simulated chip.
+# Then a burst in which one transmitter stalls in the middle of a packet:
+# capture() drops that packet and goes on with the next ones.
+#
+#   python -m benchmarks.capture
+
+import time
+
+from cpc.cpc import *
+from cpc.capture import CaptureRing, capture
+from cpc.sim import simulatedRadio
+
+LENGTH = 20
+BURST = 50
+WORK = 0.02
+
+
+def newRadio():
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    packet = (4 + 2 + LENGTH + 2) * 8 / radio.getSampleRate() # preamble, sync, payload, status
+    for i in range(BURST):
+        chip.inject(bytes([i]) * LENGTH, rssi=-40 - i % 40, delay=0.01 + i * packet)
+    return radio, chip
+
+
+def loopCapture():
+    radio, chip = newRadio()
+    buf = bytearray(LENGTH)
+    packets = []
+    started = time.monotonic()
+    while radio.receiveInto(buf, LENGTH, timeout=0.2) is not None:
+        packets.append(bytes(buf))
+        time.sleep(WORK)
+    return packets, time.monotonic() - started - 0.2 # minus the final timeout
+
+
+def ringCapture():
+    radio, chip = newRadio()
+    ring = CaptureRing(BURST, LENGTH)
+    started = time.monotonic()
+    capture(radio, ring, LENGTH, count=BURST, timeout=0.2)
+    elapsed = time.monotonic() - started
+    packets = []
+
+    def handle(index):
+        packets.append(bytes(ring.payload(index)))
+        time.sleep(WORK)
+
+    ring.drain(handle)
+    return packets, elapsed
+
+
+def stalledCapture():
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    packet = (4 + 2 + LENGTH + 2) * 8 / radio.getSampleRate()
+    chip.inject(bytes([0]) * LENGTH, delay=0.01)
+    chip.inject(bytes([1]) * (LENGTH // 2), delay=0.01 + packet).complete = False # never ends
+    for i in range(2, 5):
+        chip.inject(bytes([i]) * LENGTH, delay=0.01 + (i + 2) * packet)
+    ring = CaptureRing(8, LENGTH)
+    started = time.monotonic()
+    capture(radio, ring, LENGTH, count=4, timeout=0.2)
+    elapsed = time.monotonic() - started
+    packets = []
+    ring.drain(lambda index: packets.append(bytes(ring.payload(index))))
+    return packets, elapsed, ring.missed
+
+
+def run():
+    results = []
+    for name, fn in (("receiveInto", loopCapture), ("capture", ringCapture)):
+        packets, elapsed = fn()
+        intact = sum(1 for p in packets if p == bytes([p[0]]) * LENGTH)
+        results.append((name, {"captured": len(packets), "intact": intact, "seconds": elapsed}))
+    packets, elapsed, missed = stalledCapture()
+    intact = sum(1 for p in packets if p == bytes([p[0]]) * LENGTH)
+    results.append(("stalled", {"captured": len(packets), "intact": intact, "seconds": elapsed, "missed": missed}))
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run():
+        print("%-12s %3d/%d packets captured, %3d intact, %6.1f ms" % (
+            name, result["captured"], 4 if name == "stalled" else BURST, result["intact"], result["seconds"] * 1000))
+        if name == "stalled":
+            assert result["captured"] == result["intact"] == 4 and result["missed"] == 1, "capture() did not recover from a stalled packet"
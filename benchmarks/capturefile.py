@@ -0,0 +1,105 @@
+# Capture file throughput: write RECORDS records of LENGTH bytes with
+# CaptureWriter, then read them back with CaptureReader (memory-mapped on
+# CPython) and summarize them. Then replay a capture made with 2-FSK on
+# channel 3 from a radio set up with the OOK TX profile, and check that the
+# packets go out with the captured modulation, frequency and sync word.
+#
+#   python -m benchmarks.capturefile
+
+import os
+import tempfile
+import time
+
+from cpc.cpc import *
+from cpc.capturefile import CaptureReader, CaptureWriter, RECORD_SIZE, replay
+from cpc.sim import SimAir, simulatedRadio
+
+RECORDS = 200000
+LENGTH = 32
+
+
+def run():
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    payload = bytes(range(LENGTH))
+    fd, path = tempfile.mkstemp(suffix=".cpc")
+    os.close(fd)
+    try:
+        started = time.monotonic()
+        with open(path, "wb") as f:
+            writer = CaptureWriter(f, radio)
+            for i in range(RECORDS):
+                writer.write(payload, i * 0.01, -40 - i % 50, 30, i % 7 != 0, 0)
+        written = time.monotonic() - started
+        size = os.path.getsize(path)
+
+        reader = CaptureReader(path)
+        started = time.monotonic()
+        payloadBytes = 0
+        for timestamp, rssi, lqi, crcOk, freqEst, data in reader:
+            payloadBytes += len(data)
+        read = time.monotonic() - started
+        started = time.monotonic()
+        summary = reader.summary()
+        summarized = time.monotonic() - started
+        reader.close()
+    finally:
+        os.remove(path)
+    return {
+        "bytes": size,
+        "overhead": RECORD_SIZE,
+        "writeRecordsPerSecond": RECORDS / written,
+        "readRecordsPerSecond": RECORDS / read,
+        "readMBPerSecond": size / read / 1e6,
+        "summarySeconds": summarized,
+        "summary": summary,
+        "complete": payloadBytes == RECORDS * LENGTH,
+    }
+
+
+def replayed():
+    air = SimAir()
+    rx, rxChip = simulatedRadio(air=air)
+    rx.loadProfile("rx-2fsk")
+    rx.setRegister(CHANNR, 3)
+    rx.flush()
+    fd, path = tempfile.mkstemp(suffix=".cpc")
+    os.close(fd)
+    try:
+        with open(path, "wb") as f:
+            writer = CaptureWriter(f, rx)
+            for i in range(3):
+                writer.write(bytes([i]) * 8, i * 0.01)
+        tx, txChip = simulatedRadio(air=air)
+        tx.setupTX()
+        reader = CaptureReader(path)
+        sent = replay(tx, reader, realtime=False)
+        frequency = reader.frequency
+        reader.close()
+    finally:
+        os.remove(path)
+    frames = txChip.transmitted
+    return {
+        "sent": sent,
+        "frequency": frequency,
+        "onChannel": abs(frequency - rxChip.frequency()) < 1,
+        "sameAir": all(frame.frequency == txChip.frequency() == rxChip.frequency() for frame in frames),
+        "modulation": txChip.registers[MDMCFG2] == rxChip.registers[MDMCFG2] and txChip.registers[DEVIATN] == 0x15,
+        "syncWord": all(bytes(frame.data).endswith(rxChip.syncWord() + bytes([i]) * 8) for i, frame in enumerate(frames)),
+    }
+
+
+if __name__ == "__main__":
+    result = run()
+    print("%d records of %d bytes (+%d bytes metadata): %.1f MB" % (
+        RECORDS, LENGTH, result["overhead"], result["bytes"] / 1e6))
+    print("write   %9.0f records/s" % result["writeRecordsPerSecond"])
+    print("read    %9.0f records/s  %6.1f MB/s  complete: %s" % (
+        result["readRecordsPerSecond"], result["readMBPerSecond"], result["complete"]))
+    print("summary %9.2f s  %s" % (result["summarySeconds"], result["summary"]))
+    replayResult = replayed()
+    print("replay  %d packets at %.0f Hz, on the captured channel: %s, modulation: %s, sync word: %s" % (
+        replayResult["sent"], replayResult["frequency"], replayResult["onChannel"] and replayResult["sameAir"],
+        replayResult["modulation"], replayResult["syncWord"]))
+    assert replayResult["sent"] == 3 and replayResult["onChannel"] and replayResult["sameAir"], "replay missed the captured channel"
+    assert replayResult["modulation"] and replayResult["syncWord"], "replay did not keep the captured packet settings"
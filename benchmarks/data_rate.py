@@ -0,0 +1,56 @@
+# Data rate solver: the rate modemSettings() actually gets for a range of
+# requested rates, the cost of a first (solved) and a repeated (memoized) call,
+# and the SPI traffic of setSampleRate() on the simulated chip.
+#
+#   python -m benchmarks.data_rate
+
+import time
+
+from cpc.cpc import *
+from cpc.sim import simulatedRadio
+
+RATES = (600, 1200, 2400, 4800, 9600, 38400, 76800, 100000, 250000, 500000)
+CALLS = 1000
+
+
+def actual(settings, freq_xosc=26000000):
+    drate_e = settings[MDMCFG4] & 0x0F
+    return (256 + settings[MDMCFG3]) * pow(2, drate_e - 28) * freq_xosc
+
+
+def bandwidth(settings, freq_xosc=26000000):
+    chanbw = settings[MDMCFG4] >> 4
+    return freq_xosc / (8 * (4 + (chanbw & 0x03)) * pow(2, chanbw >> 2))
+
+
+def run():
+    results = []
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    for rate in RATES:
+        MODEM_SETTINGS.clear()
+        started = time.monotonic()
+        settings = modemSettings(rate)
+        solved = time.monotonic() - started
+        started = time.monotonic()
+        for _ in range(CALLS):
+            modemSettings(rate)
+        cached = (time.monotonic() - started) / CALLS
+        chip.device.resetCounters()
+        radio.setSampleRate(rate)
+        results.append((rate, {
+            "actual": actual(settings),
+            "bandwidth": bandwidth(settings),
+            "solved": solved,
+            "cached": cached,
+            "transactions": chip.device.transactions,
+            "bytes": chip.device.bytesOut,
+        }))
+    return results
+
+
+if __name__ == "__main__":
+    for rate, result in run():
+        print("%6d baud: %9.1f baud (%+.2f%%) filter %6.1f kHz  solve %6.1f us, memoized %5.2f us, %d transaction(s) / %d bytes" % (
+            rate, result["actual"], 100.0 * (result["actual"] - rate) / rate, result["bandwidth"] / 1000,
+            result["solved"] * 1e6, result["cached"] * 1e6, result["transactions"], result["bytes"]))
@@ -0,0 +1,79 @@
+# Channel hop latency: setFrequency() plus an autocalibrating SRX versus
+# ChannelPlan.hop() with cached calibrations, on the simulated chip. Reports
+# driver time and SPI traffic per hop and the time until the radio is in RX,
+# and checks that ChannelPlan.finish() brings autocalibration and the
+# frequency back.
+#
+#   python -m benchmarks.hopping
+
+import time
+
+from cpc.cpc import *
+from cpc.channels import ChannelPlan
+from cpc.sim import simulatedRadio
+
+FREQUENCIES = [433050000 + 100000 * i for i in range(16)]
+ROUNDS = 4
+
+
+def untilRx(radio):
+    while radio.readSingleByte(MARCSTATE) & 0x1F != MARCSTATE_RX:
+        pass
+
+
+def measure(hop, prepare=None, finish=None):
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    before = bytes(chip.registers[FREQ2:FREQ0 + 1]), chip.registers[MCSM0]
+    if prepare is not None:
+        prepare(radio) # not counted
+    hop(radio, 0)
+    untilRx(radio)
+    chip.device.resetCounters()
+    driver = 0.0
+    settled = 0.0
+    hops = 0
+    for _ in range(ROUNDS):
+        for channel in range(len(FREQUENCIES)):
+            started = time.monotonic()
+            hop(radio, channel)
+            driver += time.monotonic() - started
+            untilRx(radio)
+            settled += time.monotonic() - started
+            assert chip.locked(), "synthesizer not calibrated for channel %d" % channel
+            hops += 1
+    if finish is not None:
+        finish()
+    after = bytes(chip.registers[FREQ2:FREQ0 + 1]), chip.registers[MCSM0]
+    return {
+        "restored": after == before and MCSM0 not in radio.fixedBits,
+        "transactions": chip.device.transactions / hops,
+        "bytes": chip.device.bytesOut / hops,
+        "driver": driver / hops,
+        "untilRx": settled / hops,
+    }
+
+
+def run():
+    def autocal(radio, channel):
+        radio.strobe(SIDLE)
+        radio.setFrequency(FREQUENCIES[channel], 0)
+        radio.strobe(SRX)
+
+    plan = ChannelPlan(FREQUENCIES)
+    results = [
+        ("setFrequency", measure(autocal)),
+        ("ChannelPlan.hop", measure(plan.hop, plan.calibrateAll, plan.finish)),
+    ]
+    return results, plan.stats
+
+
+if __name__ == "__main__":
+    results, stats = run()
+    for name, result in results:
+        print("%-16s %4.1f transactions %5.1f bytes  driver %7.1f us  until RX %7.1f us" % (
+            name, result["transactions"], result["bytes"], result["driver"] * 1e6, result["untilRx"] * 1e6))
+        if name == "ChannelPlan.hop":
+            assert result["restored"], "ChannelPlan.finish() did not restore autocalibration and the frequency"
+    print("ChannelPlan stats: %d hops, %d calibrations, hop min %.1f us max %.1f us" % (
+        stats["hops"], stats["calibrations"], stats["minHop"] * 1e6, stats["maxHop"] * 1e6))
@@ -0,0 +1,60 @@
+# Logging cost: time per packet of sendData() and receiveData() with logging
+# off (the default), at LOG_DEBUG into a list, and at LOG_DEBUG to a console
+# that takes CONSOLE_LINE_TIME per line, roughly what a print over USB CDC
+# costs on a board. sendData() is timed from the call to its return,
+# receiveData() from the end of the packet on air to its return. Simulated chip.
+#
+#   python -m benchmarks.log_cost
+
+import time
+
+from cpc.cpc import *
+from cpc.sim import simulatedRadio
+
+PACKETS = 20
+LENGTH = 32
+DATA_RATE = 38400
+DELAY = 0.005 # from receiveData() to the start of the packet
+CONSOLE_LINE_TIME = 0.001 # assumed
+
+
+def console(line):
+    time.sleep(CONSOLE_LINE_TIME)
+
+
+def measure(level, output):
+    radio, chip = simulatedRadio(dataRate=DATA_RATE)
+    lines = []
+    radio.setLogLevel(level, lines.append if output is None else output)
+    bitstring = "01" * (LENGTH * 4)
+
+    radio.setupTX()
+    started = time.monotonic()
+    for _ in range(PACKETS):
+        radio.sendData(bitstring, "666A")
+    tx = (time.monotonic() - started) / PACKETS
+
+    radio.setupRX()
+    packet = radio.packetTime(4 + 2 + LENGTH) # preamble, sync word, payload
+    rx = 0.0
+    for _ in range(PACKETS):
+        chip.inject(bytes(LENGTH), delay=DELAY)
+        end = time.monotonic() + DELAY + packet
+        radio.receiveData(LENGTH, 0.1)
+        rx += time.monotonic() - end
+    return {"tx": tx, "rx": rx / PACKETS, "lines": len(lines), "txStats": radio.txStats, "rxStats": radio.rxStats}
+
+
+def run():
+    return [
+        ("off", measure(None, None)),
+        ("debug, list", measure(LOG_DEBUG, None)),
+        ("debug, console", measure(LOG_DEBUG, console)),
+    ]
+
+
+if __name__ == "__main__":
+    for name, result in run():
+        print("logging %-15s sendData %6.2f ms/packet, receiveData %6.2f ms after the packet, %3d lines, tx %s, rx %d packets" % (
+            name, result["tx"] * 1000, result["rx"] * 1000, result["lines"], result["txStats"],
+            result["rxStats"]["packets"]))
@@ -0,0 +1,90 @@
+# Cost per useful packet in a noisy channel: FRAMES packets on the air, a third
+# of them for this radio, a third for another address and a third with a broken
+# CRC. Received once as raw fixed length frames that are dewhitened and checked
+# in Python, and once with a PacketFormat that has the chip check the address
+# and CRC and drop the bad packets itself. Simulated chip, SPI traffic and
+# driver CPU time (the simulator's taken out) per packet delivered.
+#
+#   python -m benchmarks.packet_engine
+
+import time
+
+from cpc.cpc import *
+from cpc.packet import PacketFormat, crc16, whiten
+from cpc.sim import SimAir, simulatedRadio
+
+FRAMES = 60
+LENGTH = 20 # payload bytes
+ADDRESS = 0x12
+TIME_SCALE = 1
+
+
+def inject(chip, encoder):
+    good = 0
+    frameTime = (4 + 2 + LENGTH + 4) * 8 / chip.dataRate()
+    for i in range(FRAMES):
+        kind = i % 3
+        payload = bytes([i]) * LENGTH
+        data = bytearray(encoder.encode(payload, ADDRESS if kind != 1 else 0x55))
+        if kind == 2:
+            data[5] ^= 0x10 # corrupted on air
+        else:
+            good += kind == 0
+        chip.inject(data, delay=0.02 + i * (frameTime + 0.005))
+    return good
+
+
+def software(radio, chip, encoder):
+    # fixed length: length byte, address, payload, CRC
+    size = LENGTH + 4
+    buf = bytearray(size)
+    delivered = 0
+    while radio.receiveInto(buf, size, timeout=0.3) is not None:
+        data = whiten(bytearray(buf))
+        if crc16(data[:size - 2]) != data[size - 2] << 8 | data[size - 1]:
+            continue
+        if data[1] != ADDRESS or data[0] != LENGTH + 1:
+            continue
+        delivered += 1
+    return delivered
+
+
+def engine(radio, chip, encoder):
+    encoder.apply(radio)
+    radio.setupRX()
+    buf = bytearray(64)
+    delivered = 0
+    while encoder.receive(radio, buf, timeout=0.3) is not None:
+        delivered += 1
+    return delivered
+
+
+def measure(receive):
+    air = SimAir(TIME_SCALE)
+    radio, chip = simulatedRadio(air=air)
+    radio.setupRX()
+    encoder = PacketFormat(maxLength=LENGTH, address=ADDRESS)
+    good = inject(chip, encoder)
+    chip.device.resetCounters()
+    started = time.process_time()
+    simulated = air.cpuTime
+    delivered = receive(radio, chip, encoder)
+    cpu = time.process_time() - started - (air.cpuTime - simulated)
+    return {
+        "expected": good,
+        "delivered": delivered,
+        "transactions": chip.device.transactions / max(delivered, 1),
+        "bytes": (chip.device.bytesOut + chip.device.bytesIn) / max(delivered, 1),
+        "cpu": cpu / max(delivered, 1),
+    }
+
+
+def run():
+    return [("software", measure(software)), ("PacketFormat", measure(engine))]
+
+
+if __name__ == "__main__":
+    for name, result in run():
+        print("%-12s %2d/%d packets delivered, per packet: %6.1f transactions %7.1f SPI bytes %6.2f ms CPU" % (
+            name, result["delivered"], result["expected"], result["transactions"], result["bytes"],
+            result["cpu"] * 1000))
@@ -0,0 +1,82 @@
+# Packet loss under a back to back burst: BURST packets with a sequence number
+# on the air with no gap between them, received by a receiveInto() loop (what
+# code.py does, back to IDLE and SRX after every packet), and by a Receiver
+# that stays in RX, with a fast consumer and with a consumer that needs WORK
+# seconds per packet behind a small queue (FULL_DROP and FULL_WAIT).
+# Simulated chip.
+#
+#   python -m benchmarks.receiver
+
+import asyncio
+
+from cpc.cpc import *
+from cpc.receiver import FULL_DROP, FULL_WAIT, Receiver
+from cpc.sim import simulatedRadio
+
+BURST = 100
+LENGTH = 16
+DATA_RATE = 9600
+WORK = 0.04 # slow consumer, e.g. forwarding each packet over the network
+CAPACITY = 8
+
+
+def newRadio():
+    radio, chip = simulatedRadio(dataRate=DATA_RATE)
+    radio.setupRX()
+    frame = radio.packetTime(4 + 2 + LENGTH) # preamble, sync word, payload
+    for i in range(BURST):
+        chip.inject(bytes([i]) * LENGTH, delay=0.02 + i * frame)
+    return radio, chip
+
+
+def loop():
+    radio, chip = newRadio()
+    buf = bytearray(LENGTH)
+    seen = set()
+    while radio.receiveInto(buf, LENGTH, timeout=0.2) is not None:
+        if buf.count(buf[0]) == LENGTH:
+            seen.add(buf[0])
+    return {"delivered": len(seen)}
+
+
+def receiver(work, whenFull, capacity):
+    radio, chip = newRadio()
+    rx = Receiver(radio, LENGTH, capacity=capacity, whenFull=whenFull)
+    seen = set()
+
+    async def consume():
+        buf = bytearray(LENGTH)
+        while True:
+            length = await rx.getAsync(buf, 0.3)
+            if length is None:
+                break
+            if buf.count(buf[0]) == LENGTH:
+                seen.add(buf[0])
+            if work:
+                await asyncio.sleep(work)
+        rx.stop()
+
+    async def main():
+        rx.start()
+        await asyncio.gather(rx.run(), consume())
+
+    asyncio.run(main())
+    result = {"delivered": len(seen)}
+    result.update(rx.stats)
+    return result
+
+
+def run():
+    return [
+        ("receiveInto loop", loop()),
+        ("Receiver", receiver(0, FULL_DROP, CAPACITY)),
+        ("Receiver, slow, FULL_DROP", receiver(WORK, FULL_DROP, CAPACITY)),
+        ("Receiver, slow, FULL_WAIT", receiver(WORK, FULL_WAIT, CAPACITY)),
+    ]
+
+
+if __name__ == "__main__":
+    for name, result in run():
+        print("%-26s %3d/%d delivered, loss %5.1f%%  %s" % (
+            name, result["delivered"], BURST, 100.0 * (BURST - result["delivered"]) / BURST,
+            ", ".join("%s %d" % (key, value) for key, value in result.items() if key != "delivered")))
@@ -0,0 +1,73 @@
+# RSSI sweep speed: a Python loop of setFrequency() / SRX / readRssi() versus
+# Scanner, over the same frequencies and dwell time, on the simulated chip with
+# two carriers on the air.
+#
+#   python -m benchmarks.scanner
+
+import time
+from array import array
+
+from cpc.cpc import *
+from cpc.scanner import Scanner
+from cpc.sim import simulatedRadio
+
+FREQUENCIES = range(433050000, 434790000, 50000)
+CARRIERS = ((433450000, -50), (434250000, -70))
+SWEEPS = 5
+DWELL = 0.0005
+
+
+def newRadio():
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    for frequency, rssi in CARRIERS:
+        chip.inject(bytes(20000), rssi=rssi, frequency=frequency) # ~50 s of carrier
+    return radio, chip
+
+
+def loopSweep(radio, readings):
+    for step, frequency in enumerate(FREQUENCIES):
+        radio.strobe(SIDLE)
+        radio.setFrequency(frequency, 0)
+        radio.strobe(SRX) # autocalibration
+        while radio.readSingleByte(MARCSTATE) & 0x1F != MARCSTATE_RX:
+            pass
+        time.sleep(DWELL)
+        readings[step] = radio.readRssi()
+    radio.strobe(SIDLE)
+    return readings
+
+
+def measure(sweep, radio, chip):
+    sweep() # first sweep calibrates, not counted
+    chip.device.resetCounters()
+    started = time.monotonic()
+    for _ in range(SWEEPS):
+        readings = sweep()
+    elapsed = time.monotonic() - started
+    peaks = [FREQUENCIES[step] for step in range(len(readings)) if readings[step] > -100]
+    return {
+        "sweepsPerSecond": SWEEPS / elapsed,
+        "transactions": chip.device.transactions / SWEEPS,
+        "bytes": chip.device.bytesOut / SWEEPS,
+        "peaks": peaks,
+    }
+
+
+def run():
+    radio, chip = newRadio()
+    readings = array('h', [0] * len(FREQUENCIES))
+    results = [("loop", measure(lambda: loopSweep(radio, readings), radio, chip))]
+    radio, chip = newRadio()
+    with Scanner(radio, frequencies=FREQUENCIES, dwell=DWELL) as scanner:
+        results.append(("Scanner", measure(scanner.sweep, radio, chip)))
+    # finish() gave the radio its autocalibration back
+    assert radio.getRegister(MCSM0) & 0x30 and MCSM0 not in radio.fixedBits, "Scanner left autocalibration off"
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in run():
+        print("%-8s %6.1f sweeps/s  %6.1f transactions %7.1f bytes per sweep  peaks at %s" % (
+            name, result["sweepsPerSecond"], result["transactions"], result["bytes"],
+            ", ".join(["%.2f MHz" % (f / 1e6) for f in result["peaks"]])))
@@ -0,0 +1,59 @@
+# One transmitter and two receivers serviced by the Scheduler on one (simulated)
+# bus: frames sent back to back, per radio bus utilization, missed deadlines and
+# packets received.
+#
+#   python -m benchmarks.scheduler [timeScale]
+#
+# The simulator itself needs CPU time per SPI byte, so at large timeScales
+# (fast simulated data rates) the deadlines start to be missed on its account.
+
+import sys
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from cpc.cpc import *
+from cpc.scheduler import Scheduler, RxTask, TxTask
+from cpc.sim import SimAir, simulatedRadio
+
+FRAMES = 10
+PAYLOAD = 200
+
+
+def run(timeScale=4.0):
+    air = SimAir(timeScale)
+    tx, txChip = simulatedRadio(air=air)
+    tx.setupTX()
+    rate = tx.getSampleRate() * timeScale # FIFO deadlines in wall time
+    payloads = [bytes([i]) * PAYLOAD for i in range(FRAMES)]
+    frames = [bytes([0xAA] * 8) + bytes([0x66, 0x6A]) + payload for payload in payloads]
+
+    scheduler = Scheduler()
+    receivers = []
+    for name in ("rx1", "rx2"):
+        radio, chip = simulatedRadio(air=air)
+        radio.setupRX()
+        receivers.append(scheduler.add(RxTask(radio, PAYLOAD, count=FRAMES, name=name, rate=rate)))
+    scheduler.add(TxTask(tx, frames, name="tx", rate=rate))
+    # air time of all frames, plus slack for the turnarounds
+    duration = 2 * FRAMES * len(frames[0]) * 8 / rate + 1
+    asyncio.run(scheduler.run(duration))
+
+    results = scheduler.report()
+    for task in receivers:
+        correct = len([packet for packet in task.packets if packet in payloads])
+        for name, stats in results:
+            if name == task.name:
+                stats["correct"] = correct
+    return scheduler.elapsed, results
+
+
+if __name__ == "__main__":
+    elapsed, results = run(float(sys.argv[1]) if len(sys.argv) > 1 else 4.0)
+    print("%.2f s" % elapsed)
+    for name, stats in results:
+        print("%-4s utilization %5.2f %%  missed deadlines %3d  %s" % (
+            name, stats["utilization"] * 100, stats["missed"],
+            ", ".join(["%s %s" % (key, stats[key]) for key in ("packets", "correct", "overflows", "frames", "underflows") if key in stats])))
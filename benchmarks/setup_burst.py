@@ -0,0 +1,61 @@
+# SPI cost of setupRX()/setupTX(): one writeSingleByte per register versus the
+# shadowed WRITE_BURST path, and of switching named profiles with
+# loadProfile() (diff against the shadow / single burst image), counted on a
+# simulated bus.
+#
+#   python -m benchmarks.setup_burst
+
+from cpc.cpc import *
+from cpc.sim import simulatedRadio
+
+
+def newRadio():
+    radio, chip = simulatedRadio()
+    return radio
+
+
+def singleByteSetup(radio, profile):
+    # what setupRX()/setupTX() used to do
+    for address in sorted(profile):
+        radio.writeSingleByte(address, profile[address])
+
+
+def measure(radio, setup):
+    radio.device.resetCounters()
+    setup()
+    return radio.device.transactions, radio.device.bytesOut, bytes(radio.device.chip.registers)
+
+
+def run():
+    results = []
+    for name, profile, other in (("setupRX", RX_PROFILE, "setupTX"),
+                                 ("setupTX", TX_PROFILE, "setupRX")):
+        radio = newRadio()
+        single = measure(radio, lambda: singleByteSetup(radio, profile))
+        radio = newRadio()
+        burst = measure(radio, getattr(radio, name))
+        assert single[2] == burst[2], "burst setup left different register contents"
+        repeat = measure(radio, getattr(radio, name))
+        getattr(radio, other)()
+        switch = measure(radio, getattr(radio, name))
+        results.append((name, {
+            "single byte": single[:2],
+            "burst after reset": burst[:2],
+            "repeated": repeat[:2],
+            "after " + other: switch[:2],
+        }))
+    for name, other in (("rx-ook", "tx-ook"), ("rx-2fsk", "rx-ook"), ("tx-2fsk", "rx-2fsk")):
+        cases = {}
+        for single in (False, True):
+            radio = newRadio()
+            radio.loadProfile(other)
+            switch = measure(radio, lambda: radio.loadProfile(name, single))
+            cases[("single burst" if single else "diff") + " after " + other] = switch[:2]
+        results.append(("loadProfile(%s)" % name, cases))
+    return results
+
+
+if __name__ == "__main__":
+    for name, cases in run():
+        for case, (transactions, nbytes) in cases.items():
+            print("%s, %s: %d transactions / %d bytes" % (name, case, transactions, nbytes))
@@ -0,0 +1,74 @@
+# State waits: SPI traffic and time of waiting for RX after SRX (synthesizer
+# calibration) and for IDLE after SIDLE, with the old back to back MARCSTATE
+# loop and with waitForState() polling the status byte with backoff. Then an
+# RX FIFO overflow, which a loop waiting for IDLE never leaves, recovered by
+# waitForState().
+# Simulated chip.
+#
+#   python -m benchmarks.state_wait
+
+import time
+
+from cpc.cpc import *
+from cpc.sim import simulatedRadio
+
+ROUNDS = 20
+
+
+def spin(radio, state):
+    while radio.readSingleByte(MARCSTATE) & 0x1F != state:
+        pass
+
+
+def bounded(radio, state):
+    radio.waitForState(state)
+
+
+def measure(wait, rxState, idleState):
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    chip.device.resetCounters()
+    started = time.monotonic()
+    for _ in range(ROUNDS):
+        radio.strobe(SRX)
+        wait(radio, rxState)
+        radio.strobe(SIDLE)
+        wait(radio, idleState)
+    return {
+        "transactions": chip.device.transactions / ROUNDS,
+        "bytes": (chip.device.bytesOut + chip.device.bytesIn) / ROUNDS,
+        "time": (time.monotonic() - started) / ROUNDS,
+        "stats": radio.stateStats(),
+    }
+
+
+def overflow():
+    radio, chip = simulatedRadio()
+    radio.setupRX()
+    radio.setRegister(PKTLEN, 100)
+    radio.flush()
+    radio.strobe(SRX)
+    chip.inject(bytes(100), delay=0.001)
+    time.sleep(radio.packetTime(110) + 0.05)
+    state = radio.readSingleByte(MARCSTATE) & 0x1F
+    radio.waitForState(STATE_IDLE)
+    return state, radio.readSingleByte(MARCSTATE) & 0x1F, radio.stateStats()
+
+
+def run():
+    return [
+        ("MARCSTATE loop", measure(spin, MARCSTATE_RX, MARCSTATE_IDLE)),
+        ("waitForState", measure(bounded, STATE_RX, STATE_IDLE)),
+    ], overflow()
+
+
+if __name__ == "__main__":
+    results, (before, after, stats) = run()
+    for name, result in results:
+        print("%-14s SRX + SIDLE: %6.1f transactions %6.1f SPI bytes %6.2f ms" % (
+            name, result["transactions"], result["bytes"], result["time"] * 1000))
+    for transition, figures in results[1][1]["stats"].items():
+        print("  %-18s %3d waits, mean %6.1f us, max %6.1f us, %4.1f polls" % (
+            transition, figures["waits"], figures["time"] / figures["waits"] * 1e6, figures["max"] * 1e6,
+            figures["polls"] / figures["waits"]))
+    print("RX FIFO overflow: MARCSTATE 0x%02X -> waitForState(STATE_IDLE) -> 0x%02X, %s" % (before, after, stats))
@@ -0,0 +1,108 @@
+# Frames longer than the 64 byte FIFO: sendStream() and receiveStream() (through
+# receiveInto()) move frames of several hundred bytes each way on the
+# simulated chip, in fixed length mode and in infinite packet length mode with
+# and without a fixed length tail, and check that the data comes through. The
+# same again with AsyncCC1101.sendAsync() / receiveAsync(). Last, a packet
+# whose transmitter stalls half way has to come back as None with a failure
+# counted in rxStats, not as a partial count.
+#
+#   python -m benchmarks.streams
+
+import time
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from cpc.cpc import *
+from cpc.aio import AsyncCC1101
+from cpc.sim import SimCC1101, simulatedRadio
+
+SIZES = (200, 300, 512) # fixed length, infinite with a fixed length tail, infinite to the end
+DATA_RATE = 9600 # slow enough that the TX refill margin (33 bytes) covers host scheduling stalls
+DELAY = 0.005 # from receiveInto() to the start of the packet
+
+
+def pattern(size):
+    return bytes((i * 7 + size) & 0xFF for i in range(size))
+
+
+def blocking(size):
+    radio, chip = simulatedRadio(dataRate=DATA_RATE)
+    return radio, chip, radio.sendStream, radio.receiveInto
+
+
+def cooperative(size):
+    chip = SimCC1101()
+    radio = AsyncCC1101(None, None, chip.gdo0, 50000, 434400000, "666A", device=chip.device, dataRate=DATA_RATE)
+
+    def send(data):
+        return asyncio.run(radio.sendAsync(data))
+
+    def receive(buf, length, timeout):
+        return asyncio.run(radio.receiveAsync(buf, length, timeout))
+
+    return radio, chip, send, receive
+
+
+def measure(size, newRadio):
+    data = pattern(size)
+    radio, chip, send, receive = newRadio(size)
+
+    radio.setupTX()
+    started = time.monotonic()
+    sent = send(data)
+    txTime = time.monotonic() - started
+    onAir = bytes(chip.transmitted[-1].data) if chip.transmitted else b""
+
+    radio.setupRX()
+    buf = bytearray(size)
+    chip.inject(data, delay=DELAY)
+    started = time.monotonic()
+    received = receive(buf, size, 0.5)
+    rxTime = time.monotonic() - started - DELAY
+    return {
+        "sent": sent,
+        "txOk": onAir == data,
+        "txTime": txTime,
+        "received": received,
+        "rxOk": bytes(buf) == data,
+        "rxTime": rxTime,
+        "airTime": radio.packetTime(size),
+    }
+
+
+def stalled(newRadio):
+    size = SIZES[-1]
+    radio, chip, send, receive = newRadio(size)
+    radio.setupRX()
+    chip.inject(pattern(size // 2), delay=DELAY).complete = False # never ends
+    buf = bytearray(size)
+    return receive(buf, size, 0.5), radio.rxStats["failed"]
+
+
+def run():
+    results = [("blocking", size, measure(size, blocking)) for size in SIZES]
+    if asyncio is not None:
+        results += [("asyncio", size, measure(size, cooperative)) for size in SIZES]
+    return results
+
+
+def runStalled():
+    results = [("blocking", stalled(blocking))]
+    if asyncio is not None:
+        results.append(("asyncio", stalled(cooperative)))
+    return results
+
+
+if __name__ == "__main__":
+    for name, size, result in run():
+        print("%-8s %4d bytes (%5.1f ms on air): sent %s in %6.1f ms, received %s bytes in %6.1f ms" % (
+            name, size, result["airTime"] * 1000, "ok" if result["txOk"] else "CORRUPT", result["txTime"] * 1000,
+            result["received"], result["rxTime"] * 1000))
+        assert result["sent"] and result["txOk"], "%s send of %d bytes did not go out intact" % (name, size)
+        assert result["received"] == size and result["rxOk"], "%s receive of %d bytes did not come through" % (name, size)
+    for name, (received, failed) in runStalled():
+        print("%-8s stalled packet: received %s, %d failed" % (name, received, failed))
+        assert received is None and failed == 1, "%s returned a partial packet" % name
@@ -0,0 +1,222 @@
+# Throughput and latency of the TX and RX paths on the simulated chip: SPI
+# transactions, bytes on the bus, wall time per packet and packets per second
+# at several payload sizes, and RX <-> TX mode switch latency. Covers the
+# register-by-register flows of code_tx.py / code_rx.py as well as the CC1101
+# class. Results are written as JSON, so two runs (e.g. two releases) can be
+# diffed.
+#
+#   python -m benchmarks.suite [results.json] [timeScale]
+#
+# timeScale > 1 runs the simulated air faster than real time. Air time shrinks
+# with it, the driver's own CPU time does not, so only compare runs made with
+# the same timeScale.
+
+import json
+import sys
+import time
+
+from cpc.cpc import *
+from cpc.sim import SimAir, simulatedRadio
+
+SIZES = (8, 32, 62)
+PACKETS = 3
+
+
+class Measurement:
+    # SPI counters and wall time between start() and stop()
+    def __init__(self, chip):
+        self.device = chip.device
+
+    def start(self):
+        self.device.resetCounters()
+        self.started = time.monotonic()
+
+    def stop(self, packets=1):
+        seconds = time.monotonic() - self.started
+        return {
+            "packets": packets,
+            "transactions": self.device.transactions,
+            "bytes": self.device.bytesOut,
+            "seconds": seconds,
+            "secondsPerPacket": seconds / packets,
+            "packetsPerSecond": packets / seconds if seconds else None,
+        }
+
+
+def newRadio(timeScale, air=None):
+    if air is None:
+        air = SimAir(timeScale)
+    radio, chip = simulatedRadio(air=air)
+    radio.pollMinDelay = 0
+    return radio, chip
+
+
+# code_tx.py / code_rx.py: one writeSingleByte per register, busy polling
+
+def scriptSetup(radio, profile):
+    radio.strobe(SRES)
+    for address in sorted(profile):
+        radio.writeSingleByte(address, profile[address])
+    radio.writeBurst(PATABLE, PA_TABLE)
+
+
+def scriptSend(radio, data):
+    radio.writeSingleByte(PKTLEN, len(data))
+    radio.writeBurst(TXFIFO, data)
+    time.sleep(0.002)
+    radio.strobe(STX)
+    while radio.readSingleByte(TXBYTES) & 0x7F != 0:
+        time.sleep(0.001)
+    # TXBYTES reaches 0 with the last byte still in the modulator
+    while radio.readSingleByte(MARCSTATE) & 0x1F != MARCSTATE_IDLE:
+        pass
+
+
+def scriptReceive(radio, length):
+    radio.writeSingleByte(PKTLEN, length)
+    radio.strobe(SRX)
+    while radio.gdo0.value == False:
+        pass
+    while radio.gdo0.value == True:
+        pass
+    return radio.readBurst(RXFIFO, length + 2) # payload and the appended status bytes
+
+
+def txCases(timeScale):
+    results = []
+    for size in SIZES:
+        payload = bytes(range(size))
+        bitstring = ''.join(["{0:0>8}".format(bin(x)[2:]) for x in payload])
+        # the scripts send the frame as-is: preamble, sync word and payload in the FIFO
+        frame = bytes([0xAA] * (62 - size)) + bytes([0x66, 0x6A]) + payload
+        flows = (
+            ("script", lambda radio: scriptSetup(radio, TX_PROFILE), lambda radio: scriptSend(radio, frame)),
+            ("sendData", lambda radio: radio.setupTX(), lambda radio: radio.sendData(bitstring, "666A")),
+            ("sendBytes", lambda radio: radio.setupTX(), lambda radio: radio.sendBytes(payload)),
+        )
+        for flow, setup, send in flows:
+            radio, chip = newRadio(timeScale)
+            measurement = Measurement(chip)
+            measurement.start()
+            setup(radio)
+            result = {"case": "setupTX", "flow": flow, "size": size}
+            result.update(measurement.stop())
+            results.append(result)
+
+            measurement.start()
+            for _ in range(PACKETS):
+                send(radio)
+            result = {"case": "tx", "flow": flow, "size": size}
+            result.update(measurement.stop(PACKETS))
+            assert len(chip.transmitted) == PACKETS, "%s sent %d frames" % (flow, len(chip.transmitted))
+            results.append(result)
+    return results
+
+
+def rxCases(timeScale):
+    results = []
+    for size in SIZES:
+        payload = bytes(range(size))
+        buf = bytearray(size)
+        flows = (
+            ("script", lambda radio: scriptSetup(radio, RX_PROFILE), lambda radio: scriptReceive(radio, size)),
+            ("receiveData", lambda radio: radio.setupRX(), lambda radio: radio.receiveData(size, 1.0)),
+            ("receiveInto", lambda radio: radio.setupRX(), lambda radio: radio.receiveInto(buf, size, 1.0)),
+        )
+        for flow, setup, receive in flows:
+            radio, chip = newRadio(timeScale)
+            measurement = Measurement(chip)
+            measurement.start()
+            setup(radio)
+            result = {"case": "setupRX", "flow": flow, "size": size}
+            result.update(measurement.stop())
+            results.append(result)
+
+            latency = 0.0
+            measurement.start()
+            for _ in range(PACKETS):
+                frame = chip.inject(payload, delay=0.005 * timeScale)
+                received = chip.received
+                receive(radio)
+                # from the end of the frame on the air until the payload is read
+                latency += chip.air.now() - frame.end()
+                assert chip.received == received + 1, "%s missed a packet" % flow
+            result = {"case": "rx", "flow": flow, "size": size}
+            result.update(measurement.stop(PACKETS))
+            result["readLatency"] = latency / PACKETS / timeScale
+            results.append(result)
+    return results
+
+
+def waitForState(radio, state):
+    while radio.readSingleByte(MARCSTATE) & 0x1F != state:
+        pass
+
+
+def switchCases(timeScale):
+    # RX -> TX and TX -> RX: from the call until MARCSTATE reports the new state
+    def idleThen(setup, strobe):
+        def switch(radio):
+            radio.strobe(SIDLE)
+            setup(radio)
+            radio.strobe(strobe)
+        return switch
+
+    def turnaroundToTx(radio):
+        radio.switchToTX()
+        radio.strobe(STX)
+
+    results = []
+    for flow, prepare, toTx, toRx in (
+            ("script", None,
+             idleThen(lambda radio: scriptSetup(radio, TX_PROFILE), STX),
+             idleThen(lambda radio: scriptSetup(radio, RX_PROFILE), SRX)),
+            ("class", None,
+             idleThen(lambda radio: radio.setupTX(), STX),
+             idleThen(lambda radio: radio.setupRX(), SRX)),
+            ("turnaround", lambda radio: radio.enableTurnaround(),
+             turnaroundToTx,
+             lambda radio: radio.switchToRX())):
+        radio, chip = newRadio(timeScale)
+        measurement = Measurement(chip)
+        radio.setupRX()
+        if prepare is not None:
+            prepare(radio)
+        radio.strobe(SRX)
+        waitForState(radio, MARCSTATE_RX)
+        for case, switch, state in (
+                ("rx->tx", toTx, MARCSTATE_TX),
+                ("tx->rx", toRx, MARCSTATE_RX)):
+            measurement.start()
+            switch(radio)
+            waitForState(radio, state)
+            result = {"case": case, "flow": flow, "size": 0}
+            result.update(measurement.stop())
+            results.append(result)
+    return results
+
+
+def run(timeScale=1.0):
+    return {
+        "meta": {
+            "timeScale": timeScale,
+            "packets": PACKETS,
+            "sizes": list(SIZES),
+            "implementation": sys.implementation.name,
+        },
+        "results": txCases(timeScale) + rxCases(timeScale) + switchCases(timeScale),
+    }
+
+
+if __name__ == "__main__":
+    timeScale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    report = run(timeScale)
+    if len(sys.argv) > 1 and sys.argv[1] != "-":
+        with open(sys.argv[1], "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=1, sort_keys=True))
+    for result in report["results"]:
+        sys.stderr.write("%-8s %-12s %3d bytes: %5d transactions %6d SPI bytes %9.2f ms/packet\n" % (
+            result["case"], result["flow"], result["size"], result["transactions"], result["bytes"],
+            result["secondsPerPacket"] * 1000))
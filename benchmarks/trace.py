@@ -0,0 +1,88 @@
+# SPI tracing: cost of a register workload (status polls, strobes, single
+# writes and a FIFO burst) untraced, traced and again after detach(), and the
+# per method summary of a transmit on the simulated chip. The simulated SPI
+# device is much slower than a real bus, so compare the overhead per call,
+# not the ratios. Last, a trace running for longer than the 32 bit start
+# times can count (epoch moved back) has to list its records in order.
+#
+#   python -m benchmarks.trace [trace.csv]
+
+import sys
+import time
+
+from cpc.cpc import *
+from cpc.sim import simulatedRadio
+from cpc.trace import HISTOGRAM_BOUNDS, TICKS_PERIOD, SpiTrace
+
+ROUNDS = 1000
+REPEAT = 5 # best of
+
+
+def workload(radio):
+    payload = bytes(32)
+    for _ in range(ROUNDS):
+        radio.readSingleByte(MARCSTATE)
+        radio.strobe(SNOP)
+        radio.writeSingleByte(PKTLEN, 0x20)
+        radio.writeBurst(TXFIFO, payload)
+        radio.strobe(SFTX)
+    return ROUNDS * 5
+
+
+def timed(radio):
+    started = time.perf_counter()
+    calls = workload(radio)
+    return (time.perf_counter() - started) / calls
+
+
+def run(path=None):
+    radio, chip = simulatedRadio()
+    radio.setupTX()
+    trace = SpiTrace(512)
+    plain = traced = detached = None
+    for _ in range(REPEAT):
+        elapsed = timed(radio)
+        plain = elapsed if plain is None else min(plain, elapsed)
+        trace.attach(radio)
+        elapsed = timed(radio)
+        traced = elapsed if traced is None else min(traced, elapsed)
+        trace.detach()
+        elapsed = timed(radio)
+        detached = elapsed if detached is None else min(detached, elapsed)
+
+    trace.reset()
+    trace.attach(radio)
+    radio.sendBytes(b"trace me" * 4)
+    trace.detach()
+    if path is not None:
+        with open(path, "w") as f:
+            trace.dump(f)
+    return {"plain": plain, "traced": traced, "detached": detached, "summary": trace.summary()}
+
+
+def wrapped():
+    # Starts past TICKS_PERIOD, with the ring overwritten across the wrap
+    radio, chip = simulatedRadio()
+    trace = SpiTrace(16)
+    trace.epoch -= (TICKS_PERIOD - 200) * 1000
+    trace.attach(radio)
+    for _ in range(40):
+        radio.strobe(SNOP)
+    trace.detach()
+    return [started for started, name, header, length, duration in trace.records()]
+
+
+if __name__ == "__main__":
+    result = run(sys.argv[1] if len(sys.argv) > 1 else None)
+    print("per call: untraced %.2f us, traced %.2f us (+%.2f us), detached %.2f us" % (
+        result["plain"] * 1e6, result["traced"] * 1e6, (result["traced"] - result["plain"]) * 1e6,
+        result["detached"] * 1e6))
+    print("sendBytes(32 bytes), histogram buckets < %s us:" % ", ".join(str(bound) for bound in HISTOGRAM_BOUNDS))
+    for name, stats in result["summary"].items():
+        if stats["calls"]:
+            print("  %-16s %4d calls %5d bytes %7d us (mean %6.1f, max %5d) %s" % (
+                name, stats["calls"], stats["bytes"], stats["time"], stats["mean"], stats["max"],
+                stats["histogram"]))
+    starts = wrapped()
+    print("wrapped trace: %d records from %d us to %d us" % (len(starts), starts[0], starts[-1]))
+    assert starts == sorted(starts) and starts[-1] >= TICKS_PERIOD, "start times wrapped around"
@@ -0,0 +1,66 @@
+# Repeat bursts: a key fob style code sent REPEAT times, with a sendBytes()
+# loop (back through IDLE, SFTX and a new STX for every frame), a sendData()
+# loop, and a Transmitter queue back to back and with a GAP between frames.
+# Frames per second and airtime utilization (air time / wall time) from the
+# driver's side, and the gaps between the frames as the simulated chip sent them.
+#
+#   python -m benchmarks.transmitter
+
+import time
+
+from cpc.cpc import *
+from cpc.sim import simulatedRadio
+from cpc.transmitter import Transmitter
+
+REPEAT = 10
+CODE = b"\x5a\x3c\x96\x0f\xf0\x69\xc3\xa5"
+DATA_RATE = 4800
+GAP = 0.01
+
+
+def loop(send):
+    radio, chip = simulatedRadio(dataRate=DATA_RATE)
+    radio.setupTX()
+    frame = len(radio.buildFrame(CODE))
+    started = time.monotonic()
+    for _ in range(REPEAT):
+        send(radio)
+    elapsed = time.monotonic() - started
+    airtime = REPEAT * radio.packetTime(frame)
+    return chip, {"frames": REPEAT, "framesPerSecond": REPEAT / elapsed, "utilization": airtime / elapsed}
+
+
+def queued(gap):
+    radio, chip = simulatedRadio(dataRate=DATA_RATE)
+    radio.setupTX()
+    tx = Transmitter(radio, gap)
+    tx.add(CODE, repeat=REPEAT)
+    tx.run()
+    return chip, tx.stats
+
+
+def gaps(chip):
+    frames = chip.transmitted
+    between = [b.start - a.end() for a, b in zip(frames, frames[1:])]
+    return len(frames), min(between) if between else 0.0, max(between) if between else 0.0
+
+
+def run():
+    bitstring = "".join("{0:0>8}".format(bin(x)[2:]) for x in CODE)
+    cases = (
+        ("sendBytes loop", lambda: loop(lambda radio: radio.sendBytes(CODE))),
+        ("sendData loop", lambda: loop(lambda radio: radio.sendData(bitstring, "666A"))),
+        ("Transmitter, gap 0", lambda: queued(0.0)),
+        ("Transmitter, gap %d ms" % (GAP * 1000), lambda: queued(GAP)),
+    )
+    results = []
+    for name, case in cases:
+        chip, stats = case()
+        results.append((name, stats, gaps(chip)))
+    return results
+
+
+if __name__ == "__main__":
+    for name, stats, (count, shortest, longest) in run():
+        print("%-20s %5.2f frames/s, airtime utilization %5.1f%%, on air: %2d frames, gaps %6.2f .. %6.2f ms" % (
+            name, stats["framesPerSecond"], 100 * stats["utilization"], count, shortest * 1000, longest * 1000))
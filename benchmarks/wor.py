@@ -0,0 +1,66 @@
+# Wake-on-Radio: the settings WakeOnRadio picks for a few duty cycle / latency
+# targets, the average supply current they come to (against 16 mA for a radio
+# that stays in RX), and on the simulated chip the share of time it actually
+# spent in RX while idle plus a packet sent with the matching wake-up preamble,
+# and that the test registers and PATABLE entries SLEEP resets are restored
+# afterwards.
+# At 38.4 kBaud; the RX window has to cover a few bytes, so slower rates need
+# more latency for the same duty cycle.
+#
+#   python -m benchmarks.wor
+
+from cpc.cpc import *
+from cpc.sim import SimAir, simulatedRadio
+from cpc.wor import CURRENT_RX, WakeOnRadio
+
+TARGETS = ((0.1, 0.05), (0.05, 0.1), (0.02, 0.25), (0.01, 0.5), (0.005, 1.0))
+TIME_SCALE = 10
+IDLE = 1.0 # wall seconds without a packet, TIME_SCALE times that on the air
+LENGTH = 16
+DATA_RATE = 38400
+
+
+def measure(dutyCycle, latency):
+    air = SimAir(TIME_SCALE)
+    radio, chip = simulatedRadio(air=air)
+    radio.setSampleRate(DATA_RATE)
+    radio.setupRX()
+    wor = WakeOnRadio(radio, dutyCycle, latency)
+    buf = bytearray(LENGTH)
+
+    started = air.now()
+    wor.receive(buf, LENGTH, timeout=IDLE)
+    elapsed = air.now() - started
+    measured = chip.rxTime / elapsed
+
+    # a packet that starts at an unlucky moment, just after a wake-up
+    chip.inject(b"W" * LENGTH, delay=wor.rxTime * 2, preamble=wor.preambleBytes())
+    delivered = wor.receive(buf, LENGTH, timeout=2 * (wor.latency + wor.rxTime) + 0.5) == LENGTH
+    # FSTEST..TEST0 and PATABLE, reset while the chip slept, have to be back
+    restored = chip.registers[FSTEST:TEST0 + 1] == radio.shadow[FSTEST:TEST0 + 1] and chip.patable == radio.paTable
+    return {
+        "event0": wor.event0,
+        "rxTime": wor.rxTime,
+        "dutyCycle": wor.dutyCycle,
+        "current": wor.current,
+        "latency": wor.latency,
+        "preamble": wor.preambleBytes(),
+        "measured": measured,
+        "wakeups": chip.wakeups,
+        "delivered": delivered,
+        "restored": restored,
+    }
+
+
+def run():
+    return [((dutyCycle, latency), measure(dutyCycle, latency)) for dutyCycle, latency in TARGETS]
+
+
+if __name__ == "__main__":
+    for (dutyCycle, latency), result in run():
+        print("target %5.1f%% / %4d ms: Event0 %6.1f ms, RX %5.1f ms, duty cycle %5.2f%% (simulated %5.2f%%), %7.1f uA (%5.1fx less), latency %6.1f ms, preamble %3d bytes, packet %s" % (
+            100 * dutyCycle, latency * 1000, result["event0"] * 1000, result["rxTime"] * 1000,
+            100 * result["dutyCycle"], 100 * result["measured"], result["current"] * 1e6,
+            CURRENT_RX / result["current"], result["latency"] * 1000, result["preamble"],
+            "delivered" if result["delivered"] else "lost"))
+        assert result["restored"], "test registers / PATABLE not restored after SLEEP"
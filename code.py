@@ -1,4 +1,5 @@
 from cpc.cpc import *
+from cpc.receiver import Receiver
 
 myspi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
 cs = DigitalInOut(board.D9)
@@ -6,5 +7,11 @@ gdo0 = DigitalInOut(board.D10)
 
 rx = CC1101(myspi, cs, gdo0, 50000, 434400000, "666A")
 rx.setupRX()
+receiver = Receiver(rx, 0x19) # stays in RX between packets
+receiver.start()
+data = bytearray(0x19)
 while True:
-	rx.receiveData(0x19)
\ No newline at end of file
+	level = receiver.poll()
+	while receiver.get(data) is not None:
+		print("Data: ", ''.join(["{0:0>8}".format(bin(x)[2:]) for x in data]))
+	time.sleep(receiver.interval(level))
@@ -146,6 +146,18 @@ def strobe(address):
     	d.readinto(databuffer, end=2)
     return databuffer
 
+def waitForMarcState(state, timeout=0.05):
+    # Poll MARCSTATE until it reads state, sleeping a growing delay between the
+    # reads instead of hammering the bus; False after timeout seconds
+    deadline = time.monotonic() + timeout
+    delay = 0.00005
+    while (readSingleByte(MARCSTATE) & 0x1F != state):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 0.005)
+    return True
+
 mySPI = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
 cs = DigitalInOut(board.D9)
 gdo0 = DigitalInOut(board.D10)
@@ -210,11 +222,10 @@ for i in range(0,len(bitstring)/8):
 writeSingleByte(PKTLEN, len(data))
 strobe(SRX)
 
-marcstate = readSingleByte(MARCSTATE) & 0x1F
 dataToSend = []
 
-while (marcstate != 0x0D):
-    marcstate = readSingleByte(MARCSTATE) & 0x1F
+if not waitForMarcState(0x0D):
+    raise RuntimeError("radio did not enter RX")
 
 print(''.join(list(map(lambda x: "{0:0>8}".format(str(bin(x)[2:])), data))))
 
@@ -0,0 +1,223 @@
+# asyncio versions of the CC1101 receive / send / setup calls. Wherever the
+# blocking methods poll (status byte, TXBYTES, RXBYTES, GDO0) and sleep, these
+# await asyncio.sleep() instead, so the radio can share an event loop with
+# other tasks (sensors, networking) without holding them up. The FIFO handling
+# between the waits is shared with the blocking methods (CC1101._startTx(),
+# _refillTx(), _readRxChunk() ...), so both send and receive packets the same
+# way.
+#
+#   radio = AsyncCC1101(myspi, cs, gdo0, 50000, 434400000, "666A")
+#   await radio.setupTXAsync()
+#   await radio.sendBytesAsync(b"hello")
+#
+# The SPI transactions themselves still block, each takes well below a
+# millisecond.
+
+import time
+
+try:
+    import asyncio
+except ImportError: # CircuitPython without the asyncio library
+    asyncio = None
+
+from cpc.cpc import *
+
+
+class AsyncCC1101(CC1101):
+    def __init__(self, *args, **kwargs):
+        if asyncio is None:
+            raise RuntimeError("asyncio is not available")
+        CC1101.__init__(self, *args, **kwargs)
+
+    async def setupRXAsync(self):
+        await self.writeProfileAsync(RX_BURSTS)
+
+    async def setupTXAsync(self):
+        await self.writeProfileAsync(TX_BURSTS)
+
+    async def writeProfileAsync(self, runs):
+        # writeProfile(), yielding to the event loop after every burst; the
+        # fixedBits pins of a burst are applied before it is flushed
+        for start_address, data in runs:
+            self.setRegisters(start_address, data)
+            self._applyFixedBits(start_address, start_address + len(data) - 1)
+            self.flush()
+            await asyncio.sleep(0)
+        self._applyFixedBits() # pinned registers outside the profile
+        self.flush()
+        self.profile = runs
+
+    async def waitForPinAsync(self, pin, value, timeout=None):
+        # waitForPin() that awaits between polls
+        if pin.value == value:
+            return True
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        delay = self.pollMinDelay
+        while pin.value != value:
+            if deadline is not None:
+                now = time.monotonic()
+                if now >= deadline:
+                    return False
+                delay = min(delay, deadline - now)
+            await asyncio.sleep(delay)
+            self.sleptTime += delay
+            delay = min(delay * 2, self.pollMaxDelay)
+        return True
+
+    async def waitForStateAsync(self, state, timeout=STATE_TIMEOUT):
+        # waitForState() that awaits between polls: the status byte reports
+        # state (STATE_*), FIFO overflow / underflow flushed, False on timeout
+        started = time.monotonic()
+        status = self.strobe(SNOP)
+        current = (status >> 4) & 0x07
+        key = (current, state)
+        polls = 0
+        delay = STATE_POLL_DELAY
+        recoveries = 0
+        reached = True
+        while status & STATUS_CHIP_RDYN or current != state:
+            if current == STATE_RXFIFO_OVERFLOW or current == STATE_TXFIFO_UNDERFLOW:
+                self.strobe(SFRX if current == STATE_RXFIFO_OVERFLOW else SFTX)
+                recoveries += 1
+                if state != STATE_IDLE:
+                    reached = False
+                    break
+            else:
+                if time.monotonic() - started >= timeout:
+                    reached = False
+                    break
+                polls += 1
+                if polls > STATE_SPINS:
+                    await asyncio.sleep(delay)
+                    self.sleptTime += delay
+                    delay = min(delay * 2, self.pollMaxDelay)
+            status = self.strobe(SNOP)
+            current = (status >> 4) & 0x07
+        self._countStateWait(key, started, polls, recoveries, reached)
+        return reached
+
+    async def waitForIdleAsync(self, timeout=STATE_TIMEOUT):
+        # SIDLE and wait until the radio is in IDLE, False if it did not get
+        # there within timeout seconds
+        self.strobe(SIDLE)
+        return await self.waitForStateAsync(STATE_IDLE, timeout)
+
+    async def waitForRxBytesAsync(self, count, timeout):
+        # waitForRxBytes() that awaits between polls
+        deadline = time.monotonic() + timeout
+        available = self.rxFifoBytes()
+        while available < count:
+            if time.monotonic() >= deadline:
+                return False
+            delay = max(self.packetTime(count - available), self.pollMinDelay)
+            await asyncio.sleep(delay)
+            self.sleptTime += delay
+            available = self.rxFifoBytes()
+        return True
+
+    async def receiveAsync(self, buf, length=None, timeout=None):
+        # receiveInto(): packets up to 64 bytes are read at the end of the
+        # packet, longer ones drained on the GDO0 threshold signal while they
+        # arrive, like receiveStream(). Returns the number of bytes received,
+        # or None if no packet started within timeout seconds or it did not
+        # come in completely (counted in rxStats["failed"]).
+        view = memoryview(buf)
+        if length is None:
+            length = len(view)
+        started = time.monotonic()
+        slept = self.sleptTime
+        if length > 64:
+            received = await self._receiveStreamAsync(view, length, timeout)
+        else:
+            self.setRegister(PKTLEN, length)
+            self.flush()
+            self.strobe(SRX)
+            received = await self.waitForPinAsync(self.gdo0, True, timeout)
+            if received:
+                received = await self.waitForPinAsync(self.gdo0, False, 2 * self.packetTime(length) + 0.01)
+            if received:
+                self.readBurstInto(RXFIFO, view, length)
+                self.rxStats["packets"] += 1
+            else:
+                self.rxStats["timeouts"] += 1
+            self.idle()
+            self.strobe(SFRX)
+        if not received:
+            return None
+
+        busy = time.monotonic() - started - (self.sleptTime - slept)
+        self.rxStats["busy"] += busy
+        self.rxStats["lastBusy"] = busy
+        return length
+
+    async def _receiveStreamAsync(self, view, length, timeout):
+        # receiveStream() into view, True if the whole packet came
+        saved, threshold = self._startRxStream(length)
+        infinite = length > 255
+        received = 0
+        wait = timeout
+        overflow = False
+        try:
+            while received < length:
+                remaining = length - received
+                if remaining >= threshold:
+                    arrived = await self.waitForPinAsync(self.gdo0, True, wait)
+                else:
+                    arrived = await self.waitForRxBytesAsync(remaining, 2 * self.packetTime(remaining) + 0.01)
+                if not arrived:
+                    break
+                wait = 2 * self.packetTime(threshold) + 0.01
+                count, infinite = self._readRxChunk(length, received, infinite, saved[2])
+                view[received:received + count] = memoryview(self.rxChunk)[:count]
+                received += count
+        except RuntimeError: # RX FIFO overflow
+            overflow = True
+        finally:
+            self._finishRxStream(saved)
+        return self._countRx(length, received, overflow)
+
+    async def sendAsync(self, data):
+        # sendStream(): data is sent as-is, of any length. Returns False if the
+        # FIFO was not drained in time or ran empty.
+        view = memoryview(data)
+        length = len(view)
+        infinite = length > 255
+        iocfg0, pktctrl0, written = self._startTx(view)
+
+        sent = True
+        underflow = False
+        done = False
+        refill = 2 * self.packetTime(64) + 0.01
+        try:
+            while True:
+                queued = self.txFifoBytes()
+                if infinite:
+                    infinite = self._tailLengthMode(pktctrl0, length, written - queued)
+                if written == length:
+                    break
+                if not await self.waitForPinAsync(self.gdo0, False, refill):
+                    sent = False
+                    break
+                written = self._refillTx(view, written)
+
+            if sent and infinite:
+                queued = self.readSingleByte(TXBYTES) & 0x7F
+                sent = await self.waitForStateAsync(STATE_IDLE, 2 * self.packetTime(queued) + 0.01)
+                done = sent
+            elif sent:
+                if self._endOfPacketSignal():
+                    sent = await self.waitForPinAsync(self.gdo0, True, refill)
+                if sent:
+                    sent = await self.waitForPinAsync(self.gdo0, False, refill)
+                done = sent
+        except RuntimeError: # TX FIFO underflow
+            sent = False
+            underflow = True
+        finally:
+            self._finishTx(done, iocfg0, pktctrl0)
+        return self._countTx(sent, underflow, written, length)
+
+    async def sendBytesAsync(self, payload, syncword=None):
+        # sendBytes(): preamble, sync word and payload
+        return await self.sendAsync(self.buildFrame(payload, syncword))
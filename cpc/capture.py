@@ -0,0 +1,109 @@
+# Packet capture: a fixed size ring buffer of received frames with their
+# metadata, and a receive loop that fills it.
+#
+#   ring = CaptureRing(64, 32) # 64 frames of up to 32 bytes
+#   capture(radio, ring, 32, count=10)
+#   ring.drain(lambda index: print(bytes(ring.payload(index)), ring.rssi[index]))
+#
+# All storage is allocated up front: the payloads share one bytearray and the
+# metadata lives in parallel arrays indexed by slot, so capture() does not
+# create objects per frame. When the ring is full the oldest frame is
+# overwritten (counted in overruns).
+
+import time
+from array import array
+
+from cpc.cpc import *
+
+
+class CaptureRing:
+    def __init__(self, capacity, maxLength):
+        self.capacity = capacity
+        self.maxLength = maxLength
+        slot = maxLength + 2 # room for the two appended status bytes
+        self.storage = bytearray(capacity * slot)
+        storage = memoryview(self.storage)
+        self.views = [storage[i * slot:(i + 1) * slot] for i in range(capacity)]
+        self.lengths = array('H', [0] * capacity)
+        self.timestamps = array('d', [0.0] * capacity) # time.monotonic() at the sync word
+        self.rssi = array('h', [0] * capacity) # dBm
+        self.lqi = array('B', [0] * capacity)
+        self.crcOk = array('B', [0] * capacity)
+        self.freqEst = array('b', [0] * capacity) # FREQEST, frequency offset in FXOSC/2^14 units
+        self.head = 0 # next slot to write
+        self.count = 0 # frames in the ring
+        self.overruns = 0 # frames overwritten before they were drained
+        self.missed = 0 # frames that started but did not end in time, dropped
+        self.captured = 0 # frames committed in total
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self):
+        # Slot index for the next frame; its buffer is self.views[index]
+        if self.count == self.capacity:
+            self.count -= 1 # the oldest frame goes
+            self.overruns += 1
+        return self.head
+
+    def commit(self, index, length, timestamp, rssi, lqi, crcOk, freqEst):
+        self.lengths[index] = length
+        self.timestamps[index] = timestamp
+        self.rssi[index] = rssi
+        self.lqi[index] = lqi
+        self.crcOk[index] = crcOk
+        self.freqEst[index] = freqEst
+        self.head = (index + 1) % self.capacity
+        self.count += 1
+        self.captured += 1
+
+    def oldest(self):
+        return (self.head - self.count) % self.capacity
+
+    def payload(self, index):
+        return self.views[index][:self.lengths[index]]
+
+    def drain(self, handler, limit=None):
+        # Call handler(index) for up to limit frames, oldest first, and free
+        # their slots. Returns the number of frames drained.
+        drained = 0
+        while self.count and (limit is None or drained < limit):
+            handler(self.oldest())
+            self.count -= 1
+            drained += 1
+        return drained
+
+
+def capture(radio, ring, length, count=None, timeout=None):
+    # Receive fixed length packets into ring until count packets were captured
+    # or none started within timeout seconds. The radio stays in RX between
+    # packets (RXOFF_MODE), RSSI / LQI / CRC_OK come from the appended status
+    # bytes (APPEND_STATUS), FREQEST is read when the sync word is detected.
+    # A packet that does not end in time is dropped (counted in ring.missed)
+    # and RX restarted. Returns the number of packets captured.
+    if length > ring.maxLength or length > 62:
+        raise ValueError("packet does not fit the ring slots / the RX FIFO")
+    saved = radio.enterContinuousRx(length)
+
+    captured = 0
+    end = 2 * radio.packetTime(length) + 0.01
+    try:
+        while count is None or captured < count:
+            if not radio.waitForPin(radio.gdo0, True, timeout): # sync word
+                break
+            stamp = time.monotonic()
+            freqest = radio.readSingleByte(FREQEST)
+            if not radio.waitForPin(radio.gdo0, False, end): # end of packet
+                ring.missed += 1
+                radio.restartRx()
+                continue
+            index = ring.reserve()
+            view = ring.views[index]
+            radio.readBurstInto(RXFIFO, view, length + 2)
+            status = view[length + 1]
+            ring.commit(index, length, stamp, rssiToDbm(view[length]), status & 0x7F, status >> 7,
+                        freqest - 256 if freqest >= 128 else freqest)
+            captured += 1
+    finally:
+        radio.leaveContinuousRx(saved)
+    return captured
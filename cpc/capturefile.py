@@ -0,0 +1,205 @@
+# Capture files: packets received by a CC1101, with their metadata, in a
+# compact binary format that can be written on the device, read back on a
+# workstation and replayed on air.
+#
+#   with open("capture.cpc", "wb") as f:
+#       writer = CaptureWriter(f, radio)
+#       capture(radio, ring, 20, count=100)
+#       writer.writeRing(ring)
+#
+#   reader = CaptureReader("capture.cpc")
+#   for timestamp, rssi, lqi, crcOk, freqEst, payload in reader:
+#       ...
+#   replay(radio, reader)
+#
+# Layout, little endian:
+#   header  "CPCF", version (B), pad (B), frequency in Hz (I, FREQ2..0 plus
+#           CHANNR channel spacings), data rate in baud (f), registers
+#           0x00..0x2E (47 bytes, the profile in use)
+#   records length (H), time.monotonic() at the sync word (d), RSSI in dBm (h),
+#           LQI (B), CRC_OK (B), FREQEST (b), then length payload bytes
+#
+# CaptureReader memory-maps the file where mmap is available (CPython), so a
+# long capture is never loaded as a whole and the payloads are views into the
+# file; elsewhere it reads record by record.
+
+import struct
+import time
+
+try:
+    import mmap
+except ImportError: # CircuitPython
+    mmap = None
+
+from cpc.cpc import *
+
+MAGIC = b"CPCF"
+VERSION = 1
+PROFILE_REGISTERS = 0x2F # 0x00 (IOCFG2) .. 0x2E (TEST0)
+HEADER = "<4sBxIf%ds" % PROFILE_REGISTERS
+HEADER_SIZE = struct.calcsize(HEADER)
+RECORD = "<HdhBBb"
+RECORD_SIZE = struct.calcsize(RECORD)
+
+# The registers that define the packets on air: sync word, packet format,
+# channel, frequency, modem (data rate, channel filter, modulation, preamble,
+# channel spacing) and deviation. configure() restores them from the header.
+AIR_REGISTERS = (SYNC1, SYNC0, PKTCTRL1, PKTCTRL0, ADDR, CHANNR, FREQ2, FREQ1, FREQ0,
+                 MDMCFG4, MDMCFG3, MDMCFG2, MDMCFG1, MDMCFG0, DEVIATN)
+
+
+def profileFrequency(profile, freq_xosc=26000000):
+    # Carrier frequency in Hz of a register image: FREQ2..FREQ0 plus CHANNR
+    # times the channel spacing (MDMCFG1 CHANSPC_E, MDMCFG0 CHANSPC_M)
+    word = profile[FREQ2] << 16 | profile[FREQ1] << 8 | profile[FREQ0]
+    spacing = (256 + profile[MDMCFG0]) * pow(2, profile[MDMCFG1] & 0x03) * freq_xosc / pow(2, 18)
+    return word * freq_xosc / 65536 + profile[CHANNR] * spacing
+
+
+class CaptureWriter:
+    def __init__(self, stream, radio):
+        # stream: a file (or anything with write()) opened in binary mode. The
+        # header is written right away, from the radio's current registers.
+        self.stream = stream
+        self.records = 0
+        self.record = bytearray(RECORD_SIZE)
+        profile = bytes([radio.getRegister(address) for address in range(PROFILE_REGISTERS)])
+        frequency = int(profileFrequency(profile) + 0.5)
+        stream.write(struct.pack(HEADER, MAGIC, VERSION, frequency, radio.getSampleRate(), profile))
+
+    def write(self, payload, timestamp=None, rssi=0, lqi=0, crcOk=1, freqEst=0):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        struct.pack_into(RECORD, self.record, 0, len(payload), timestamp, rssi, lqi, crcOk, freqEst)
+        self.stream.write(self.record)
+        self.stream.write(payload)
+        self.records += 1
+
+    def writeRing(self, ring, limit=None):
+        # Drain a CaptureRing into the file, returns the number of records written
+        def handler(index):
+            self.write(ring.payload(index), ring.timestamps[index], ring.rssi[index],
+                       ring.lqi[index], ring.crcOk[index], ring.freqEst[index])
+        return ring.drain(handler, limit)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class CaptureReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = None
+        if mmap is not None:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = self.map[:HEADER_SIZE]
+        else:
+            header = self.file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError("not a capture file")
+        magic, version, self.frequency, self.dataRate, self.profile = struct.unpack(HEADER, header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a capture file, or an unsupported version")
+
+    def __iter__(self):
+        # (timestamp, rssi, lqi, crcOk, freqEst, payload) per record. payload is
+        # a memoryview that is only valid until the next record is read.
+        if self.map is not None:
+            data = memoryview(self.map)
+            payload = None
+            try:
+                offset = HEADER_SIZE
+                end = len(data) - RECORD_SIZE
+                while offset <= end:
+                    length, timestamp, rssi, lqi, crcOk, freqEst = struct.unpack_from(RECORD, data, offset)
+                    offset += RECORD_SIZE
+                    if offset + length > len(data):
+                        break # truncated by an interrupted capture
+                    payload = data[offset:offset + length]
+                    yield timestamp, rssi, lqi, crcOk, freqEst, payload
+                    payload.release()
+                    offset += length
+            finally:
+                if payload is not None:
+                    payload.release()
+                data.release()
+            return
+        self.file.seek(HEADER_SIZE)
+        record = bytearray(RECORD_SIZE)
+        buf = bytearray(255)
+        while self.file.readinto(record) == RECORD_SIZE:
+            length, timestamp, rssi, lqi, crcOk, freqEst = struct.unpack_from(RECORD, record, 0)
+            if length > len(buf):
+                buf = bytearray(length)
+            view = memoryview(buf)[:length]
+            if self.file.readinto(view) != length:
+                break
+            yield timestamp, rssi, lqi, crcOk, freqEst, view
+
+    def summary(self):
+        # Packet count, CRC failures, time span and RSSI range of the capture
+        count = 0
+        crcErrors = 0
+        first = last = None
+        rssiMin = rssiMax = None
+        rssiSum = 0
+        for timestamp, rssi, lqi, crcOk, freqEst, payload in self:
+            count += 1
+            crcErrors += not crcOk
+            if first is None:
+                first = timestamp
+                rssiMin = rssiMax = rssi
+            last = timestamp
+            rssiMin = min(rssiMin, rssi)
+            rssiMax = max(rssiMax, rssi)
+            rssiSum += rssi
+        return {
+            "packets": count,
+            "crcErrors": crcErrors,
+            "seconds": last - first if count else 0.0,
+            "rssiMin": rssiMin,
+            "rssiMax": rssiMax,
+            "rssiMean": rssiSum / count if count else None,
+        }
+
+    def configure(self, radio):
+        # Set radio up to send packets the way they were captured: the
+        # AIR_REGISTERS of the header profile, the rest of its profile is kept
+        for address in AIR_REGISTERS:
+            radio.setRegister(address, self.profile[address])
+        radio.flush()
+        if MCSM0 in radio.fixedBits:
+            radio.loadCalibration() # autocalibration is off
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+def replay(radio, reader, realtime=True, crcOnly=False):
+    # Transmit the captured payloads with the captured frequency, channel,
+    # modem and packet settings (CaptureReader.configure()), keeping the
+    # original spacing between the packets if realtime. radio is not switched
+    # to the TX profile, the output power and other TX settings stay as the
+    # caller left them. With a sync word in the profile (MDMCFG2 SYNC_MODE)
+    # the chip adds preamble and sync word and the payloads go out with
+    # sendStream(), otherwise sendBytes() adds them. Returns the number of
+    # packets sent.
+    reader.configure(radio)
+    send = radio.sendStream if reader.profile[MDMCFG2] & 0x07 else radio.sendBytes
+    sent = 0
+    offset = None
+    for timestamp, rssi, lqi, crcOk, freqEst, payload in reader:
+        if crcOnly and not crcOk:
+            continue
+        if realtime:
+            if offset is None:
+                offset = time.monotonic() - timestamp
+            delay = timestamp + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if send(payload):
+            sent += 1
+    return sent
@@ -0,0 +1,121 @@
+# Channel plans for fast frequency hopping: FREQ words are computed once per
+# channel, the synthesizer is calibrated once per channel (SCAL) and the
+# FSCAL3..FSCAL1 results are cached, so a hop is two short bursts (FREQ2..FREQ0,
+# FSCAL3..FSCAL1) with autocalibration off instead of a ~720 us calibration.
+#
+#   plan = ChannelPlan([433920000, 434420000, 434920000], offset=radio_offset)
+#   plan.calibrateAll(radio) # optional, channels are calibrated on first use
+#   plan.hop(radio, 1) # ends in RX
+#   plan.stats["maxHop"] # size dwell times with this
+#   plan.finish() # autocalibration and the frequency from before are back
+#
+# or "with plan:" around the hops, which calls finish() at the end.
+
+import time
+
+from cpc.cpc import *
+
+
+class ChannelPlan:
+    def __init__(self, frequencies, offset=0):
+        # offset: per unit FREQ word correction, as passed to the CC1101 constructor
+        self.frequencies = tuple(frequencies)
+        self.words = []
+        for frequency in self.frequencies:
+            word = frequencyWord(frequency, offset)
+            self.words.append(bytes([(word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF]))
+        self.calibrations = [None] * len(self.frequencies) # FSCAL3..FSCAL1 per channel
+        self.channel = None # last channel hopped to
+        # (radio, fixed bits, MCSM0, FREQ2..FREQ0) from before the first
+        # calibration, restored by finish()
+        self.saved = None
+        self.stats = {
+            "hops": 0,
+            "hopTime": 0.0, # total driver time spent in hop()
+            "minHop": None,
+            "maxHop": 0.0,
+            "lastHop": 0.0,
+            "calibrations": 0,
+            "calibrationTime": 0.0,
+        }
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    def calibrate(self, radio, channel):
+        # SCAL on channel and cache the result (leaves the radio in IDLE)
+        started = time.monotonic()
+        if self.saved is None:
+            fixed = {}
+            for address in (MCSM0, FSCAL3, FSCAL2, FSCAL1):
+                fixed[address] = radio.fixedBits.get(address)
+            frequency = bytes([radio.getRegister(FREQ2), radio.getRegister(FREQ1), radio.getRegister(FREQ0)])
+            self.saved = (radio, fixed, radio.getRegister(MCSM0), frequency)
+        if MCSM0 not in radio.fixedBits:
+            radio.disableAutocal()
+        radio.strobe(SIDLE)
+        radio.writeBurst(FREQ2, self.words[channel])
+        values = radio.calibrate()
+        self.calibrations[channel] = values
+        self.stats["calibrations"] += 1
+        self.stats["calibrationTime"] += time.monotonic() - started
+        return values
+
+    def finish(self):
+        # Undo what calibrating and hopping changed: the frequency from before,
+        # MCSM0 (autocalibration) and the fixed bits writeProfile() keeps. The
+        # radio is left in IDLE; the cached calibrations stay valid.
+        if self.saved is None:
+            return
+        radio, fixed, mcsm0, frequency = self.saved
+        radio.idle()
+        for address in fixed:
+            if fixed[address] is None:
+                radio.fixedBits.pop(address, None)
+            else:
+                radio.fixedBits[address] = fixed[address]
+        radio.setRegisters(FREQ2, frequency)
+        radio.setRegister(MCSM0, mcsm0)
+        radio.flush()
+        if MCSM0 in radio.fixedBits:
+            radio.loadCalibration() # autocalibration was off before as well
+        self.saved = None
+        self.channel = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish()
+        return False
+
+    def calibrateAll(self, radio):
+        for channel in range(len(self.frequencies)):
+            self.calibrate(radio, channel)
+
+    def hop(self, radio, channel, strobe=SRX):
+        # Retune radio to channel and strobe (SRX, STX, SFSTXON, or None to stay
+        # in IDLE). Returns the time the driver spent, the synthesizer settling
+        # time (~90 us) comes on top of that.
+        started = time.monotonic()
+        values = self.calibrations[channel]
+        if values is None or MCSM0 not in radio.fixedBits:
+            values = self.calibrate(radio, channel) # first use
+        else:
+            radio.strobe(SIDLE)
+            radio.writeBurst(FREQ2, self.words[channel])
+            radio.applyCalibration(values)
+        if strobe is not None:
+            radio.strobe(strobe)
+        self.channel = channel
+
+        elapsed = time.monotonic() - started
+        stats = self.stats
+        stats["hops"] += 1
+        stats["hopTime"] += elapsed
+        stats["lastHop"] = elapsed
+        if stats["minHop"] is None or elapsed < stats["minHop"]:
+            stats["minHop"] = elapsed
+        if elapsed > stats["maxHop"]:
+            stats["maxHop"] = elapsed
+        return elapsed
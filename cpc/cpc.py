@@ -1,9 +1,12 @@
-from digitalio import DigitalInOut
-import board
-import busio
 import time
-import math
-from adafruit_bus_device.spi_device import SPIDevice
+
+try:
+    from digitalio import DigitalInOut
+    import board
+    import busio
+    from adafruit_bus_device.spi_device import SPIDevice
+except (ImportError, NotImplementedError): # not on a board, only usable with a simulated device (cpc.sim)
+    SPIDevice = None
 
 WRITE_SINGLE_BYTE = 0x00
 WRITE_BURST = 0x40
@@ -108,242 +111,1197 @@ RXBYTES = 0xFB  # Overflow and Number of Bytes
 RCCTRL1_STATUS = 0xFC  # Last RC Oscillator Calibration Result
 RCCTRL0_STATUS = 0xFD  # Last RC Oscillator Calibration Result
 
+# MARCSTATE Values
+
+MARCSTATE_SLEEP = 0x00
+MARCSTATE_IDLE = 0x01
+MARCSTATE_XOFF = 0x02
+MARCSTATE_VCOON_MC = 0x03
+MARCSTATE_REGON_MC = 0x04
+MARCSTATE_MANCAL = 0x05
+MARCSTATE_VCOON = 0x06
+MARCSTATE_REGON = 0x07
+MARCSTATE_STARTCAL = 0x08
+MARCSTATE_BWBOOST = 0x09
+MARCSTATE_FS_LOCK = 0x0A
+MARCSTATE_IFADCON = 0x0B
+MARCSTATE_ENDCAL = 0x0C
+MARCSTATE_RX = 0x0D
+MARCSTATE_RX_END = 0x0E
+MARCSTATE_RX_RST = 0x0F
+MARCSTATE_TXRX_SWITCH = 0x10
+MARCSTATE_RXFIFO_OVERFLOW = 0x11
+MARCSTATE_FSTXON = 0x12
+MARCSTATE_TX = 0x13
+MARCSTATE_TX_END = 0x14
+MARCSTATE_RXTX_SWITCH = 0x15
+MARCSTATE_TXFIFO_UNDERFLOW = 0x16
+
+# Chip status byte (clocked out with every header byte, e.g. of SNOP): CHIP_RDYn
+# and the STATE field in bits 6:4
+
+STATUS_CHIP_RDYN = 0x80
+STATE_IDLE = 0
+STATE_RX = 1
+STATE_TX = 2
+STATE_FSTXON = 3
+STATE_CALIBRATE = 4
+STATE_SETTLING = 5
+STATE_RXFIFO_OVERFLOW = 6
+STATE_TXFIFO_UNDERFLOW = 7
+STATE_NAMES = ("IDLE", "RX", "TX", "FSTXON", "CALIBRATE", "SETTLING", "RXFIFO_OVERFLOW", "TXFIFO_UNDERFLOW")
+
+# MCSM1 RXOFF_MODE / TXOFF_MODE Values (state after a packet)
+
+OFFMODE_IDLE = 0x00
+OFFMODE_FSTXON = 0x01
+OFFMODE_TX = 0x02
+OFFMODE_RX = 0x03
+
 PA_TABLE = [0x00, 0xC0, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]
 
+# Configuration register values after SRES / power-on reset (IOCFG2..TEST0)
+RESET_VALUES = bytes([
+    0x29, 0x2E, 0x3F, 0x07, 0xD3, 0x91, 0xFF, 0x04,  # IOCFG2..PKTCTRL1
+    0x45, 0x00, 0x00, 0x0F, 0x00, 0x1E, 0xC4, 0xEC,  # PKTCTRL0..FREQ0
+    0x8C, 0x22, 0x02, 0x22, 0xF8, 0x47, 0x07, 0x30,  # MDMCFG4..MCSM1
+    0x04, 0x36, 0x6C, 0x03, 0x40, 0x91, 0x87, 0x6B,  # MCSM0..WOREVT0
+    0xF8, 0x56, 0x10, 0xA9, 0x0A, 0x20, 0x0D, 0x41,  # WORCTRL..RCCTRL1
+    0x00, 0x59, 0x7F, 0x3F, 0x88, 0x31, 0x0B,        # RCCTRL0..TEST0
+])
+
+# Strobes that may run a synthesizer calibration, which rewrites FSCAL3..FSCAL1
+CALIBRATING_STROBES = (SFSTXON, SCAL, SRX, STX, SWOR)
+
+POLL_MIN_DELAY = 0.0002 # first sleep between two polls of a pin, doubled after every poll
+POLL_MAX_DELAY = 0.005 # upper bound for the sleep between two polls of a pin
+
+STATE_TIMEOUT = 0.05 # default bound of waitForState(); calibration and settling take < 1 ms
+STATE_SPINS = 2 # status polls back to back before waitForState() starts to sleep
+STATE_POLL_DELAY = 0.00005 # first sleep between two status polls, doubled up to pollMaxDelay
+
+# Log levels of setLogLevel()
+LOG_DEBUG = 10 # per packet messages
+LOG_INFO = 20
+LOG_WARNING = 30
+LOG_NAMES = {LOG_DEBUG: "DEBUG", LOG_INFO: "INFO", LOG_WARNING: "WARNING"}
+
+RSSI_OFFSET = 74 # dB, datasheet RSSI offset at 433 MHz / 868 MHz and the usual data rates
+
+FLUSH_GAP = 3 # clean registers flush() rewrites to join two dirty runs instead of starting a new burst
+
+# Register profiles - {address: value} maps of the configuration space (IOCFG2..TEST0).
+# Registers that are left out (sync word, packet length, frequency) keep whatever
+# was written to them before.
+
+RX_PROFILE = {
+    IOCFG2: 0x29,
+    IOCFG1: 0x2E,
+    IOCFG0: 0x06,
+    FIFOTHR: 0x47,
+    PKTCTRL1: 0x00,
+    PKTCTRL0: 0x00,
+    ADDR: 0x00,
+    CHANNR: 0x00,
+    FSCTRL1: 0x08,
+    FSCTRL0: 0x00,
+    MDMCFG4: 0xF7,
+    MDMCFG3: 0x10,
+    MDMCFG2: 0x32,
+    MDMCFG1: 0x22,
+    MDMCFG0: 0xF8,
+    DEVIATN: 0x00,
+    MCSM2: 0x07,
+    MCSM1: 0x30,
+    MCSM0: 0x18,
+    FOCCFG: 0x16,
+    BSCFG: 0x6C,
+    AGCCTRL2: 0x06,
+    AGCCTRL1: 0x00,
+    AGCCTRL0: 0x95,
+    WOREVT1: 0x87,
+    WOREVT0: 0x6B,
+    WORCTRL: 0xFB,
+    FREND1: 0xB6,
+    FREND0: 0x11,
+    FSCAL3: 0xE9,
+    FSCAL2: 0x2A,
+    FSCAL1: 0x00,
+    FSCAL0: 0x1F,
+    RCCTRL1: 0x41,
+    RCCTRL0: 0x00,
+    FSTEST: 0x59,
+    PTEST: 0x7F,
+    AGCTEST: 0x3F,
+    TEST2: 0x81,
+    TEST1: 0x35,
+    TEST0: 0x09,
+}
+
+TX_PROFILE = {
+    IOCFG2: 0x29,
+    IOCFG1: 0x2E,
+    IOCFG0: 0x06,
+    FIFOTHR: 0x47,
+    PKTCTRL1: 0x00,
+    PKTCTRL0: 0x00,
+    ADDR: 0x00,
+    CHANNR: 0x00,
+    FSCTRL1: 0x06,
+    FSCTRL0: 0x00,
+    MDMCFG4: 0xE7,
+    MDMCFG3: 0x10,
+    MDMCFG2: 0x30,  #. 32 would be 16/16 sync word bits .#
+    MDMCFG1: 0x22,
+    MDMCFG0: 0xF8,
+    DEVIATN: 0x15,
+    MCSM2: 0x07,
+    MCSM1: 0x20,
+    MCSM0: 0x18,
+    FOCCFG: 0x14,
+    BSCFG: 0x6C,
+    AGCCTRL2: 0x03,
+    AGCCTRL1: 0x00,
+    AGCCTRL0: 0x92,
+    WOREVT1: 0x87,
+    WOREVT0: 0x6B,
+    WORCTRL: 0xFB,
+    FREND1: 0x56,
+    FREND0: 0x11,
+    FSCAL3: 0xE9,
+    FSCAL2: 0x2A,
+    FSCAL1: 0x00,
+    FSCAL0: 0x1F,
+    RCCTRL1: 0x41,
+    RCCTRL0: 0x00,
+    FSTEST: 0x59,
+    PTEST: 0x7F,
+    AGCTEST: 0x3F,
+    TEST2: 0x81,
+    TEST1: 0x35,
+    TEST0: 0x0B,
+}
+
+
+def compileProfile(profile):
+    # Turn a register profile into a tuple of (start_address, data) runs, each of
+    # which goes out in a single WRITE_BURST transaction. The test registers
+    # (FSTEST..TEST0) always get a run of their own because they are the ones that
+    # have to be rewritten after SLEEP.
+    runs = []
+    start = None
+    data = None
+    for address in sorted(profile):
+        if not IOCFG2 <= address <= TEST0:
+            raise ValueError("0x%02X is not a configuration register" % address)
+        if data is None or address != start + len(data) or address == FSTEST:
+            if data is not None:
+                runs.append((start, bytes(data)))
+            start = address
+            data = bytearray()
+        data.append(profile[address])
+    if data is not None:
+        runs.append((start, bytes(data)))
+    return tuple(runs)
+
+
+def diffProfile(old, new):
+    # The part of profile new that differs from profile old, to switch from one
+    # to the other with as few register writes as possible
+    return dict([(address, new[address]) for address in new if old.get(address) != new[address]])
+
+
+def _noLog(message, *args):
+    # debug() / info() / warning() of a radio with logging off: the message is
+    # never formatted
+    pass
+
+
+def rssiToDbm(value):
+    # RSSI status register value (two's complement, 0.5 dB steps) to dBm
+    if value >= 128:
+        value -= 256
+    return value // 2 - RSSI_OFFSET
+
+
+def frequencyWord(frequency, offset=0):
+    # FREQ2..FREQ0 value for frequency in Hz, offset is a correction in FREQ
+    # word units (what the CC1101 constructor takes)
+    return int(frequency * (pow(2, 16) / 26000000) + offset)
+
+
+MODEM_SETTINGS = {} # modemSettings() results by (rate, deviation, bandwidth, freq_xosc)
+
+
+def modemSettings(rate, deviation=None, bandwidth=None, freq_xosc=26000000):
+    # {MDMCFG4: CHANBW_E/M and DRATE_E, MDMCFG3: DRATE_M, DEVIATN: DEVIATION_E/M}
+    # for a data rate in baud (0.6 to 500 kBaud). deviation (Hz) defaults to half
+    # the data rate (FSK modulation index 1), bandwidth (Hz) to the narrowest
+    # channel filter that passes rate + 2 * deviation. Memoized, so switching
+    # between rates only costs the register writes.
+    key = (rate, deviation, bandwidth, freq_xosc)
+    settings = MODEM_SETTINGS.get(key)
+    if settings is not None:
+        return settings
+    if not 600 <= rate <= 500000:
+        raise ValueError("data rate must be 600 to 500000 baud")
+    if deviation is None:
+        deviation = rate / 2
+    if bandwidth is None:
+        bandwidth = rate + 2 * deviation
+
+    # data rate = (256 + DRATE_M) * 2^(DRATE_E - 28) * f_xosc
+    for drate_e in range(16):
+        drate_m = int(rate * pow(2, 28 - drate_e) / freq_xosc + 0.5) - 256
+        if drate_m <= 255: # 256 rounds over to the next exponent
+            break
+
+    # channel bandwidth = f_xosc / (8 * (4 + CHANBW_M) * 2^CHANBW_E), narrowest that fits
+    chanbw = 0x00 # widest, 812 kHz
+    for chanbw_e in range(3, -1, -1):
+        for chanbw_m in range(3, -1, -1):
+            if freq_xosc / (8 * (4 + chanbw_m) * pow(2, chanbw_e)) >= bandwidth:
+                chanbw = chanbw_e << 2 | chanbw_m
+                break
+        else:
+            continue
+        break
+
+    # deviation = f_xosc / 2^17 * (8 + DEVIATION_M) * 2^DEVIATION_E, closest
+    deviatn = 0x00
+    error = None
+    for deviation_e in range(8):
+        for deviation_m in range(8):
+            value = freq_xosc / pow(2, 17) * (8 + deviation_m) * pow(2, deviation_e)
+            if error is None or abs(value - deviation) < error:
+                error = abs(value - deviation)
+                deviatn = deviation_e << 4 | deviation_m
+
+    settings = {MDMCFG4: chanbw << 4 | drate_e, MDMCFG3: drate_m, DEVIATN: deviatn}
+    MODEM_SETTINGS[key] = settings
+    return settings
+
+
+def validateProfile(profile):
+    for address in profile:
+        if not IOCFG2 <= address <= TEST0:
+            raise ValueError("0x%02X is not a configuration register" % address)
+        value = profile[address]
+        if not isinstance(value, int) or not 0 <= value <= 0xFF:
+            raise ValueError("register 0x%02X: %r is not a byte value" % (address, value))
+
+
+# Named register profiles, see loadProfile(). Each one is compiled once, when it
+# is registered: into burst runs for writeProfile(), and into an image of the
+# whole configuration space (IOCFG2..TEST0) that goes out in one transaction.
+PROFILES = {}
+PROFILE_BURSTS = {}
+PROFILE_IMAGES = {} # (image, defined): defined[address] is 1 for the registers the profile sets
+
+
+def registerProfile(name, profile, base=None):
+    # Add (or replace) profile under name. With base, profile only lists the
+    # registers that differ from the named base profile. Returns the burst runs.
+    if base is not None:
+        merged = dict(PROFILES[base])
+        merged.update(profile)
+        profile = merged
+    validateProfile(profile)
+    image = bytearray(TEST0 + 1)
+    defined = bytearray(TEST0 + 1)
+    for address in profile:
+        image[address] = profile[address]
+        defined[address] = 1
+    PROFILES[name] = profile
+    PROFILE_BURSTS[name] = compileProfile(profile)
+    PROFILE_IMAGES[name] = (bytes(image), bytes(defined))
+    return PROFILE_BURSTS[name]
+
+
+RX_BURSTS = registerProfile("rx-ook", RX_PROFILE)
+TX_BURSTS = registerProfile("tx-ook", TX_PROFILE)
+# 2-FSK with 5.2 kHz deviation; TX sends without a sync word like tx-ook, as
+# sendBytes() puts preamble and sync word in the frame itself
+registerProfile("rx-2fsk", {MDMCFG2: 0x02, DEVIATN: 0x15}, base="rx-ook")
+registerProfile("tx-2fsk", {MDMCFG2: 0x00, DEVIATN: 0x15}, base="tx-ook")
+RX_TO_TX_BURSTS = compileProfile(diffProfile(RX_PROFILE, TX_PROFILE))
+TX_TO_RX_BURSTS = compileProfile(diffProfile(TX_PROFILE, RX_PROFILE))
+
 class CC1101:
-    def __init__(self, spi, cs, gdo0, baudrate, frequency, syncword, offset=0): #optional frequency offset in Hz
+    def __init__(self, spi, cs, gdo0, baudrate, frequency, syncword, offset=0, device=None, dataRate=None): #optional frequency offset in Hz
+        # baudrate is the SPI clock, dataRate the air data rate in baud (the
+        # profiles' 3.37 kBaud if None, see setSampleRate())
         self.gdo0 = gdo0
-        self.device = SPIDevice(spi, cs, baudrate=baudrate, polarity=0, phase=0)
-        self.strobe(SRES) # reset
+        self.pollMinDelay = POLL_MIN_DELAY
+        self.pollMaxDelay = POLL_MAX_DELAY
+        self.pollDelays = None # (pollMinDelay, pollMaxDelay) before setSampleRate()
+        self.sleptTime = 0.0 # total time spent sleeping in waitForPin() / waitForState()
+        # waitForState() figures per (state at the start, target state), see stateStats()
+        self.stateWaits = {}
+        self.rxStats = {"packets": 0, "timeouts": 0, "failed": 0, "busy": 0.0, "lastBusy": 0.0}
+        self.txStats = {"packets": 0, "failed": 0}
+        # Log messages go through self.debug / info / warning(message, *args),
+        # no-ops until setLogLevel()
+        self.debug = self.info = self.warning = _noLog
+        self.rxChunk = bytearray(64) # receiveStream() chunks, one RX FIFO worth
+        self.txFrame = bytearray(64) # sendBytes() frame: preamble, sync word, payload
+        # SPI scratch buffers: a header byte plus one FIFO worth of data, and the
+        # chip status byte. Transactions address them with start/end instead of
+        # creating new buffers, so the register and FIFO accessors do not allocate.
+        self.spiBuffer = bytearray(65)
+        self.statusBuffer = bytearray(1)
+        if device is None: # device can be any SPIDevice-like object, e.g. cpc.sim.SimCC1101().device
+            if SPIDevice is None:
+                raise RuntimeError("adafruit_bus_device is not available, pass a device")
+            device = SPIDevice(spi, cs, baudrate=baudrate, polarity=0, phase=0)
+        self.device = device
+
+        # Shadow of the configuration registers. valid: the shadow value is known,
+        # dirty: the shadow value still has to be written to the chip by flush().
+        self.shadow = bytearray(TEST0 + 1)
+        self.valid = bytearray(TEST0 + 1)
+        self.dirty = bytearray(TEST0 + 1)
+        self.profile = None # the runs last written by writeProfile()
+        self.profileImage = bytearray(TEST0 + 1) # loadProfile(single=True) scratch
+        # {address: (mask, bits)} that writeProfile() keeps regardless of the
+        # profile, see enableTurnaround()
+        self.fixedBits = {}
+        self.calibrations = {} # FSCAL3..FSCAL1 per frequency, see calibrate()
+        # Last PATABLE written; paTableDirty: flush() has to write it again
+        self.paTable = bytearray(8)
+        self.paTableDirty = False
 
-        self.setFrequency(frequency, offset)
+        self.strobe(SRES) # reset
 
         assert len(syncword) == 4
-        self.writeSingleByte(SYNC1, int(syncword[:2], 16))
-        self.writeSingleByte(SYNC0, int(syncword[2:], 16))
+        self.setRegister(SYNC1, int(syncword[:2], 16))
+        self.setRegister(SYNC0, int(syncword[2:], 16))
+
+        self.setFrequency(frequency, offset) # flushes the sync word as well
+        if dataRate is not None:
+            self.setSampleRate(dataRate)
 
         self.writeBurst(PATABLE, PA_TABLE)      
         self.strobe(SFTX) # flush TX FIFO
         self.strobe(SFRX) # flush RX FIFO
 
     def setFrequency(self, frequency, offset):
-        frequency_hex = hex(int(frequency * (pow(2,16) / 26000000)+offset))
+        word = frequencyWord(frequency, offset)
 
-        byte2 = (int(frequency_hex, 16) >> 16) & 0xff;
-        byte1 = (int(frequency_hex) >>  8) & 0xff;
-        byte0 = int(frequency_hex) & 0xff;
-
-        self.writeSingleByte(FREQ2, byte2)
-        self.writeSingleByte(FREQ1, byte1)
-        self.writeSingleByte(FREQ0, byte0)  
+        self.setRegister(FREQ2, (word >> 16) & 0xff)
+        self.setRegister(FREQ1, (word >> 8) & 0xff)
+        self.setRegister(FREQ0, word & 0xff)
+        self.flush()
+        if MCSM0 in self.fixedBits:
+            self.loadCalibration() # autocalibration is off
     
     def getSampleRate(self, freq_xosc = 26000000):
-        drate_mantissa = self.readSingleByte(MDMCFG3)
-        drate_exponent = self.readSingleByte(MDMCFG4) & 0xF
+        drate_mantissa = self.getRegister(MDMCFG3)
+        drate_exponent = self.getRegister(MDMCFG4) & 0xF
         sample_rate = (256 + drate_mantissa) * \
             pow(2, drate_exponent - 28) * freq_xosc
         return sample_rate
 
     def setSampleRate_4000(self):
-        self.writeSingleByte(MDMCFG3, 0x43)
+        # 4 kBaud: only the DRATE fields, channel filter and deviation stay as
+        # the profile has them
+        settings = modemSettings(4000)
+        self._pinSampleRate({MDMCFG4: (0x0F, settings[MDMCFG4] & 0x0F), MDMCFG3: (0xFF, settings[MDMCFG3])})
+
+    def setSampleRate(self, rate, deviation=None, bandwidth=None, freq_xosc=26000000):
+        # Set the data rate in baud, with channel filter bandwidth and deviation
+        # to match (see modemSettings()). The values are kept by setupRX() /
+        # setupTX() until clearSampleRate().
+        settings = modemSettings(rate, deviation, bandwidth, freq_xosc)
+        self._pinSampleRate({address: (0xFF, settings[address]) for address in settings})
 
-   # TODO: Implement set sample rate function
-   def setSampleRate(self):
-        pass
+    def _pinSampleRate(self, pins):
+        # pins: {address: (mask, bits)} of MDMCFG4 / MDMCFG3 / DEVIATN, kept in
+        # fixedBits and written right away; an earlier pin that is left out goes
+        for address in (MDMCFG4, MDMCFG3, DEVIATN):
+            self.fixedBits.pop(address, None)
+        self.fixedBits.update(pins)
+        self._applyFixedBits(MDMCFG4, DEVIATN)
+        self.flush()
+        # poll pins at least every 8 bytes of air time, so that waitForPin() does
+        # not sleep through a whole short packet at high data rates
+        if self.pollDelays is None:
+            self.pollDelays = (self.pollMinDelay, self.pollMaxDelay)
+        self.pollMaxDelay = min(self.pollDelays[1], self.packetTime(8))
+        self.pollMinDelay = min(self.pollDelays[0], self.pollMaxDelay)
+
+    def clearSampleRate(self):
+        # Back to the profiles' data rate and the polling delays from before
+        for address in (MDMCFG4, MDMCFG3, DEVIATN):
+            self.fixedBits.pop(address, None)
+        if self.profile is not None:
+            self.writeProfile(self.profile)
+        if self.pollDelays is not None:
+            self.pollMinDelay, self.pollMaxDelay = self.pollDelays
+            self.pollDelays = None
     
     def setupRX(self):
-        self.writeSingleByte(IOCFG2, 0x29)    
-        self.writeSingleByte(IOCFG1, 0x2E)    
-        self.writeSingleByte(IOCFG0, 0x06)    
-        self.writeSingleByte(FIFOTHR, 0x47)   
-        self.writeSingleByte(PKTCTRL1, 0x00)  
-        self.writeSingleByte(PKTCTRL0, 0x00)  
-        self.writeSingleByte(ADDR, 0x00)
-        self.writeSingleByte(CHANNR, 0x00)
-        self.writeSingleByte(FSCTRL1, 0x08)   
-        self.writeSingleByte(FSCTRL0, 0x00)           
-        self.writeSingleByte(MDMCFG4, 0xF7)    
-        self.writeSingleByte(MDMCFG3, 0x10)    
-        self.writeSingleByte(MDMCFG2, 0x32)   
-        self.writeSingleByte(MDMCFG1, 0x22)   
-        self.writeSingleByte(MDMCFG0, 0xF8)
-        self.writeSingleByte(DEVIATN, 0x00)   
-        self.writeSingleByte(MCSM2, 0x07)
-        self.writeSingleByte(MCSM1, 0x30)     
-        self.writeSingleByte(MCSM0, 0x18)
-        self.writeSingleByte(FOCCFG, 0x16)
-        self.writeSingleByte(BSCFG, 0x6C)
-        self.writeSingleByte(AGCCTRL2, 0x06)  
-        self.writeSingleByte(AGCCTRL1, 0x00)  
-        self.writeSingleByte(AGCCTRL0, 0x95)
-        self.writeSingleByte(WOREVT1, 0x87)
-        self.writeSingleByte(WOREVT0, 0x6B)
-        self.writeSingleByte(WORCTRL, 0xFB)
-        self.writeSingleByte(FREND1, 0xB6)    
-        self.writeSingleByte(FREND0, 0x11)    
-        self.writeSingleByte(FSCAL3, 0xE9)
-        self.writeSingleByte(FSCAL2, 0x2A)
-        self.writeSingleByte(FSCAL1, 0x00)
-        self.writeSingleByte(FSCAL0, 0x1F)
-        self.writeSingleByte(RCCTRL1, 0x41)
-        self.writeSingleByte(RCCTRL0, 0x00)
-        self.writeSingleByte(FSTEST, 0x59)
-        self.writeSingleByte(PTEST, 0x7F)   
-        self.writeSingleByte(AGCTEST, 0x3F)
-        self.writeSingleByte(TEST2, 0x81)     
-        self.writeSingleByte(TEST1, 0x35)     
-        self.writeSingleByte(TEST0, 0x09)
+        self.writeProfile(RX_BURSTS)
 
     def setupTX(self):
-        self.writeSingleByte(IOCFG2, 0x29)    
-        self.writeSingleByte(IOCFG1, 0x2E)    
-        self.writeSingleByte(IOCFG0, 0x06)    
-        self.writeSingleByte(FIFOTHR, 0x47)   
-        self.writeSingleByte(PKTCTRL1, 0x00)  
-        self.writeSingleByte(PKTCTRL0, 0x00)  
-        self.writeSingleByte(ADDR, 0x00)
-        self.writeSingleByte(CHANNR, 0x00)
-        self.writeSingleByte(FSCTRL1, 0x06)   
-        self.writeSingleByte(FSCTRL0, 0x00)   
-        self.writeSingleByte(MDMCFG4, 0xE7)    
-        self.writeSingleByte(MDMCFG3, 0x10)    
-        self.writeSingleByte(MDMCFG2, 0x30)    #. 32 would be 16/16 sync word bits .#
-        self.writeSingleByte(MDMCFG1, 0x22)   
-        self.writeSingleByte(MDMCFG0, 0xF8)
-        self.writeSingleByte(DEVIATN, 0x15)   
-        self.writeSingleByte(MCSM2, 0x07)
-        self.writeSingleByte(MCSM1, 0x20)     
-        self.writeSingleByte(MCSM0, 0x18)
-        self.writeSingleByte(FOCCFG, 0x14)
-        self.writeSingleByte(BSCFG, 0x6C)
-        self.writeSingleByte(AGCCTRL2, 0x03)  
-        self.writeSingleByte(AGCCTRL1, 0x00)  
-        self.writeSingleByte(AGCCTRL0, 0x92)
-        self.writeSingleByte(WOREVT1, 0x87)
-        self.writeSingleByte(WOREVT0, 0x6B)
-        self.writeSingleByte(WORCTRL, 0xFB)
-        self.writeSingleByte(FREND1, 0x56)    
-        self.writeSingleByte(FREND0, 0x11)    
-        self.writeSingleByte(FSCAL3, 0xE9)
-        self.writeSingleByte(FSCAL2, 0x2A)
-        self.writeSingleByte(FSCAL1, 0x00)
-        self.writeSingleByte(FSCAL0, 0x1F)
-        self.writeSingleByte(RCCTRL1, 0x41)
-        self.writeSingleByte(RCCTRL0, 0x00)
-        self.writeSingleByte(FSTEST, 0x59)
-        self.writeSingleByte(PTEST, 0x7F)   
-        self.writeSingleByte(AGCTEST, 0x3F)
-        self.writeSingleByte(TEST2, 0x81)     
-        self.writeSingleByte(TEST1, 0x35)     
-        self.writeSingleByte(TEST0, 0x0B)
+        self.writeProfile(TX_BURSTS)
+
+    def loadProfile(self, name, single=False):
+        # Switch to the profile registered as name (PROFILES). Only registers that
+        # differ from the shadow are written, in as few bursts as flush() can
+        # join, unless single: then the whole configuration space goes out in one
+        # transaction, the registers the profile leaves out (sync word, frequency,
+        # packet length) with their current values.
+        runs = PROFILE_BURSTS[name]
+        if not single:
+            self.writeProfile(runs)
+            return
+        template, defined = PROFILE_IMAGES[name]
+        image = self.profileImage
+        for address in range(TEST0 + 1):
+            image[address] = template[address] if defined[address] else self.getRegister(address)
+        for address in self.fixedBits:
+            mask, bits = self.fixedBits[address]
+            image[address] = (image[address] & ~mask) | bits
+        self.writeBurst(IOCFG2, image)
+        self.profile = runs
+
+    def profileChanges(self, name):
+        # {address: value} of the registers loadProfile(name) would change, the
+        # ones the shadow does not know included
+        profile = PROFILES[name]
+        changes = {}
+        for address in profile:
+            value = profile[address]
+            if address in self.fixedBits:
+                mask, bits = self.fixedBits[address]
+                value = (value & ~mask) | bits
+            if not self.valid[address] or self.shadow[address] != value:
+                changes[address] = value
+        return changes
+
+    def writeProfile(self, runs):
+        # runs as returned by compileProfile(); only registers that differ from
+        # the shadow are sent
+        for start_address, data in runs:
+            self.setRegisters(start_address, data)
+        self._applyFixedBits()
+        self.flush()
+        self.profile = runs
+
+    def _applyFixedBits(self, start_address=IOCFG2, end_address=TEST0):
+        # Stage the fixedBits pins of the registers start_address..end_address
+        for address in self.fixedBits:
+            if start_address <= address <= end_address:
+                mask, bits = self.fixedBits[address]
+                self.setRegister(address, (self.getRegister(address) & ~mask) | bits)
+
+    # RX <-> TX turnaround
+
+    def calibrationKey(self):
+        return self.getRegister(CHANNR) << 24 | self.getRegister(FREQ2) << 16 | \
+            self.getRegister(FREQ1) << 8 | self.getRegister(FREQ0)
+
+    def calibrate(self):
+        # Calibrate the synthesizer for the current frequency (SCAL from IDLE) and
+        # cache the resulting FSCAL3..FSCAL1, returns them
+        self.idle()
+        self.flush()
+        self.strobe(SCAL)
+        if not self.waitForState(STATE_IDLE): # calibration takes ~720 us
+            raise RuntimeError("calibration did not finish")
+        values = bytes([self.getRegister(FSCAL3), self.getRegister(FSCAL2), self.getRegister(FSCAL1)])
+        self.calibrations[self.calibrationKey()] = values
+        self._pinCalibration(values)
+        return values
+
+    def loadCalibration(self):
+        # Write the cached FSCAL3..FSCAL1 of the current frequency, calibrating
+        # once if there are none. Only valid with the synthesizer off.
+        values = self.calibrations.get(self.calibrationKey())
+        if values is None:
+            values = self.calibrate()
+        else:
+            self.applyCalibration(values)
+        return values
+
+    def applyCalibration(self, values):
+        # Write FSCAL3..FSCAL1 (as returned by calibrate()) in one burst
+        self.writeBurst(FSCAL3, values)
+        self._pinCalibration(values)
+
+    def _pinCalibration(self, values):
+        # with autocalibration off, writeProfile() must not overwrite the calibration
+        if MCSM0 in self.fixedBits:
+            self.fixedBits[FSCAL3] = (0x0F, values[0] & 0x0F)
+            self.fixedBits[FSCAL2] = (0x1F, values[1] & 0x1F)
+            self.fixedBits[FSCAL1] = (0x3F, values[2] & 0x3F)
+
+    def disableAutocal(self):
+        # Turn MCSM0.FS_AUTOCAL off (kept by writeProfile()): the synthesizer then
+        # runs on whatever calibrate() / applyCalibration() left in FSCAL3..FSCAL1
+        self.fixedBits[MCSM0] = (0x30, 0x00)
+        self.setRegister(MCSM0, self.getRegister(MCSM0) & ~0x30)
+        self.flush()
+
+    def enableTurnaround(self, rxOff=OFFMODE_FSTXON, txOff=OFFMODE_FSTXON):
+        # Fast RX <-> TX switching (switchToTX() / switchToRX()). Autocalibration
+        # is turned off: the synthesizer runs on FSCAL3..FSCAL1 calibrated once per
+        # frequency and cached, so leaving IDLE only costs the settling time
+        # instead of a ~720 us calibration. After a packet the radio goes to the
+        # MCSM1 off modes rxOff / txOff (OFFMODE_*), by default FSTXON, where the
+        # synthesizer keeps running and STX / SRX take effect within ~30 us.
+        self.fixedBits[MCSM1] = (0x0F, rxOff << 2 | txOff)
+        self.idle()
+        self.disableAutocal()
+        self.loadCalibration()
+        if self.profile is not None:
+            self.writeProfile(self.profile)
+
+    def disableTurnaround(self):
+        # Back to the profile's off modes and autocalibration
+        for address in (MCSM1, MCSM0, FSCAL3, FSCAL2, FSCAL1):
+            self.fixedBits.pop(address, None)
+        if self.profile is not None:
+            self.writeProfile(self.profile)
+
+    def switchToTX(self):
+        # RX (or IDLE / FSTXON) -> TX profile without stopping the synthesizer:
+        # SFSTXON first, so it settles while the registers that differ from the
+        # RX profile are written. The next sendStream() / sendBytes() then starts
+        # with the STX strobe. Needs enableTurnaround() for the synthesizer to
+        # stay calibrated.
+        self.strobe(SFSTXON)
+        self.writeProfile(RX_TO_TX_BURSTS if self.profile is RX_BURSTS else TX_BURSTS)
+        self.profile = TX_BURSTS
+
+    def switchToRX(self):
+        # TX (FSTXON after a packet) -> RX profile, ends in RX
+        self.writeProfile(TX_TO_RX_BURSTS if self.profile is TX_BURSTS else RX_BURSTS)
+        self.profile = RX_BURSTS
+        self.strobe(SRX)
+
+    def setRegister(self, address, value):
+        # Stage a configuration register write, sent by the next flush().
+        # Writing the value the chip already holds is a no-op.
+        if self.valid[address] and self.shadow[address] == value:
+            return
+        self.shadow[address] = value
+        self.valid[address] = 1
+        self.dirty[address] = 1
+
+    def setRegisters(self, start_address, data):
+        for i in range(len(data)):
+            self.setRegister(start_address + i, data[i])
+
+    def getRegister(self, address):
+        # Configuration register value, from the shadow if it is known
+        if not self.valid[address]:
+            self.shadow[address] = self.readSingleByte(address)
+            self.valid[address] = 1
+        return self.shadow[address]
+
+    def flush(self):
+        # Write all dirty registers, one burst per run of dirty registers. Runs
+        # separated by up to FLUSH_GAP known registers are joined into one burst.
+        dirty = self.dirty
+        valid = self.valid
+        address = IOCFG2
+        while address <= TEST0:
+            if not dirty[address]:
+                address += 1
+                continue
+            start = address
+            end = address + 1
+            probe = end
+            while probe <= TEST0:
+                if dirty[probe]:
+                    end = probe + 1
+                elif probe - end >= FLUSH_GAP or not valid[probe]:
+                    break
+                probe += 1
+            if end - start == 1:
+                self.writeSingleByte(start, self.shadow[start])
+            else:
+                self.writeBurst(start, self.shadow[start:end])
+            address = end
+        if self.paTableDirty:
+            self.writeBurst(PATABLE, self.paTable)
+
+    def invalidateShadow(self, start_address=IOCFG2, end_address=TEST0):
+        # Forget what the chip holds, e.g. after it lost power. The registers are
+        # read back from the chip the next time they are needed.
+        for address in range(start_address, end_address + 1):
+            self.valid[address] = 0
+            self.dirty[address] = 0
+
+    def _updateShadow(self, address, byte_data):
+        if address <= TEST0:
+            self.shadow[address] = byte_data
+            self.valid[address] = 1
+            self.dirty[address] = 0
 
     def writeSingleByte(self, address, byte_data):
-        databuffer = bytearray([WRITE_SINGLE_BYTE | address, byte_data])
+        databuffer = self.spiBuffer
+        databuffer[0] = WRITE_SINGLE_BYTE | address
+        databuffer[1] = byte_data
         with self.device as d:
-            d.write(databuffer)
+            d.write(databuffer, end=2)
+        self._updateShadow(address, byte_data)
 
     def readSingleByte(self, address):
-        databuffer = bytearray([READ_SINGLE_BYTE | address, 0x00])
-        
+        databuffer = self.spiBuffer
+        databuffer[0] = READ_SINGLE_BYTE | address
         with self.device as d:
             d.write(databuffer, end=1)
-            d.readinto(databuffer, end=2)
+            d.readinto(databuffer, end=1)
         return databuffer[0]
 
-    def readBurst(self, start_address, length):        
-        databuffer = []
-        ret = bytearray(length+1)
-
-        for x in range(length + 1):
-            addr = (start_address + (x*8)) | READ_BURST
-            databuffer.append(addr)
-
+    def readBurst(self, start_address, length):
+        # Returns a new bytearray: the chip status byte followed by length bytes.
+        # Use readBurstInto() to read without allocating.
+        ret = bytearray(length + 1)
+        databuffer = self.spiBuffer
+        databuffer[0] = READ_BURST | start_address
         with self.device as d:
-            d.write_readinto(bytearray(databuffer), ret)
+            d.write_readinto(databuffer, ret, out_end=1, in_end=1)
+            d.readinto(ret, start=1)
         return ret
 
+    def readBurstInto(self, start_address, buf, length):
+        # Burst read of length bytes straight into buf, without the status byte
+        header = self.spiBuffer
+        header[0] = READ_BURST | start_address
+        with self.device as d:
+            d.write(header, end=1)
+            d.readinto(buf, end=length)
+
     def writeBurst(self, address, data):
-        temp = list(data)
-        temp.insert(0, (WRITE_BURST | address))
+        # data can be any buffer (bytes, bytearray, memoryview) or a list
+        if isinstance(data, list):
+            data = bytes(data)
+        header = self.spiBuffer
+        header[0] = WRITE_BURST | address
         with self.device as d:
-            d.write(bytearray(temp))
+            d.write(header, end=1)
+            d.write(data)
+        if address <= TEST0:
+            for i in range(len(data)):
+                self._updateShadow(address + i, data[i])
+        elif address == PATABLE:
+            for i in range(len(data)):
+                self.paTable[i % 8] = data[i]
+            self.paTableDirty = False
 
     def strobe(self, address):
-        databuffer = bytearray([address, 0x00])
+        # Returns the chip status byte. Only the command byte is clocked: further
+        # bytes in the same transaction would be decoded as new headers
+        # (0x00 0x00 writes 0x00 to IOCFG2).
+        databuffer = self.spiBuffer
+        databuffer[0] = address
         with self.device as d:
-            d.write(databuffer, end=1)
-            d.readinto(databuffer, end=2)
-        return databuffer
+            d.write_readinto(databuffer, self.statusBuffer, out_end=1)
+
+        if address == SRES:
+            self.shadow[:] = RESET_VALUES
+            for i in range(TEST0 + 1):
+                self.valid[i] = 1
+                self.dirty[i] = 0
+        elif address == SPWD or address == SWOR:
+            # FSTEST..TEST0 and PATABLE entries 1..7 are lost in SLEEP (SWOR
+            # sleeps between its RX polls), the next flush() restores them
+            for i in range(FSTEST, TEST0 + 1):
+                self.dirty[i] = self.valid[i]
+            self.paTableDirty = True
+        if address in CALIBRATING_STROBES and (address == SCAL or not self.valid[MCSM0] or self.shadow[MCSM0] & 0x30):
+            # calibration rewrites FSCAL3..FSCAL1, only SCAL calibrates with FS_AUTOCAL off
+            self.valid[FSCAL3] = self.valid[FSCAL2] = self.valid[FSCAL1] = 0
+        return self.statusBuffer[0]
+
+    def setLogLevel(self, level, output=print):
+        # Send the driver's messages of level (LOG_*) and above to output(line),
+        # print by default; None turns logging off again. Below the level the
+        # methods stay no-ops, so quiet messages cost one call and no formatting.
+        for name, value in (("debug", LOG_DEBUG), ("info", LOG_INFO), ("warning", LOG_WARNING)):
+            if level is None or value < level:
+                setattr(self, name, _noLog)
+            else:
+                setattr(self, name, self._logger(LOG_NAMES[value], output))
+
+    def _logger(self, name, output):
+        def log(message, *args):
+            output("%s: %s" % (name, message % args if args else message))
+        return log
 
     def setupCheck(self):
         self.strobe(SFRX)
         self.strobe(SRX)
-        print("ready to detect data")
+        self.info("ready to detect data")
 
-    def receiveData(self, length):
-        self.writeSingleByte(PKTLEN, length)
-        self.strobe(SRX)
-        print("waiting for data")
+    def waitForPin(self, pin, value, timeout=None):
+        # Poll pin until it reads value, sleeping between polls with an exponential
+        # backoff from pollMinDelay up to pollMaxDelay so the CPU is free for other
+        # work. pollMinDelay = 0 busy-waits. Returns False if timeout (s) expired.
+        if pin.value == value:
+            return True
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        delay = self.pollMinDelay
+        while pin.value != value:
+            if deadline is not None:
+                now = time.monotonic()
+                if now >= deadline:
+                    return False
+                delay = min(delay, deadline - now)
+            if delay > 0:
+                time.sleep(delay)
+                self.sleptTime += delay
+            delay = min(delay * 2, self.pollMaxDelay)
+        return True
+
+    # The blocking waits below are plain loops so they do not allocate per
+    # call; AsyncCC1101 (cpc.aio) has the same loops with awaits and shares the
+    # FIFO handling through the _start* / _finish* / _read* / _refill* helpers.
 
-        while self.gdo0.value == False:
-            pass 
-        #detected rising edge
+    def waitForState(self, state, timeout=STATE_TIMEOUT):
+        # Wait until the chip status byte reports state (STATE_*). The status
+        # comes with an SNOP strobe, one byte on the bus instead of the two of a
+        # MARCSTATE read; the first STATE_SPINS polls are back to back, then
+        # the sleep in between doubles up to pollMaxDelay. An RX FIFO overflow
+        # or TX FIFO underflow is flushed (SFRX / SFTX, the chip goes to IDLE).
+        # Returns False after timeout seconds, or right after such a recovery
+        # if the target is not IDLE.
+        started = time.monotonic()
+        status = self.strobe(SNOP)
+        current = (status >> 4) & 0x07
+        key = (current, state)
+        polls = 0
+        delay = STATE_POLL_DELAY
+        recoveries = 0
+        reached = True
+        while status & STATUS_CHIP_RDYN or current != state:
+            if current == STATE_RXFIFO_OVERFLOW or current == STATE_TXFIFO_UNDERFLOW:
+                self.strobe(SFRX if current == STATE_RXFIFO_OVERFLOW else SFTX)
+                recoveries += 1
+                if state != STATE_IDLE:
+                    reached = False
+                    break
+            else:
+                if time.monotonic() - started >= timeout:
+                    reached = False
+                    break
+                polls += 1
+                if polls > STATE_SPINS:
+                    time.sleep(delay)
+                    self.sleptTime += delay
+                    delay = min(delay * 2, self.pollMaxDelay)
+            status = self.strobe(SNOP)
+            current = (status >> 4) & 0x07
+        self._countStateWait(key, started, polls, recoveries, reached)
+        return reached
 
-        while self.gdo0.value == True:
-            pass
-        #detected falling edge
+    def _countStateWait(self, key, started, polls, recoveries, reached):
+        # stateWaits bookkeeping of waitForState() / waitForStateAsync()
+        elapsed = time.monotonic() - started
+        stats = self.stateWaits.get(key)
+        if stats is None:
+            stats = self.stateWaits[key] = {"waits": 0, "time": 0.0, "max": 0.0, "polls": 0, "timeouts": 0, "recoveries": 0}
+        stats["waits"] += 1
+        stats["time"] += elapsed
+        stats["polls"] += polls + 1
+        if elapsed > stats["max"]:
+            stats["max"] = elapsed
+        stats["recoveries"] += recoveries
+        if not reached and not recoveries:
+            stats["timeouts"] += 1
 
-        data_len = length#+2 # add 2 status bytes
-        data = self.readBurst(RXFIFO, data_len)
-        dataStr = ''.join(list(map(lambda x: "{0:0>8}".format(x[2:]), list(map(bin, data)))))
-        newStr = dataStr[8:]
-        print("Data: ", newStr)
+    def idle(self, timeout=STATE_TIMEOUT):
+        # SIDLE and wait for IDLE; a chip that does not get there within timeout
+        # seconds raises RuntimeError instead of hanging the caller
         self.strobe(SIDLE)
-        while (self.readSingleByte(MARCSTATE) != 0x01):
-            pass
-        self.strobe(SFRX)
-        return newStr
+        if not self.waitForState(STATE_IDLE, timeout):
+            raise RuntimeError("radio did not enter IDLE")
 
-    def sendData(self, bitstring, syncword):
-        print("TXBYTES before sendData:", self.readSingleByte(TXBYTES))
-        paddingLen = math.floor((512-16-len(bitstring))/8) # 16 Bits sync word
-        bitstring = paddingLen*"10101010"+"{0:0>16}".format(bin(int(syncword, 16))[2:])+bitstring
+    def stateStats(self):
+        # waitForState() figures as {"FROM -> TO": {"waits", "time", "max",
+        # "polls", "timeouts", "recoveries"}}, times in seconds
+        result = {}
+        for (start, state), stats in self.stateWaits.items():
+            result["%s -> %s" % (STATE_NAMES[start], STATE_NAMES[state])] = stats
+        return result
 
-        #print("the bitstring is", len(bitstring), "bits long")
+    def packetTime(self, length):
+        # Air time in seconds of a packet with length bytes after the sync word
+        return length * 8 / self.getSampleRate()
 
-        data = []
-        for i in range(0,len(bitstring)/8):
-            data.append(int(bitstring[i*8:i*8+8], 2))
+    def enterContinuousRx(self, length, appendStatus=True):
+        # Receive fixed length packets of length bytes one after the other: the
+        # radio goes back to RX after each packet (MCSM1 RXOFF_MODE), with the
+        # RSSI / LQI status bytes appended if appendStatus. Flushes the RX FIFO
+        # and enters RX. Returns the PKTCTRL1, PKTCTRL0, PKTLEN and MCSM1
+        # values for leaveContinuousRx().
+        saved = (self.getRegister(PKTCTRL1), self.getRegister(PKTCTRL0), self.getRegister(PKTLEN), self.getRegister(MCSM1))
+        self.idle()
+        self.strobe(SFRX)
+        if appendStatus:
+            self.setRegister(PKTCTRL1, saved[0] | 0x04) # APPEND_STATUS
+        self.setRegister(PKTCTRL0, saved[1] & 0xFC) # fixed length
+        self.setRegister(PKTLEN, length)
+        self.setRegister(MCSM1, (saved[3] & 0xF3) | OFFMODE_RX << 2)
+        self.flush()
+        self.strobe(SRX)
+        return saved
 
-        self.writeSingleByte(PKTLEN, len(data))
-        
-        self.strobe(SIDLE)
-        while (self.readSingleByte(MARCSTATE) & 0x1F != 0x01): # wait for CC to enter idle state
-            pass
-        self.strobe(SFTX) # flush TX FIFO
-        time.sleep(0.05)
+    def restartRx(self):
+        # Drop whatever is in the RX FIFO and enter RX again; SFRX is only
+        # allowed in IDLE (or RXFIFO_OVERFLOW)
+        self.idle()
+        self.strobe(SFRX)
+        self.strobe(SRX)
 
-        #print(''.join(list(map(lambda x: "{0:0>8}".format(str(bin(x)[2:])), data))))
-        #print("Sending packet of", len(data), "bytes")
-        #print("Data in TXFIFO:\n", self.readBurst(TXFIFO, 64), "\nTXBYTES:", self.readSingleByte(TXBYTES))
-        self.writeBurst(TXFIFO, data)
-        #print("Data in TXFIFO:\n", self.readBurst(TXFIFO, 64), "\nTXBYTES:", self.readSingleByte(TXBYTES))
-        self.strobe(STX)
+    def leaveContinuousRx(self, saved):
+        # Back to IDLE with an empty RX FIFO and the settings from before
+        # enterContinuousRx()
+        self.idle()
+        self.strobe(SFRX)
+        self.setRegister(PKTCTRL1, saved[0])
+        self.setRegister(PKTCTRL0, saved[1])
+        self.setRegister(PKTLEN, saved[2])
+        self.setRegister(MCSM1, saved[3])
+        self.flush()
+
+    def receiveInto(self, buf, length=None, timeout=None):
+        # Receive a packet of length bytes (default len(buf)) straight into buf
+        # (bytearray or memoryview). Returns the number of bytes received, or None
+        # if no packet started within timeout seconds (None waits forever) or it
+        # did not come in completely (counted in rxStats["failed"]).
+        # rxStats["lastBusy"] holds the CPU time (time not spent sleeping) the
+        # packet cost.
+        view = memoryview(buf)
+        if length is None:
+            length = len(view)
+        if length > 64:
+            received = 0
+            for chunk in self.receiveStream(length, timeout):
+                view[received:received + len(chunk)] = chunk
+                received += len(chunk)
+            return received if received == length else None
 
-        remaining_bytes = self.readSingleByte(TXBYTES) & 0x7F
-        while remaining_bytes != 0:
-            time.sleep(0.1)
-            print("Waiting until all bytes are transmited, remaining bytes: %d" % remaining_bytes)
-            remaining_bytes = self.readSingleByte(TXBYTES) & 0x7F
+        started = time.monotonic()
+        slept = self.sleptTime
+        self.setRegister(PKTLEN, length)
+        self.flush()
+        self.strobe(SRX)
 
-        self.strobe(SFTX)
+        received = self.waitForPin(self.gdo0, True, timeout) #detected rising edge
+        if received:
+            # the packet is on the air now, allow twice its air time to finish
+            received = self.waitForPin(self.gdo0, False, 2 * self.packetTime(length) + 0.01)
+            #detected falling edge
+        if received:
+            self.readBurstInto(RXFIFO, view, length)
+        self.idle()
         self.strobe(SFRX)
-        time.sleep(0.05)
+        if not received:
+            self.rxStats["timeouts"] += 1
+            return None
 
-        if (self.readSingleByte(TXBYTES) & 0x7F) == 0:
-            print("Packet sent!\n\n")
-            return True
+        busy = time.monotonic() - started - (self.sleptTime - slept)
+        self.rxStats["packets"] += 1
+        self.rxStats["busy"] += busy
+        self.rxStats["lastBusy"] = busy
+        return length
 
+    def receiveData(self, length, timeout=None):
+        # Bitstring version of receiveInto(): returns the payload as a string of
+        # '0'/'1' characters, or None on timeout.
+        self.debug("receiveData: waiting for %d bytes", length)
+        data = bytearray(length)
+        if self.receiveInto(data, length, timeout) is None:
+            return None
+        newStr = ''.join(["{0:0>8}".format(bin(x)[2:]) for x in data])
+        self.debug("receiveData: %s", newStr)
+        return newStr
+
+    def readRssi(self):
+        # Current signal strength in dBm, valid in RX
+        return rssiToDbm(self.readSingleByte(RSSI))
+
+    def rxFifoBytes(self):
+        # Number of bytes in the RX FIFO. RXBYTES is read until two reads agree,
+        # it can be wrong when read while a byte is being written into the FIFO.
+        count = self.readSingleByte(RXBYTES)
+        while True:
+            again = self.readSingleByte(RXBYTES)
+            if again == count:
+                break
+            count = again
+        if count & 0x80:
+            raise RuntimeError("RX FIFO overflow")
+        return count & 0x7F
+
+    def waitForRxBytes(self, count, timeout):
+        # Poll RXBYTES until count bytes are in the RX FIFO, sleeping roughly the
+        # air time of the missing bytes between reads. Returns False on timeout.
+        deadline = time.monotonic() + timeout
+        available = self.rxFifoBytes()
+        while available < count:
+            if time.monotonic() >= deadline:
+                return False
+            delay = max(self.packetTime(count - available), self.pollMinDelay)
+            time.sleep(delay)
+            self.sleptTime += delay
+            available = self.rxFifoBytes()
+        return True
+
+    def _tailLengthMode(self, pktctrl0, length, position):
+        # Infinite packet length mode: switch to fixed length for the tail once
+        # position (bytes of the packet the chip has sent or received) is less
+        # than 256 bytes from length; PKTLEN holds length % 256. Returns whether
+        # the packet is still in infinite mode.
+        if length % 256 and length - position < 256:
+            self.setRegister(PKTCTRL0, pktctrl0 & 0xFC)
+            self.flush()
+            return False
+        return True
+
+    def receiveStream(self, length=None, timeout=None):
+        # Receive a packet of any length - or, with length None, until the
+        # transmitter stops - draining the RX FIFO while the packet is still
+        # arriving. GDO0 is switched to the RX FIFO threshold signal for this.
+        # Packets longer than 255 bytes use infinite packet length mode, which
+        # is switched to fixed length mode for the last bytes.
+        # Yields memoryview chunks of self.rxChunk, each one is only valid until
+        # the next one is requested. A packet that stalls or overflows the RX
+        # FIFO ends the stream early and is counted in rxStats["failed"], like
+        # a failed send in txStats; nothing is raised.
+        saved, threshold = self._startRxStream(length)
+        infinite = length is None or length > 255
+        received = 0
+        wait = timeout
+        overflow = False
+        try:
+            while length is None or received < length:
+                remaining = None if length is None else length - received
+                if remaining is None or remaining >= threshold:
+                    arrived = self.waitForPin(self.gdo0, True, wait)
+                else:
+                    arrived = self.waitForRxBytes(remaining, 2 * self.packetTime(remaining) + 0.01)
+                if not arrived:
+                    break
+                # once the packet is flowing, the next threshold is at most this far away
+                wait = 2 * self.packetTime(threshold) + 0.01
+                count, infinite = self._readRxChunk(length, received, infinite, saved[2])
+                if count:
+                    received += count
+                    yield memoryview(self.rxChunk)[:count]
+        except RuntimeError: # RX FIFO overflow (rxFifoBytes()), the rest of the packet is lost
+            overflow = True
+        finally:
+            self._finishRxStream(saved)
+        self._countRx(length, received, overflow)
+
+    def _startRxStream(self, length):
+        # receiveStream() up to SRX: GDO0 on the RX FIFO threshold, the packet
+        # length mode. Returns the IOCFG0, FIFOTHR, PKTCTRL0 and PKTLEN values
+        # to restore and the threshold in bytes.
+        if length is not None and length < 4:
+            raise ValueError("use receiveData() for packets shorter than 4 bytes")
+        saved = (self.getRegister(IOCFG0), self.getRegister(FIFOTHR), self.getRegister(PKTCTRL0), self.getRegister(PKTLEN))
+
+        # RX FIFO threshold 4 * (FIFO_THR + 1) bytes, at most half the FIFO and
+        # never more than the packet so GDO0 always asserts
+        threshold = 32 if length is None else min(32, length // 4 * 4)
+        infinite = length is None or length > 255
+        self.setRegister(IOCFG0, 0x00) # asserts at RX FIFO threshold, de-asserts when drained below
+        self.setRegister(FIFOTHR, (saved[1] & 0xF0) | (threshold // 4 - 1))
+        self.setRegister(PKTCTRL0, (saved[2] & 0xFC) | (0x02 if infinite else 0x00))
+        if length is not None:
+            self.setRegister(PKTLEN, length % 256)
+        self.flush()
+        self.strobe(SRX)
+        return saved, threshold
+
+    def _readRxChunk(self, length, received, infinite, pktctrl0):
+        # Read what can be taken from the RX FIFO into rxChunk once GDO0 or
+        # RXBYTES reported data. Returns the byte count (0 if nothing yet) and
+        # whether the packet is still in infinite length mode.
+        available = self.rxFifoBytes()
+        if length is not None and available >= length - received:
+            count = length - received
         else:
-            print(self.readSingleByte(TXBYTES) & 0x7F)
+            count = available - 1 # the FIFO must not be emptied while the packet is arriving
+        if count <= 0:
+            return 0, infinite
+        if infinite and length is not None:
+            infinite = self._tailLengthMode(pktctrl0, length, received + available)
+        self.readBurstInto(RXFIFO, self.rxChunk, count)
+        return count, infinite
+
+    def _countRx(self, length, received, overflow):
+        # rxStats and the warning for a streamed packet, returns whether it came
+        # in completely (with length None: whether anything came)
+        if not received and not overflow:
+            self.rxStats["timeouts"] += 1
+            return False
+        if overflow or (length is not None and received < length):
+            self.rxStats["failed"] += 1
+            self.warning("receiveStream: %s, %d of %s bytes received",
+                         "RX FIFO overflow" if overflow else "packet stalled", received, length)
             return False
+        self.rxStats["packets"] += 1
+        return True
+
+    def _finishRxStream(self, saved):
+        self.idle()
+        self.strobe(SFRX)
+        self.setRegister(IOCFG0, saved[0])
+        self.setRegister(FIFOTHR, saved[1])
+        self.setRegister(PKTCTRL0, saved[2])
+        self.setRegister(PKTLEN, saved[3])
+        self.flush()
+
+    def txFifoBytes(self):
+        # Number of bytes in the TX FIFO, raises on underflow
+        count = self.readSingleByte(TXBYTES)
+        if count & 0x80:
+            raise RuntimeError("TX FIFO underflow")
+        return count & 0x7F
+
+    def sendStream(self, data):
+        # Transmit data (bytes, bytearray or memoryview, sent as-is, so including
+        # any preamble / sync word the chip does not add) of any length as one
+        # packet. The TX FIFO is preloaded, then refilled whenever GDO0 (TX FIFO
+        # threshold signal) reports it drained below the threshold. Packets longer
+        # than 255 bytes use infinite packet length mode, switched to fixed length
+        # for the last bytes. The end of the packet is taken from the GDO0 falling
+        # edge. Returns False if the FIFO was not drained in time or ran empty
+        # (TX FIFO underflow) before the whole packet was written.
+        view = memoryview(data)
+        length = len(view)
+        infinite = length > 255
+        iocfg0, pktctrl0, written = self._startTx(view)
+
+        sent = True
+        underflow = False
+        done = False # back in IDLE with an empty FIFO, nothing to clean up
+        refill = 2 * self.packetTime(64) + 0.01 # a full FIFO drains below the threshold within this
+        try:
+            while True:
+                queued = self.txFifoBytes()
+                if infinite:
+                    infinite = self._tailLengthMode(pktctrl0, length, written - queued)
+                if written == length:
+                    break
+                if not self.waitForPin(self.gdo0, False, refill):
+                    sent = False
+                    break
+                written = self._refillTx(view, written)
+
+            if sent and infinite:
+                # length is a multiple of 256: the packet ends when the FIFO runs
+                # empty, in TXFIFO_UNDERFLOW, which waitForState() flushes to IDLE
+                queued = self.readSingleByte(TXBYTES) & 0x7F
+                sent = self.waitForState(STATE_IDLE, 2 * self.packetTime(queued) + 0.01)
+                done = sent
+            elif sent:
+                # with bytes still queued the packet cannot be over, but it may
+                # not have started yet either (STX still calibrating)
+                if self._endOfPacketSignal():
+                    sent = self.waitForPin(self.gdo0, True, refill)
+                if sent:
+                    sent = self.waitForPin(self.gdo0, False, refill)
+                done = sent
+        except RuntimeError: # TX FIFO underflow (txFifoBytes()), the packet is broken off
+            sent = False
+            underflow = True
+        finally:
+            self._finishTx(done, iocfg0, pktctrl0)
+        return self._countTx(sent, underflow, written, length)
+
+    def _startTx(self, view):
+        # sendStream() up to STX: configure the packet, preload the TX FIFO.
+        # Returns the IOCFG0 and PKTCTRL0 values to restore and the bytes written.
+        length = len(view)
+        iocfg0 = self.getRegister(IOCFG0)
+        pktctrl0 = self.getRegister(PKTCTRL0)
+
+        if (self.strobe(SNOP) >> 4) & 0x07 != STATE_FSTXON or self.txFifoBytes():
+            # unless switchToTX() left the synthesizer running with an empty FIFO
+            self.idle()
+            self.strobe(SFTX) # flush TX FIFO
+
+        self.setRegister(IOCFG0, 0x02) # asserts at TX FIFO threshold, de-asserts when drained below
+        self.setRegister(PKTCTRL0, (pktctrl0 & 0xFC) | (0x02 if length > 255 else 0x00))
+        self.setRegister(PKTLEN, length % 256)
+        self.flush()
+
+        written = min(length, 64)
+        self.writeBurst(TXFIFO, view[:written])
+        self.strobe(STX)
+        return iocfg0, pktctrl0, written
+
+    def _refillTx(self, view, written):
+        # Top the TX FIFO up from view, returns the bytes written so far
+        count = min(64 - self.txFifoBytes(), len(view) - written)
+        self.writeBurst(TXFIFO, view[written:written + count])
+        return written + count
+
+    def _endOfPacketSignal(self):
+        # Everything is written: GDO0 to the sync word / end of packet signal.
+        # Returns the bytes still queued in the TX FIFO.
+        self.setRegister(IOCFG0, 0x06) # asserts on sync word, de-asserts at the end of the packet
+        self.flush()
+        return self.txFifoBytes()
+
+    def _finishTx(self, done, iocfg0, pktctrl0):
+        # done: the packet went out completely, otherwise it is aborted
+        if not done:
+            self.idle()
+            self.strobe(SFTX)
+        self.setRegister(IOCFG0, iocfg0)
+        self.setRegister(PKTCTRL0, pktctrl0)
+        self.flush()
+
+    def _countTx(self, sent, underflow, written, length):
+        # txStats and the warning for a packet that did not go out; returns sent
+        self.txStats["packets" if sent else "failed"] += 1
+        if underflow:
+            self.warning("sendStream: TX FIFO underflow, %d of %d bytes written", written, length)
+        elif not sent:
+            self.warning("sendStream: TX FIFO not drained in time, %d of %d bytes written", written, length)
+        return sent
+
+    def sendBytes(self, payload, syncword=None):
+        # Transmit payload (bytes, bytearray or memoryview) the way sendData() does:
+        # padded to 64 bytes with 0xAA preamble and preceded by the 16 bit sync
+        # word (an int, SYNC1/SYNC0 if not given).
+        return self.sendStream(self.buildFrame(payload, syncword))
+
+    def buildFrame(self, payload, syncword=None):
+        # The frame sendBytes() transmits. It is assembled in the preallocated
+        # txFrame unless the payload is longer than 62 bytes.
+        length = len(payload)
+        if syncword is None:
+            syncword = self.getRegister(SYNC1) << 8 | self.getRegister(SYNC0)
+        frame = self.txFrame if length <= 62 else bytearray(length + 2)
+        start = len(frame) - length - 2
+        for i in range(start):
+            frame[i] = 0xAA
+        frame[start] = syncword >> 8
+        frame[start + 1] = syncword & 0xFF
+        frame[start + 2:] = payload
+        return frame
+
+    def sendData(self, bitstring, syncword):
+        # Bitstring version of sendBytes(), bitstring is a string of '0'/'1'
+        # characters, a last incomplete byte is padded with 0 bits.
+        payload = bytearray((len(bitstring) + 7) // 8)
+        for i in range(len(payload)):
+            payload[i] = int("{0:0<8}".format(bitstring[i*8:i*8+8]), 2)
+
+        self.debug("sendData: %d bytes", len(payload))
+        sent = self.sendBytes(payload, int(syncword, 16)) # sendStream() warns on failure
+        if sent:
+            self.debug("sendData: packet sent")
+        return sent
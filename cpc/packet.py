@@ -0,0 +1,224 @@
+# The CC1101's own packet engine: variable packet length, CRC with RX FIFO
+# autoflush, address filtering and data whitening. With these on the chip
+# drops bad and foreign packets itself - they never reach the RX FIFO - so
+# they cost neither SPI transfers nor Python time.
+#
+#   fmt = PacketFormat(address=0x12, crc=True, whitening=True)
+#   fmt.apply(radio) # kept by setupRX() / setupTX() until fmt.remove(radio)
+#   radio.setupTX()
+#   fmt.send(radio, b"hello", address=0x34)
+#   radio.setupRX()
+#   length = fmt.receive(radio, buf, timeout=1.0) # payload in buf[:length]
+#
+# On air a packet is: preamble, sync word, [length], [address], payload,
+# [CRC16], everything after the sync word whitened if enabled. The length byte
+# counts the address and payload. The raw sendBytes() / receiveInto() calls
+# do not go through the packet engine, use them with the format removed.
+
+import time
+
+from cpc.cpc import *
+
+ADDRESS_BROADCAST_00 = 2 # PKTCTRL1.ADR_CHK: also accept address 0x00
+ADDRESS_BROADCAST_FF = 3 # also accept 0x00 and 0xFF
+
+
+def _pn9(count):
+    # The CC1101's PN9 whitening sequence (x^9 + x^5 + 1, seeded with all ones)
+    key = 0x1FF
+    sequence = bytearray(count)
+    for i in range(count):
+        sequence[i] = key & 0xFF
+        for _ in range(8):
+            bit = (key ^ (key >> 5)) & 1
+            key = (key >> 1) | (bit << 8)
+    return bytes(sequence)
+
+
+PN9 = _pn9(258) # length byte, 255 more bytes, CRC
+
+
+def crcUpdate(crc, byte):
+    # CRC16 of the packet engine (polynomial 0x8005, MSB first), one byte
+    crc ^= byte << 8
+    for _ in range(8):
+        if crc & 0x8000:
+            crc = ((crc << 1) ^ 0x8005) & 0xFFFF
+        else:
+            crc = (crc << 1) & 0xFFFF
+    return crc
+
+
+def crc16(data, crc=0xFFFF):
+    for byte in data:
+        crc = crcUpdate(crc, byte)
+    return crc
+
+
+def whiten(data):
+    # XOR data with the whitening sequence, in place; whitening twice undoes it
+    for i in range(len(data)):
+        data[i] ^= PN9[i]
+    return data
+
+
+class PacketFormat:
+    def __init__(self, maxLength=None, variableLength=True, crc=True, autoflush=True,
+                 address=None, broadcast=0, whitening=True, appendStatus=True):
+        # maxLength: longest payload (without the address byte), by default as
+        # much as fits the FIFO; with variableLength the chip drops longer
+        # packets, otherwise every packet is exactly maxLength bytes. address: this radio's address, packets to
+        # other addresses are dropped; broadcast: ADDRESS_BROADCAST_00 / _FF to
+        # also accept those. autoflush drops packets with a bad CRC.
+        # appendStatus: RSSI, LQI and CRC_OK of each packet come with it and
+        # are kept in self.rssi / self.lqi / self.crcOk.
+        self.addressed = address is not None
+        if maxLength is None:
+            maxLength = 64 - (1 if variableLength else 0) - (1 if self.addressed else 0) - (2 if appendStatus else 0)
+        length = maxLength + (1 if self.addressed else 0)
+        if length + (1 if variableLength else 0) + (2 if appendStatus else 0) > 64:
+            raise ValueError("packets must fit the 64 byte FIFOs")
+        self.maxLength = maxLength
+        self.variableLength = variableLength
+        self.crc = crc
+        self.autoflush = autoflush and crc
+        self.address = address or 0
+        self.whitening = whitening
+        self.appendStatus = appendStatus
+        pktctrl1 = 0x04 if appendStatus else 0x00
+        if self.autoflush:
+            pktctrl1 |= 0x08
+        if self.addressed:
+            pktctrl1 |= broadcast or 1
+        self.registers = {
+            PKTCTRL1: pktctrl1,
+            PKTCTRL0: (0x40 if whitening else 0) | (0x04 if crc else 0) | (0x01 if variableLength else 0),
+            PKTLEN: length,
+            ADDR: self.address,
+        }
+        self.txBuffer = bytearray(64)
+        self.rxBuffer = bytearray(64)
+        self.rssi = 0
+        self.lqi = 0
+        self.crcOk = 0
+        self.stats = {"sent": 0, "received": 0, "dropped": 0, "timeouts": 0}
+
+    def apply(self, radio):
+        # Pin the packet format registers (and 16 bit sync word generation for
+        # TX), so that profile changes keep them
+        for address in self.registers:
+            radio.fixedBits[address] = (0xFF, self.registers[address])
+            radio.setRegister(address, self.registers[address])
+        radio.fixedBits[MDMCFG2] = (0x07, 0x02)
+        radio.setRegister(MDMCFG2, (radio.getRegister(MDMCFG2) & 0xF8) | 0x02)
+        radio.flush()
+
+    def remove(self, radio):
+        # Back to the profile's packet settings
+        for address in self.registers:
+            radio.fixedBits.pop(address, None)
+        radio.fixedBits.pop(MDMCFG2, None)
+        if radio.profile is not None:
+            radio.writeProfile(radio.profile)
+
+    def send(self, radio, payload, address=None):
+        # Transmit payload as one packet (to address, this format's address if
+        # not given). Returns False if it was not sent in time.
+        length = len(payload)
+        if length > self.maxLength or (not self.variableLength and length != self.maxLength):
+            raise ValueError("payload length does not match the packet format")
+        frame = self.txBuffer
+        position = 0
+        if self.variableLength:
+            frame[0] = length + (1 if self.addressed else 0)
+            position = 1
+        if self.addressed:
+            frame[position] = self.address if address is None else address
+            position += 1
+        frame[position:position + length] = payload
+        position += length
+
+        radio.idle()
+        radio.strobe(SFTX)
+        radio.writeBurst(TXFIFO, memoryview(frame)[:position])
+        radio.strobe(STX)
+        # IOCFG0 0x06: asserts on sync word, de-asserts at the end of the packet;
+        # once the FIFO is empty the packet is on air, even if the pin is low
+        timeout = 2 * radio.packetTime(position + 8) + 0.01
+        sent = True
+        if radio.txFifoBytes():
+            sent = radio.waitForPin(radio.gdo0, True, timeout)
+        sent = sent and radio.waitForPin(radio.gdo0, False, timeout)
+        if sent:
+            self.stats["sent"] += 1
+        return sent
+
+    def receive(self, radio, buf, timeout=None):
+        # Receive the next packet that passes the chip's filters into buf.
+        # Returns the payload length (address byte not included), or None if
+        # none arrived within timeout seconds.
+        view = memoryview(buf)
+        rx = memoryview(self.rxBuffer)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        header = (1 if self.variableLength else 0) + (1 if self.addressed else 0)
+        status = 2 if self.appendStatus else 0
+        radio.strobe(SRX)
+        try:
+            while True:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                if not radio.waitForPin(radio.gdo0, True, remaining): # sync word
+                    self.stats["timeouts"] += 1
+                    return None
+                if not radio.waitForPin(radio.gdo0, False, 2 * radio.packetTime(64) + 0.01):
+                    self.stats["timeouts"] += 1
+                    return None
+                try:
+                    available = radio.rxFifoBytes()
+                except RuntimeError: # RX FIFO overflow, dropped like a partial packet below
+                    available = -1
+                if available == 0:
+                    # dropped by the chip (CRC, address or length); the
+                    # address filter restarts RX itself, the others do not
+                    self.stats["dropped"] += 1
+                    if (radio.strobe(SNOP) >> 4) & 0x07 != STATE_RX:
+                        radio.strobe(SRX)
+                    continue
+                if available > 0:
+                    radio.readBurstInto(RXFIFO, rx, available)
+                if self.variableLength:
+                    length = rx[0] - (1 if self.addressed else 0)
+                else:
+                    length = self.maxLength
+                if available < 0 or length < 0 or header + length + status > available:
+                    # a partial packet, e.g. after an RX FIFO overflow
+                    self.stats["dropped"] += 1
+                    radio.restartRx()
+                    continue
+                view[:length] = rx[header:header + length]
+                if status:
+                    self.rssi = rssiToDbm(rx[header + length])
+                    self.lqi = rx[header + length + 1] & 0x7F
+                    self.crcOk = rx[header + length + 1] >> 7
+                self.stats["received"] += 1
+                return length
+        finally:
+            radio.idle()
+            radio.strobe(SFRX)
+
+    def encode(self, payload, address=None):
+        # The bytes this format puts on air after the sync word, for example to
+        # inject into the simulator
+        length = len(payload)
+        data = bytearray()
+        if self.variableLength:
+            data.append(length + (1 if self.addressed else 0))
+        if self.addressed:
+            data.append(self.address if address is None else address)
+        data.extend(payload)
+        if self.crc:
+            crc = crc16(data)
+            data.append(crc >> 8)
+            data.append(crc & 0xFF)
+        if self.whitening:
+            whiten(data)
+        return bytes(data)
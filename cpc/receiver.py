@@ -0,0 +1,146 @@
+# Continuous reception: the radio stays in RX (MCSM1.RXOFF_MODE) so it is never
+# deaf between packets, and complete packets are drained from the RX FIFO into
+# a bounded queue - a CaptureRing, with RSSI / LQI / CRC_OK per packet - that
+# consumers take them from at their own pace.
+#
+#   receiver = Receiver(radio, 25, capacity=16)
+#   asyncio.create_task(receiver.run())
+#   length = await receiver.getAsync(buf) # payload in buf[:length]
+#
+# or without asyncio, call receiver.start() once and receiver.poll() often
+# enough that the 64 byte RX FIFO never fills, and receiver.get(buf).
+#
+# When the queue is full, FULL_DROP reads new packets from the chip and drops
+# them, FULL_OVERWRITE drops the oldest queued one instead and FULL_WAIT leaves
+# them in the RX FIFO (backpressure) until the consumer makes room - which only
+# buys the few packets the FIFO holds before it overflows.
+
+import time
+
+try:
+    import asyncio
+except ImportError: # CircuitPython without the asyncio library
+    asyncio = None
+
+from cpc.cpc import *
+from cpc.capture import CaptureRing
+
+FULL_DROP = 0
+FULL_OVERWRITE = 1
+FULL_WAIT = 2
+
+SERVICE_LEVEL = 32 # RX FIFO bytes at which run() polls, half the FIFO left as margin
+
+
+class Receiver:
+    def __init__(self, radio, length, capacity=16, whenFull=FULL_DROP):
+        # length: fixed packet length, up to 62 bytes so that a packet and its
+        # two status bytes fit the RX FIFO
+        if not 0 < length <= 62:
+            raise ValueError("Receiver packets are 1..62 bytes")
+        self.radio = radio
+        self.length = length
+        self.slot = length + 2 # payload and the appended RSSI / LQI
+        self.whenFull = whenFull
+        self.queue = CaptureRing(capacity, length)
+        self.scratch = bytearray(self.slot) # dropped packets are read into this
+        self.running = False
+        self.saved = None
+        self.rssi = 0 # of the packet get() returned last
+        self.lqi = 0
+        self.timestamp = 0.0
+        self.stats = {"received": 0, "dropped": 0, "overwritten": 0, "backpressure": 0, "overflows": 0, "polls": 0}
+
+    def start(self):
+        # Configure the radio (fixed length, APPEND_STATUS, RXOFF_MODE RX) and enter RX
+        self.saved = self.radio.enterContinuousRx(self.length)
+        self.running = True
+
+    def stop(self):
+        # Back to IDLE and the previous settings; queued packets stay queued
+        self.running = False
+        if self.saved is None:
+            return
+        self.radio.leaveContinuousRx(self.saved)
+        self.saved = None
+
+    def poll(self):
+        # Move the complete packets in the RX FIFO to the queue. Returns the
+        # number of bytes left in the FIFO.
+        radio = self.radio
+        stats = self.stats
+        queue = self.queue
+        stats["polls"] += 1
+        try:
+            available = radio.rxFifoBytes()
+        except RuntimeError: # RX FIFO overflow, whatever was in it is lost
+            stats["overflows"] += 1
+            radio.restartRx()
+            return 0
+        now = time.monotonic() # packets are stamped with the poll, not the sync word
+        while available >= self.slot:
+            if len(queue) == queue.capacity:
+                if self.whenFull == FULL_WAIT:
+                    stats["backpressure"] += 1
+                    break
+                if self.whenFull == FULL_DROP:
+                    radio.readBurstInto(RXFIFO, self.scratch, self.slot)
+                    available -= self.slot
+                    stats["received"] += 1
+                    stats["dropped"] += 1
+                    continue
+                stats["overwritten"] += 1 # reserve() takes the oldest slot
+            index = queue.reserve()
+            view = queue.views[index]
+            radio.readBurstInto(RXFIFO, view, self.slot)
+            available -= self.slot
+            status = view[self.length + 1]
+            queue.commit(index, self.length, now, rssiToDbm(view[self.length]), status & 0x7F, status >> 7, 0)
+            stats["received"] += 1
+        return available
+
+    def get(self, buf):
+        # Copy the oldest queued payload into buf, returns its length or None
+        # if the queue is empty. Its metadata is in self.rssi / lqi / timestamp.
+        queue = self.queue
+        if not len(queue):
+            return None
+        index = queue.oldest()
+        length = queue.lengths[index]
+        memoryview(buf)[:length] = queue.payload(index)
+        self.rssi = queue.rssi[index]
+        self.lqi = queue.lqi[index]
+        self.timestamp = queue.timestamps[index]
+        queue.count -= 1
+        return length
+
+    def interval(self, level):
+        # Time until the RX FIFO, now holding level bytes, needs draining
+        byteTime = 8 / self.radio.getSampleRate()
+        return max((SERVICE_LEVEL - level) * byteTime, self.radio.pollMinDelay)
+
+    async def run(self, duration=None):
+        # Keep receiving until stop() or for duration seconds, polling the RX
+        # FIFO whenever it may have reached SERVICE_LEVEL bytes
+        if asyncio is None:
+            raise RuntimeError("asyncio is not available")
+        if not self.running:
+            self.start()
+        started = time.monotonic()
+        try:
+            while self.running and (duration is None or time.monotonic() - started < duration):
+                level = self.poll()
+                await asyncio.sleep(self.interval(level))
+        finally:
+            self.stop()
+
+    async def getAsync(self, buf, timeout=None):
+        # get(), waiting up to timeout seconds (None: forever) for a packet
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            length = self.get(buf)
+            if length is not None:
+                return length
+            if not self.running or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            await asyncio.sleep(self.interval(0))
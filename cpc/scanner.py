@@ -0,0 +1,154 @@
+# RSSI sweeps, to find active transmitters without an SDR. The radio steps
+# through a list of channels (CHANNR) or frequencies (FREQ2..FREQ0) and samples
+# the RSSI status register at each step.
+#
+#   scanner = Scanner(radio, frequencies=range(433050000, 434790000, 25000))
+#   levels = scanner.sweep() # array('h') of dBm, one per step
+#   scanner.sweepsPerSecond()
+#
+# The synthesizer is calibrated once per step and the calibration cached, so a
+# step does not have to recalibrate. Every step is a single SPI transaction of
+# consecutive single accesses (CS stays low between them): read the RSSI of the
+# previous step, SIDLE, write the channel or frequency and the cached
+# FSCAL3..FSCAL1, SRX. The transactions are compiled into one buffer up front,
+# so a sweep does not allocate.
+#
+# For this the first sweep turns autocalibration off (disableAutocal(), kept
+# by writeProfile()) and leaves the radio tuned to the last step. finish()
+# puts back the frequency or channel, MCSM0 and the fixed bits from before,
+# or use the scanner as a context manager:
+#
+#   with Scanner(radio, channels=range(20)) as scanner:
+#       levels = scanner.sweep()
+
+import time
+from array import array
+
+from cpc.cpc import *
+
+
+class Scanner:
+    def __init__(self, radio, frequencies=None, channels=None, dwell=0.0005, offset=0):
+        # Either frequencies (Hz) or channels (CHANNR values on the current base
+        # frequency). dwell: time in RX before RSSI is sampled, it has to cover
+        # the synthesizer settling and the RSSI response time of the channel filter.
+        if (frequencies is None) == (channels is None):
+            raise ValueError("pass either frequencies or channels")
+        self.radio = radio
+        self.dwell = dwell
+        self.steps = []
+        if channels is not None:
+            for channel in channels:
+                self.steps.append(((CHANNR, channel),))
+        else:
+            for frequency in frequencies:
+                word = frequencyWord(frequency, offset)
+                self.steps.append(((FREQ2, (word >> 16) & 0xFF), (FREQ1, (word >> 8) & 0xFF), (FREQ0, word & 0xFF)))
+        self.readings = array('h', [0] * len(self.steps))
+        self.program = None
+        self.saved = None # what prepare() changed, see finish()
+        self.stepLength = 0
+        self.sweeps = 0
+        self.sweepTime = 0.0
+        self.lastSweep = 0.0
+
+    def prepare(self):
+        # Calibrate every step and compile the per step transactions, done by the
+        # first sweep()
+        radio = self.radio
+        fixed = {}
+        for address in (MCSM0, FSCAL3, FSCAL2, FSCAL1):
+            fixed[address] = radio.fixedBits.get(address)
+        tuned = [(address, radio.getRegister(address)) for address, _ in self.steps[0]]
+        self.saved = (fixed, radio.getRegister(MCSM0), tuned)
+        radio.disableAutocal()
+        program = bytearray()
+        for assignments in self.steps:
+            for address, value in assignments:
+                radio.setRegister(address, value)
+            calibration = radio.calibrate() # flushes the assignments first
+            program.extend((RSSI | READ_BURST, 0x00, SIDLE))
+            for address, value in assignments:
+                program.extend((WRITE_SINGLE_BYTE | address, value))
+            program.extend((FSCAL3, calibration[0], FSCAL2, calibration[1], FSCAL1, calibration[2], SRX))
+        self.stepLength = len(program) // len(self.steps)
+        # and a last transaction that reads the RSSI of the last step and stops RX
+        program.extend((RSSI | READ_BURST, 0x00, SIDLE))
+        self.program = program
+        self.miso = bytearray(len(program))
+
+    def sweep(self):
+        # One pass over all steps, returns self.readings (overwritten by the next sweep)
+        if self.program is None:
+            self.prepare()
+        started = time.monotonic()
+        program = self.program
+        miso = self.miso
+        readings = self.readings
+        length = self.stepLength
+        dwell = self.dwell
+        device = self.radio.device
+        count = len(readings)
+        start = 0
+        for step in range(count + 1):
+            end = start + length if step < count else len(program)
+            with device as d:
+                d.write_readinto(program, miso, out_start=start, out_end=end, in_start=start, in_end=end)
+            if step:
+                readings[step - 1] = rssiToDbm(miso[start + 1])
+            if step < count:
+                time.sleep(dwell)
+            start = end
+
+        # the sweep wrote CHANNR / FREQ and FSCAL behind the shadow's back
+        self.radio.invalidateShadow(self.steps[0][0][0], self.steps[0][-1][0])
+        self.radio.invalidateShadow(FSCAL3, FSCAL1)
+        elapsed = time.monotonic() - started
+        self.sweeps += 1
+        self.sweepTime += elapsed
+        self.lastSweep = elapsed
+        return readings
+
+    def finish(self):
+        # Undo prepare(): the frequency or channel from before the first sweep,
+        # MCSM0 (autocalibration) and the fixed bits writeProfile() keeps. The
+        # next sweep() prepares again.
+        if self.saved is None:
+            return
+        radio = self.radio
+        fixed, mcsm0, tuned = self.saved
+        radio.idle()
+        for address in fixed:
+            if fixed[address] is None:
+                radio.fixedBits.pop(address, None)
+            else:
+                radio.fixedBits[address] = fixed[address]
+        for address, value in tuned:
+            radio.setRegister(address, value)
+        radio.setRegister(MCSM0, mcsm0)
+        radio.flush()
+        if MCSM0 in radio.fixedBits:
+            radio.loadCalibration() # autocalibration was off before as well
+        self.saved = None
+        self.program = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish()
+        return False
+
+    def sweepsPerSecond(self):
+        if not self.sweepTime:
+            return 0.0
+        return self.sweeps / self.sweepTime
+
+    def frequencyOf(self, step):
+        # Frequency in Hz of a step, e.g. of the strongest reading
+        assignments = dict(self.steps[step])
+        if CHANNR in assignments:
+            spacing = (256 + self.radio.getRegister(MDMCFG0)) * pow(2, self.radio.getRegister(MDMCFG1) & 0x03) * 26000000 / pow(2, 18)
+            base = self.radio.getRegister(FREQ2) << 16 | self.radio.getRegister(FREQ1) << 8 | self.radio.getRegister(FREQ0)
+            return base * 26000000 / 65536 + assignments[CHANNR] * spacing
+        return (assignments[FREQ2] << 16 | assignments[FREQ1] << 8 | assignments[FREQ0]) * 26000000 / 65536
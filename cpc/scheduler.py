@@ -0,0 +1,286 @@
+# Cooperative scheduler for several CC1101 radios on one SPI bus (one CS pin
+# each). The blocking receive / send methods service a single radio at a time;
+# here every radio gets a task that only does the SPI work that is due right
+# now - drain its RX FIFO, refill its TX FIFO - and the scheduler runs the task
+# whose FIFO is closest to overflowing / underflowing first, sleeping with
+# asyncio in between so other coroutines keep running. Works with asyncio on
+# CPython and CircuitPython.
+#
+#   scheduler = Scheduler()
+#   rx = scheduler.add(RxTask(radio1, 32))
+#   tx = scheduler.add(TxTask(radio2, frames))
+#   asyncio.run(scheduler.run(duration=10))
+#   scheduler.report() # bus utilization and missed deadlines per radio
+#
+# A deadline is missed when a task is serviced after its FIFO may already have
+# overflowed (RX) or run empty (TX), or when the chip reports that it did.
+
+import time
+
+try:
+    import asyncio
+except ImportError: # CircuitPython without the asyncio library
+    asyncio = None
+
+from cpc.cpc import *
+
+RX_SERVICE_LEVEL = 48 # RX FIFO bytes at which a drain is due
+TX_SERVICE_LEVEL = 16 # TX FIFO bytes at which a refill is due
+
+
+class RadioTask:
+    def __init__(self, radio, name=None, rate=None):
+        # rate: data rate in baud the FIFO deadlines are computed from, by default
+        # the radio's configured one
+        self.radio = radio
+        self.name = name
+        self.rate = rate
+        self.byteTime = 0.0
+        self.due = 0.0 # when service() should run next
+        self.deadline = None # when the FIFO overflows / underflows at the latest, None: no risk
+        self.done = False
+        self.services = 0
+        self.busTime = 0.0 # time spent in service()
+        self.missed = 0
+
+    def start(self, now):
+        self.byteTime = 8 / (self.rate or self.radio.getSampleRate())
+
+    def service(self, now):
+        pass
+
+    def stop(self):
+        pass
+
+    def stats(self, elapsed):
+        return {
+            "services": self.services,
+            "busTime": self.busTime,
+            "utilization": self.busTime / elapsed if elapsed else 0.0,
+            "missed": self.missed,
+        }
+
+
+class RxTask(RadioTask):
+    # Continuous reception of fixed length packets (up to 255 bytes): the radio
+    # stays in RX after a packet (MCSM1.RXOFF_MODE) and the RX FIFO is drained by
+    # polling RXBYTES. Packets go to onPacket(memoryview) if given, otherwise
+    # they are appended to self.packets (as bytes).
+
+    def __init__(self, radio, length, count=None, onPacket=None, name=None, rate=None):
+        if not 0 < length <= 255:
+            raise ValueError("RxTask packets are 1..255 bytes")
+        RadioTask.__init__(self, radio, name, rate)
+        self.length = length
+        self.count = count # stop after this many packets, None: run until stopped
+        self.onPacket = onPacket
+        self.packets = []
+        self.received = 0 # packets
+        self.overflows = 0
+        self.buffer = bytearray(length)
+        self.position = 0 # bytes of the current packet received
+
+    def start(self, now):
+        RadioTask.start(self, now)
+        self.saved = self.radio.enterContinuousRx(self.length, appendStatus=False)
+        self.schedule(now, 0)
+
+    def schedule(self, now, level):
+        self.due = now + (RX_SERVICE_LEVEL - level) * self.byteTime
+        self.deadline = now + (64 - level) * self.byteTime
+
+    def restart(self):
+        self.radio.restartRx()
+        self.position = 0
+
+    def service(self, now):
+        radio = self.radio
+        try:
+            available = radio.rxFifoBytes()
+        except RuntimeError: # RX FIFO overflow, the packet is lost
+            self.overflows += 1
+            self.missed += 1
+            self.restart()
+            self.schedule(now, 0)
+            return
+        view = memoryview(self.buffer)
+        while available:
+            remaining = self.length - self.position
+            if available >= remaining:
+                count = remaining
+            else:
+                count = available - 1 # the FIFO must not be emptied while the packet is arriving
+                if count <= 0:
+                    break
+            radio.readBurstInto(RXFIFO, view[self.position:], count)
+            self.position += count
+            available -= count
+            if self.position == self.length:
+                self.position = 0
+                self.received += 1
+                if self.onPacket is not None:
+                    self.onPacket(view)
+                else:
+                    self.packets.append(bytes(self.buffer))
+                if self.count is not None and self.received >= self.count:
+                    self.done = True
+                    return
+        self.schedule(now, available)
+
+    def stop(self):
+        self.radio.leaveContinuousRx(self.saved)
+
+    def stats(self, elapsed):
+        stats = RadioTask.stats(self, elapsed)
+        stats["packets"] = self.received
+        stats["overflows"] = self.overflows
+        return stats
+
+
+class TxTask(RadioTask):
+    # Sends frames (bytes, bytearray or memoryview, sent as-is like sendStream())
+    # one after the other, refilling the TX FIFO when it runs low. More frames
+    # can be appended to self.frames while the task runs; the task is done when
+    # the list is empty.
+
+    def __init__(self, radio, frames, name=None, rate=None):
+        RadioTask.__init__(self, radio, name, rate)
+        self.frames = list(frames)
+        self.sent = 0 # frames
+        self.underflows = 0
+        self.frame = None
+        self.written = 0
+        self.infinite = False
+
+    def start(self, now):
+        RadioTask.start(self, now)
+        self.saved = self.radio.getRegister(PKTCTRL0)
+        self.next(now)
+
+    def next(self, now):
+        # Start the next frame
+        if not self.frames:
+            self.frame = None
+            self.done = True
+            return
+        radio = self.radio
+        self.frame = memoryview(self.frames.pop(0))
+        length = len(self.frame)
+        self.infinite = length > 255
+        radio.idle()
+        radio.strobe(SFTX)
+        radio.setRegister(PKTCTRL0, (self.saved & 0xFC) | (0x02 if self.infinite else 0x00))
+        radio.setRegister(PKTLEN, length % 256)
+        radio.flush()
+        self.written = min(length, 64)
+        radio.writeBurst(TXFIFO, self.frame[:self.written])
+        radio.strobe(STX)
+        self.schedule(now, self.written)
+
+    def schedule(self, now, queued):
+        if self.written < len(self.frame):
+            self.due = now + max(0, queued - TX_SERVICE_LEVEL) * self.byteTime
+            self.deadline = now + queued * self.byteTime
+        else:
+            # everything is queued, check back when the packet should be out
+            self.due = now + (queued + 1) * self.byteTime
+            self.deadline = None
+
+    def service(self, now):
+        radio = self.radio
+        length = len(self.frame)
+        try:
+            queued = radio.txFifoBytes()
+        except RuntimeError: # TX FIFO underflow, the frame is broken off
+            self.underflows += 1
+            self.missed += 1
+            self.next(now)
+            return
+        if self.infinite and length % 256 and length - (self.written - queued) < 256:
+            radio.setRegister(PKTCTRL0, self.saved & 0xFC) # fixed length for the tail
+            radio.flush()
+            self.infinite = False
+        if self.written < length:
+            count = min(64 - queued, length - self.written)
+            radio.writeBurst(TXFIFO, self.frame[self.written:self.written + count])
+            self.written += count
+            queued += count
+        elif queued == 0 and (radio.strobe(SNOP) >> 4) & 0x07 != STATE_TX:
+            self.sent += 1
+            self.next(now)
+            return
+        self.schedule(now, queued)
+
+    def stop(self):
+        radio = self.radio
+        radio.idle() # SFTX is only allowed in IDLE
+        radio.strobe(SFTX)
+        radio.setRegister(PKTCTRL0, self.saved)
+        radio.flush()
+
+    def stats(self, elapsed):
+        stats = RadioTask.stats(self, elapsed)
+        stats["frames"] = self.sent
+        stats["underflows"] = self.underflows
+        return stats
+
+
+class Scheduler:
+    def __init__(self):
+        if asyncio is None:
+            raise RuntimeError("asyncio is not available")
+        self.tasks = []
+        self.started = None
+        self.elapsed = 0.0
+
+    def add(self, task):
+        self.tasks.append(task)
+        if self.started is not None:
+            task.start(time.monotonic())
+        return task
+
+    def pick(self, now):
+        # Earliest deadline first among the tasks that are due, otherwise the
+        # task that becomes due first
+        urgent = None
+        waiting = None
+        for task in self.tasks:
+            if task.done:
+                continue
+            if task.due <= now:
+                if urgent is None or (task.deadline is not None and
+                                      (urgent.deadline is None or task.deadline < urgent.deadline)):
+                    urgent = task
+            elif waiting is None or task.due < waiting.due:
+                waiting = task
+        return urgent or waiting
+
+    async def run(self, duration=None):
+        # Service the tasks until all of them are done or duration seconds passed
+        self.started = time.monotonic()
+        for task in self.tasks:
+            task.start(time.monotonic())
+        try:
+            while True:
+                now = time.monotonic()
+                task = self.pick(now)
+                if task is None or (duration is not None and now - self.started >= duration):
+                    break
+                if task.due > now:
+                    await asyncio.sleep(task.due - now)
+                    continue
+                if task.deadline is not None and now > task.deadline:
+                    task.missed += 1
+                task.service(now)
+                task.services += 1
+                task.busTime += time.monotonic() - now
+                await asyncio.sleep(0) # let other coroutines run
+        finally:
+            for task in self.tasks:
+                task.stop()
+            self.elapsed = time.monotonic() - self.started
+
+    def report(self):
+        # [(name, stats)] per task, utilization is the share of the run time the
+        # task kept the bus (and the CPU) busy
+        return [(task.name or "radio%d" % i, task.stats(self.elapsed)) for i, task in enumerate(self.tasks)]
@@ -0,0 +1,808 @@
+# Simulated CC1101, so the driver can be run, profiled and benchmarked on a plain
+# CPython box without a radio attached:
+#
+#   chip = SimCC1101()
+#   radio = CC1101(None, None, chip.gdo0, 50000, 434400000, "666A", device=chip.device)
+#
+# or radio, chip = simulatedRadio(). SimCC1101 models the register file, the SPI
+# header decoding (R/W and burst bits, chip status byte), the 64 byte RX and TX
+# FIFOs, the main radio state machine (MARCSTATE) with calibration and settling
+# times, TXBYTES/RXBYTES, the packet engine (preamble, sync word, fixed, variable
+# and infinite packet length, address check, CRC with autoflush, whitening,
+# appended status bytes), Wake-on-Radio and the GDO0/GDO2 signals.
+# Everything is timed by the configured data rate.
+#
+# Radios share a SimAir: what one of them transmits is received by the others if
+# frequency and data rate match. SimCC1101.inject() puts a frame on the air
+# without a second radio.
+
+import time
+
+from cpc.cpc import *
+from cpc.packet import PN9, crcUpdate
+from cpc.wor import worTiming
+
+FXOSC = 26000000
+
+CALIBRATION_TIME = 0.000721 # synthesizer calibration (IDLE -> RX/TX with FS_AUTOCAL, SCAL)
+SETTLING_TIME = 0.0000884 # IDLE -> RX/TX/FSTXON without calibration
+SWITCH_TIME = 0.0000313 # RX <-> TX, FSTXON -> TX
+
+NOISE_FLOOR = -100 # dBm, RSSI without a signal
+
+NUM_PREAMBLE = (2, 3, 4, 6, 8, 12, 16, 24) # MDMCFG1.NUM_PREAMBLE
+
+# chip status byte STATE field per MARCSTATE
+STATUS_STATE = {
+    MARCSTATE_IDLE: 0,
+    MARCSTATE_RX: 1, MARCSTATE_RX_END: 1, MARCSTATE_RX_RST: 1,
+    MARCSTATE_TX: 2, MARCSTATE_TX_END: 2,
+    MARCSTATE_FSTXON: 3,
+    MARCSTATE_STARTCAL: 4,
+    MARCSTATE_FS_LOCK: 5, MARCSTATE_TXRX_SWITCH: 5, MARCSTATE_RXTX_SWITCH: 5,
+    MARCSTATE_RXFIFO_OVERFLOW: 6,
+    MARCSTATE_TXFIFO_UNDERFLOW: 7,
+}
+
+
+class SimAir:
+    # The shared medium. Owns the clock, which can run faster than real time
+    # (timeScale 10: one second of wall time is ten seconds on the air).
+
+    def __init__(self, timeScale=1.0):
+        self.timeScale = timeScale
+        self.epoch = time.monotonic()
+        self.chips = []
+        self.frames = []
+        self.cpuTime = 0.0 # process time spent simulating, to tell it from the driver's
+
+    def now(self):
+        return (time.monotonic() - self.epoch) * self.timeScale
+
+    def advance(self):
+        started = time.process_time()
+        now = self.now()
+        # transmitters first, so receivers see the bytes sent up to now
+        for chip in self.chips:
+            if chip.frame is not None:
+                chip.advance(now)
+        for chip in self.chips:
+            if chip.frame is None:
+                chip.advance(now)
+        # frames that ended a while ago cannot be received any more
+        while self.frames and self.frames[0].complete and self.frames[0].end() < now - 1.0:
+            self.frames.pop(0)
+        self.cpuTime += time.process_time() - started
+        return now
+
+
+class SimFrame:
+    # One transmission: data[k] is on the air from start + k * byteTime to
+    # start + (k + 1) * byteTime. frequency is None if the transmitter's
+    # synthesizer was not calibrated for its frequency.
+
+    def __init__(self, start, rate, frequency, rssi, source=None, data=b"", complete=False):
+        self.start = start
+        self.rate = rate
+        self.byteTime = 8 / rate
+        self.frequency = frequency
+        self.rssi = rssi
+        self.source = source
+        self.data = bytearray(data)
+        self.complete = complete
+
+    def end(self):
+        return self.start + len(self.data) * self.byteTime
+
+
+class SimPin:
+    # Read-only DigitalInOut stand-in for a GDOx pin
+    def __init__(self, chip, iocfg):
+        self.chip = chip
+        self.iocfg = iocfg
+
+    @property
+    def value(self):
+        self.chip.sync()
+        return self.chip.gdo(self.iocfg)
+
+    def deinit(self):
+        pass
+
+
+class SimSPIDevice:
+    # SPIDevice stand-in: every "with device as d:" block is one transaction
+    # (CS low ... CS high). Counts transactions and bytes on the bus.
+
+    def __init__(self, chip):
+        self.chip = chip
+        self.transactions = 0
+        self.bytesOut = 0
+        self.bytesIn = 0
+
+    def resetCounters(self):
+        self.transactions = 0
+        self.bytesOut = 0
+        self.bytesIn = 0
+
+    def __enter__(self):
+        self.transactions += 1
+        self.chip.select()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.chip.deselect()
+        return False
+
+    # busio.SPI interface (while loops, so that the simulator itself does not
+    # allocate per byte)
+
+    def write(self, buf, start=0, end=None):
+        if end is None:
+            end = len(buf)
+        self.bytesOut += end - start
+        self.bytesIn += end - start
+        while start < end:
+            self.chip.clock(buf[start])
+            start += 1
+
+    def readinto(self, buf, start=0, end=None, write_value=0):
+        if end is None:
+            end = len(buf)
+        self.bytesOut += end - start
+        self.bytesIn += end - start
+        while start < end:
+            buf[start] = self.chip.clock(write_value)
+            start += 1
+
+    def write_readinto(self, buffer_out, buffer_in, out_start=0, out_end=None, in_start=0, in_end=None):
+        if out_end is None:
+            out_end = len(buffer_out)
+        if in_end is None:
+            in_end = len(buffer_in)
+        self.bytesOut += out_end - out_start
+        self.bytesIn += out_end - out_start
+        while out_start < out_end:
+            miso = self.chip.clock(buffer_out[out_start])
+            if in_start < in_end:
+                buffer_in[in_start] = miso
+            out_start += 1
+            in_start += 1
+
+
+class SimCC1101:
+    def __init__(self, air=None):
+        if air is None:
+            air = SimAir()
+        self.air = air
+        air.chips.append(self)
+        self.device = SimSPIDevice(self)
+        self.gdo0 = SimPin(self, IOCFG0)
+        self.gdo2 = SimPin(self, IOCFG2)
+
+        self.registers = bytearray(RESET_VALUES)
+        self.patable = bytearray(8)
+        self.rxFifo = bytearray()
+        self.txFifo = bytearray()
+        self.state = MARCSTATE_IDLE
+        self.transmitted = [] # frames sent by this radio (SimFrame)
+        self.received = 0 # packets received
+        self.lastStrobe = None
+        self.rxTime = 0.0 # total time spent in RX, for duty cycle measurements
+        self.wakeups = 0 # Wake-on-Radio Event0s
+        self._resetRadio(air.now())
+
+        self._header = None
+        self._address = 0
+        self._index = 0
+        self._sleepOnDeselect = False
+
+    def _resetRadio(self, now):
+        self.pending = None # (time, state) of a state transition in progress
+        self.worNext = None # next Wake-on-Radio Event0, None: WOR off
+        self.worTimeout = None # end of the current WOR RX window
+        self.rxEntered = None # time RX was entered
+        self.since = now # time the current state was entered
+        self.frame = None # SimFrame being transmitted
+        self.txStartAt = now
+        self.txCount = 0
+        self.txPrefix = 0
+        self.txFirst = 0
+        self.txCrc = 0xFFFF
+        self.txEnd = None
+        self.rxFrame = None # SimFrame being received, rxPos is the next byte in it
+        self.rxPos = 0
+        self.rxCount = 0
+        self.rxFirst = 0
+        self.rxIndex = 0 # bytes after the sync word, for dewhitening
+        self.rxCrc = 0xFFFF
+        self.rxCrcLeft = 0 # CRC bytes still to come
+        self.rxCrcValue = 0
+        self.rxSync = None # time the sync word of the current packet was received
+        self.rxDone = None # frame and position where the last packet ended
+        self.rxDonePos = 0
+        self.lastRssi = NOISE_FLOOR
+        self.lqi = 0
+        self.freqEst = 0
+        self.crcOk = False
+        self.crcFlag = False # GDOx 0x07, cleared by reading the RX FIFO
+
+    # configuration derived from the registers
+
+    def dataRate(self):
+        exponent = self.registers[MDMCFG4] & 0x0F
+        mantissa = self.registers[MDMCFG3]
+        return (256 + mantissa) * pow(2, exponent - 28) * FXOSC
+
+    def frequency(self):
+        word = self.registers[FREQ2] << 16 | self.registers[FREQ1] << 8 | self.registers[FREQ0]
+        spacing = (256 + self.registers[MDMCFG0]) * pow(2, self.registers[MDMCFG1] & 0x03) * FXOSC / pow(2, 18)
+        return word * FXOSC / 65536 + self.registers[CHANNR] * spacing
+
+    def bandwidth(self):
+        exponent = self.registers[MDMCFG4] >> 6
+        mantissa = (self.registers[MDMCFG4] >> 4) & 0x03
+        return FXOSC / (8 * (4 + mantissa) * pow(2, exponent))
+
+    def calibration(self):
+        # FSCAL3[3:0], FSCAL2[4:0], FSCAL1[5:0] a calibration at the current
+        # frequency produces (made up, but a different set per frequency)
+        word = int(self.frequency() * 65536 / FXOSC)
+        return (word >> 3) & 0x0F, (word >> 7) & 0x1F, (word >> 10) & 0x3F
+
+    def calibrate(self):
+        fscal3, fscal2, fscal1 = self.calibration()
+        self.registers[FSCAL3] = (self.registers[FSCAL3] & 0xF0) | fscal3
+        self.registers[FSCAL2] = (self.registers[FSCAL2] & 0xE0) | fscal2
+        self.registers[FSCAL1] = (self.registers[FSCAL1] & 0xC0) | fscal1
+
+    def locked(self):
+        # The synthesizer is on frequency only with calibration values that match it
+        fscal3, fscal2, fscal1 = self.calibration()
+        return (self.registers[FSCAL3] & 0x0F == fscal3 and self.registers[FSCAL2] & 0x1F == fscal2
+                and self.registers[FSCAL1] & 0x3F == fscal1)
+
+    def syncMode(self):
+        return self.registers[MDMCFG2] & 0x03 # the carrier sense bit does not matter here
+
+    def syncWord(self):
+        sync = bytes((self.registers[SYNC1], self.registers[SYNC0]))
+        if self.syncMode() == 3: # 30/32 sync word bits: the sync word twice
+            sync = sync + sync
+        return sync
+
+    def rxThreshold(self):
+        return 4 * ((self.registers[FIFOTHR] & 0x0F) + 1)
+
+    def txThreshold(self):
+        return 61 - 4 * (self.registers[FIFOTHR] & 0x0F)
+
+    def lengthConfig(self):
+        return self.registers[PKTCTRL0] & 0x03
+
+    def whitening(self):
+        return self.registers[PKTCTRL0] & 0x40
+
+    def crcEnabled(self):
+        return self.registers[PKTCTRL0] & 0x04 and self.lengthConfig() != 2
+
+    def addressOk(self, address):
+        check = self.registers[PKTCTRL1] & 0x03
+        return (check == 0 or address == self.registers[ADDR] or
+                (check >= 2 and address == 0x00) or (check == 3 and address == 0xFF))
+
+    def autocal(self):
+        return (self.registers[MCSM0] >> 4) & 0x03 == 1
+
+    def offMode(self, rx):
+        # state after a packet, MCSM1.RXOFF_MODE / TXOFF_MODE
+        if rx:
+            mode = (self.registers[MCSM1] >> 2) & 0x03
+        else:
+            mode = self.registers[MCSM1] & 0x03
+        return (MARCSTATE_IDLE, MARCSTATE_FSTXON, MARCSTATE_TX, MARCSTATE_RX)[mode]
+
+    # state machine
+
+    def sync(self):
+        return self.air.advance()
+
+    def setState(self, state, at):
+        if self.state == MARCSTATE_RX and self.rxEntered is not None and state != MARCSTATE_RX:
+            self.rxTime += at - self.rxEntered
+            self.rxEntered = None
+        if state == MARCSTATE_RX and self.state != MARCSTATE_RX:
+            self.rxEntered = at
+        self.state = state
+        self.since = at
+        self.pending = None
+        if state != MARCSTATE_RX:
+            self.rxFrame = None
+            self.rxSync = None
+        if state != MARCSTATE_TX:
+            self.frame = None
+            self.txEnd = None
+
+    def transition(self, state, at, calibrate=False):
+        # Go to state after the calibration / settling time
+        if calibrate:
+            self.calibrate()
+            delay = CALIBRATION_TIME
+            self.state = MARCSTATE_STARTCAL
+        elif self.state == MARCSTATE_IDLE:
+            delay = SETTLING_TIME
+            self.state = MARCSTATE_FS_LOCK
+        else:
+            delay = SWITCH_TIME
+            self.state = MARCSTATE_RXTX_SWITCH if state == MARCSTATE_TX else MARCSTATE_TXRX_SWITCH
+        self.frame = None
+        self.txEnd = None
+        self.rxFrame = None
+        self.rxSync = None
+        self.pending = (at + delay, state)
+
+    def advance(self, now):
+        while True:
+            if self.pending is not None and self.pending[0] <= now:
+                at, state = self.pending
+                self.setState(state, at)
+                continue
+            if self.worNext is not None and self._advanceWor(now):
+                continue
+            if self.state == MARCSTATE_TX and self._advanceTx(now):
+                continue
+            if self.state == MARCSTATE_RX and self._advanceRx(now):
+                continue
+            return
+
+    def packetComplete(self, count, first):
+        # count bytes of the packet went through the packet engine, first is its first byte
+        mode = self.lengthConfig()
+        if mode == 0:
+            return count % 256 == self.registers[PKTLEN]
+        if mode == 1:
+            return count == first + 1
+        return False
+
+    def worTiming(self):
+        registers = self.registers
+        return worTiming(registers[WOREVT1] << 8 | registers[WOREVT0], registers[WORCTRL], registers[MCSM2])
+
+    def _advanceWor(self, now):
+        # Wake-on-Radio: SLEEP until Event0, RX from Event1 on (after the
+        # calibration) until the RX timeout, unless a sync word was found, or a
+        # preamble is heard with RX_TIME_QUAL. Returns True if the state changed.
+        event0, event1, timeout = self.worTiming()
+        if self.state == MARCSTATE_SLEEP:
+            wake = self.worNext + event1
+            if wake > now:
+                return False
+            self.wakeups += 1
+            self.worNext += event0
+            self.setState(MARCSTATE_IDLE, wake)
+            self.transition(MARCSTATE_RX, wake, self.autocal())
+            self.worTimeout = None if timeout is None else self.pending[0] + timeout
+            return True
+        if self.worTimeout is None or self.state != MARCSTATE_RX:
+            return False
+        end = self.worTimeout
+        if self.rxFrame is None and end <= now:
+            self._advanceRx(end) # a sync word just before the timeout still counts
+        if self.rxFrame is not None:
+            self.worTimeout = None
+            return False
+        if end > now:
+            return False
+        if self.registers[MCSM2] & 0x08 and self.rssi(end) > NOISE_FLOOR: # RX_TIME_QUAL, preamble
+            self.worTimeout = None
+            return False
+        self.worTimeout = None
+        self.setState(MARCSTATE_SLEEP, end)
+        return True
+
+    def _advanceTx(self, now):
+        # Sends the bytes that are due by now, returns True if the state changed
+        if self.frame is None:
+            if not self.txFifo:
+                return False # sending preamble until there is data
+            # a new packet, preamble and sync word come from the packet engine
+            prefix = b""
+            if self.syncMode():
+                prefix = bytes([0xAA]) * NUM_PREAMBLE[(self.registers[MDMCFG1] >> 4) & 0x07] + self.syncWord()
+            start = max(self.since, self.txStartAt)
+            if start > now:
+                return False
+            self.frame = SimFrame(start, self.dataRate(), self.frequency() if self.locked() else None, -40, self, prefix)
+            self.air.frames.append(self.frame)
+            self.txPrefix = len(prefix)
+            self.txCount = 0
+            self.txCrc = 0xFFFF
+        frame = self.frame
+        while True:
+            if self.txEnd is not None:
+                if self.txEnd > now:
+                    return False
+                # the last byte is out
+                end = self.txEnd
+                frame.complete = True
+                self.transmitted.append(frame)
+                state = self.offMode(False)
+                if state == MARCSTATE_RX:
+                    self.setState(MARCSTATE_TX_END, end)
+                    self.transition(MARCSTATE_RX, end)
+                else:
+                    self.setState(MARCSTATE_TX_END, end)
+                    self.setState(state, end)
+                    self.txStartAt = end
+                return True
+            at = frame.start + len(frame.data) * frame.byteTime # the next byte starts here
+            if at > now:
+                return False
+            if not self.txFifo:
+                frame.complete = True
+                self.transmitted.append(frame)
+                self.setState(MARCSTATE_TXFIFO_UNDERFLOW, at)
+                return True
+            byte = self.txFifo.pop(0)
+            if self.txCount == 0:
+                self.txFirst = byte
+            if self.crcEnabled():
+                self.txCrc = crcUpdate(self.txCrc, byte)
+            white = self.whitening() and self.txCount < len(PN9) - 2
+            frame.data.append(byte ^ PN9[self.txCount] if white else byte)
+            self.txCount += 1
+            if self.packetComplete(self.txCount, self.txFirst):
+                if self.crcEnabled():
+                    for byte in (self.txCrc >> 8, self.txCrc & 0xFF):
+                        frame.data.append(byte ^ PN9[self.txCount] if self.whitening() else byte)
+                        self.txCount += 1
+                self.txEnd = frame.start + len(frame.data) * frame.byteTime
+
+    def matches(self, frame):
+        if frame.source is self or frame.frequency is None or not self.locked():
+            return False
+        if abs(frame.frequency - self.frequency()) > self.bandwidth() / 2:
+            return False
+        return abs(frame.rate - self.dataRate()) <= 0.1 * self.dataRate()
+
+    def _findSync(self, now):
+        # Earliest sync word received completely by now, that started after RX was entered
+        sync = self.syncWord() if self.syncMode() else b""
+        best = None
+        for frame in self.air.frames:
+            if not self.matches(frame):
+                continue
+            first = max(0, int((self.since - frame.start) / frame.byteTime + 0.999999))
+            if frame is self.rxDone:
+                first = max(first, self.rxDonePos)
+            if sync:
+                position = frame.data.find(sync, first)
+            else:
+                position = first if first < len(frame.data) else -1
+            if position < 0:
+                continue
+            at = frame.start + (position + len(sync)) * frame.byteTime
+            if at <= now and (best is None or at < best[0]):
+                best = (at, frame, position + len(sync))
+        return best
+
+    def _advanceRx(self, now):
+        # Receives the bytes that arrived by now, returns True if the state changed
+        if self.rxFrame is None:
+            found = self._findSync(now)
+            if found is None:
+                return False
+            self.rxSync, self.rxFrame, self.rxPos = found
+            self.rxCount = 0
+            self.rxIndex = 0
+            self.rxCrc = 0xFFFF
+            self.rxCrcLeft = 0
+            self.lastRssi = self.rxFrame.rssi
+        frame = self.rxFrame
+        while True:
+            if self.rxPos >= len(frame.data) and not frame.complete:
+                return False # waiting for the transmitter
+            at = frame.start + (self.rxPos + 1) * frame.byteTime
+            if at > now:
+                return False
+            # past the end of a frame the demodulator keeps going on noise
+            byte = frame.data[self.rxPos] if self.rxPos < len(frame.data) else 0x00
+            self.rxPos += 1
+            if self.whitening() and self.rxIndex < len(PN9):
+                byte ^= PN9[self.rxIndex]
+            self.rxIndex += 1
+            if self.rxCrcLeft:
+                self.rxCrcValue = (self.rxCrcValue << 8) | byte
+                self.rxCrcLeft -= 1
+                if not self.rxCrcLeft:
+                    self.endPacket(at, crcOk=self.rxCrcValue == self.rxCrc)
+                    return True
+                continue
+            if self.rxCount == 0 and self.lengthConfig() == 1 and byte > self.registers[PKTLEN]:
+                self.endPacket(at, discard=True) # longer than allowed, dropped
+                return True
+            if self.rxCount == (1 if self.lengthConfig() == 1 else 0) and not self.addressOk(byte):
+                # not for us: the packet is dropped and RX restarted
+                del self.rxFifo[len(self.rxFifo) - self.rxCount:]
+                self.endPacket(at, discard=True)
+                return True
+            if not self.pushRx(byte, at):
+                return True
+            if self.crcEnabled():
+                self.rxCrc = crcUpdate(self.rxCrc, byte)
+            self.rxCount += 1
+            if self.rxCount == 1:
+                self.rxFirst = byte
+            if self.packetComplete(self.rxCount, self.rxFirst):
+                if self.crcEnabled():
+                    self.rxCrcLeft = 2
+                    self.rxCrcValue = 0
+                    continue
+                self.endPacket(at)
+                return True
+
+    def pushRx(self, byte, at):
+        if len(self.rxFifo) >= 64:
+            self.setState(MARCSTATE_RXFIFO_OVERFLOW, at)
+            return False
+        self.rxFifo.append(byte)
+        return True
+
+    def endPacket(self, at, discard=False, crcOk=True):
+        frame = self.rxFrame
+        self.rxDone = frame
+        self.rxDonePos = self.rxPos
+        self.rxFrame = None
+        self.rxSync = None
+        if discard:
+            self.since = at
+            return
+        self.crcOk = crcOk # reads 1 with CRC disabled
+        self.lqi = min(0x7F, max(0, -20 - frame.rssi))
+        offset = int(round((frame.frequency - self.frequency()) * 16384 / FXOSC))
+        self.freqEst = max(-128, min(127, offset)) & 0xFF
+        flushed = not crcOk and self.registers[PKTCTRL1] & 0x08 # CRC_AUTOFLUSH
+        if flushed:
+            self.rxFifo[:] = b""
+        else:
+            self.received += 1
+            self.crcFlag = True
+        if self.registers[PKTCTRL1] & 0x04 and not flushed: # APPEND_STATUS
+            if not (self.pushRx(self.rssiRegister(frame.rssi), at) and
+                    self.pushRx(self.lqi | (0x80 if self.crcOk else 0), at)):
+                return
+        self.worNext = None
+        self.worTimeout = None
+        state = self.offMode(True)
+        if state == MARCSTATE_RX:
+            self.since = at
+        elif state == MARCSTATE_TX:
+            self.setState(MARCSTATE_RX_END, at)
+            self.txStartAt = at
+            self.transition(MARCSTATE_TX, at)
+        else:
+            self.setState(state, at)
+
+    def rssiRegister(self, dbm):
+        return int((dbm + 74) * 2) & 0xFF
+
+    def rssi(self, now):
+        # strongest signal within the receive bandwidth right now, in dBm
+        level = NOISE_FLOOR
+        for frame in self.air.frames:
+            if frame.frequency is None or frame.source is self or frame.rssi <= level:
+                continue
+            if frame.start <= now and (not frame.complete or now < frame.end()):
+                if abs(frame.frequency - self.frequency()) <= self.bandwidth() / 2:
+                    level = frame.rssi
+        return level
+
+    def inPacket(self, now):
+        if self.state == MARCSTATE_RX:
+            return self.rxSync is not None
+        if self.state == MARCSTATE_TX and self.frame is not None:
+            return self.frame.start + self.txPrefix * self.frame.byteTime <= now
+        return False
+
+    def gdo(self, iocfg):
+        config = self.registers[iocfg]
+        signal = config & 0x3F
+        if signal == 0x00:
+            value = len(self.rxFifo) >= self.rxThreshold()
+        elif signal == 0x01:
+            value = len(self.rxFifo) >= self.rxThreshold() or (len(self.rxFifo) > 0 and self.rxFrame is None)
+        elif signal == 0x02:
+            value = len(self.txFifo) >= self.txThreshold()
+        elif signal == 0x03:
+            value = len(self.txFifo) >= 64
+        elif signal == 0x04:
+            value = self.state == MARCSTATE_RXFIFO_OVERFLOW
+        elif signal == 0x05:
+            value = self.state == MARCSTATE_TXFIFO_UNDERFLOW
+        elif signal == 0x06:
+            value = self.inPacket(self.air.now())
+        elif signal == 0x07:
+            value = self.crcFlag
+        elif signal == 0x0E:
+            value = self.state == MARCSTATE_RX and self.rssi(self.air.now()) > NOISE_FLOOR
+        else:
+            value = False # CHIP_RDYn (ready), high impedance, clock outputs ...
+        if config & 0x40: # GDOx_INV
+            value = not value
+        return value
+
+    # SPI
+
+    def select(self):
+        if self.state == MARCSTATE_SLEEP:
+            # CS low wakes the chip up, the test registers and PATABLE entries
+            # 1..7 lost their values
+            self.registers[FSTEST:TEST0 + 1] = RESET_VALUES[FSTEST:TEST0 + 1]
+            self.patable[1:] = bytes(7)
+            self.worNext = None
+            self.setState(MARCSTATE_IDLE, self.air.now())
+        self._header = None
+
+    def deselect(self):
+        self._header = None
+        if self._sleepOnDeselect:
+            self._sleepOnDeselect = False
+            self.rxFifo = bytearray()
+            self.txFifo = bytearray()
+            self.setState(MARCSTATE_SLEEP, self.air.now())
+
+    def statusByte(self, read):
+        if self.state in (MARCSTATE_SLEEP, MARCSTATE_XOFF):
+            return 0x80 # CHIP_RDYn high
+        state = STATUS_STATE.get(self.state, 5)
+        if read:
+            available = len(self.rxFifo)
+        else:
+            available = 64 - len(self.txFifo)
+        return state << 4 | min(available, 15)
+
+    def clock(self, mosi):
+        # One byte on the bus, returns the byte the chip puts on MISO
+        if self._header is None:
+            self.sync()
+            address = mosi & 0x3F
+            read = mosi & READ_SINGLE_BYTE
+            if SRES <= address <= SNOP and not mosi & WRITE_BURST:
+                self.strobe(address)
+                return self.statusByte(read)
+            self._header = mosi
+            self._address = address
+            self._index = 0
+            return self.statusByte(read)
+
+        header = self._header
+        address = self._address
+        index = self._index
+        self._index += 1
+        if not header & WRITE_BURST:
+            self._header = None # single access, the next byte is a new header
+        read = header & READ_SINGLE_BYTE
+
+        if address == PATABLE:
+            if read:
+                return self.patable[index % 8]
+            self.patable[index % 8] = mosi
+            return self.statusByte(read)
+        if address == TXFIFO:
+            self.sync()
+            if read:
+                self.crcFlag = False
+                return self.rxFifo.pop(0) if self.rxFifo else 0
+            if len(self.txFifo) < 64:
+                if self.state == MARCSTATE_TX and self.frame is None and not self.txFifo:
+                    self.txStartAt = max(self.txStartAt, self.air.now())
+                self.txFifo.append(mosi)
+            return self.statusByte(read)
+        if read and header & WRITE_BURST and SRES <= address <= SNOP:
+            # status registers are read with the burst bit, one byte per access
+            self._header = None
+            return self.readStatus(address | READ_BURST)
+        address += index
+        if address > TEST0:
+            return 0
+        if read:
+            return self.registers[address]
+        self.registers[address] = mosi
+        return self.statusByte(read)
+
+    def readStatus(self, address):
+        now = self.sync()
+        if address == PARTNUM:
+            return 0x00
+        if address == VERSION:
+            return 0x14
+        if address == MARCSTATE:
+            return self.state
+        if address == RSSI:
+            return self.rssiRegister(self.rssi(now) if self.state == MARCSTATE_RX else self.lastRssi)
+        if address == LQI:
+            return self.lqi | (0x80 if self.crcOk else 0)
+        if address == FREQEST:
+            return self.freqEst
+        if address == PKTSTATUS:
+            carrier = self.state == MARCSTATE_RX and self.rssi(now) > NOISE_FLOOR
+            return ((0x80 if self.crcOk else 0) | (0x40 if carrier else 0)
+                    | (0x08 if self.inPacket(now) else 0) | (0x04 if self.gdo(IOCFG2) else 0)
+                    | (0x01 if self.gdo(IOCFG0) else 0))
+        if address == TXBYTES:
+            return (0x80 if self.state == MARCSTATE_TXFIFO_UNDERFLOW else 0) | len(self.txFifo)
+        if address == RXBYTES:
+            return (0x80 if self.state == MARCSTATE_RXFIFO_OVERFLOW else 0) | len(self.rxFifo)
+        return 0
+
+    def strobe(self, address):
+        self.lastStrobe = address
+        now = self.air.now()
+        state = self.state
+        idle = state == MARCSTATE_IDLE
+        if address == SRES:
+            self.registers[:] = RESET_VALUES
+            self.rxFifo = bytearray()
+            self.txFifo = bytearray()
+            self._resetRadio(now)
+            self.state = MARCSTATE_IDLE
+        elif address == SIDLE:
+            self.worNext = None
+            self.worTimeout = None
+            self.setState(MARCSTATE_IDLE, now)
+        elif address == SWOR:
+            if idle:
+                self.worNext = now + self.worTiming()[0]
+                self.setState(MARCSTATE_SLEEP, now)
+        elif address == SWORRST:
+            if self.worNext is not None:
+                self.worNext = now + self.worTiming()[0]
+        elif address == SRX:
+            if state not in (MARCSTATE_RX, MARCSTATE_RXFIFO_OVERFLOW, MARCSTATE_TXFIFO_UNDERFLOW):
+                self.transition(MARCSTATE_RX, now, idle and self.autocal())
+        elif address == STX:
+            if state not in (MARCSTATE_TX, MARCSTATE_RXFIFO_OVERFLOW, MARCSTATE_TXFIFO_UNDERFLOW):
+                self.txStartAt = now
+                self.transition(MARCSTATE_TX, now, idle and self.autocal())
+        elif address == SFSTXON:
+            if idle or state == MARCSTATE_RX:
+                self.transition(MARCSTATE_FSTXON, now, idle and self.autocal())
+        elif address == SCAL:
+            if idle:
+                self.transition(MARCSTATE_IDLE, now, True)
+        elif address == SFRX:
+            if idle or state == MARCSTATE_RXFIFO_OVERFLOW:
+                self.rxFifo = bytearray()
+                self.setState(MARCSTATE_IDLE, now)
+        elif address == SFTX:
+            if idle or state == MARCSTATE_TXFIFO_UNDERFLOW:
+                self.txFifo = bytearray()
+                self.setState(MARCSTATE_IDLE, now)
+        elif address == SPWD:
+            if idle:
+                self._sleepOnDeselect = True
+        elif address == SXOFF:
+            if idle:
+                self.setState(MARCSTATE_XOFF, now)
+
+    # test helpers
+
+    def inject(self, data, rssi=-40, delay=0.0, preamble=4, frequency=None):
+        # Put a frame on the air at this radio's frequency (or frequency, in Hz)
+        # and data rate, starting delay seconds from now: preamble bytes of 0xAA,
+        # the configured sync word and data. Returns the SimFrame.
+        sync = self.syncWord() if self.syncMode() else b""
+        if frequency is None:
+            frequency = self.frequency()
+        frame = SimFrame(self.air.now() + delay, self.dataRate(), frequency, rssi,
+                         data=bytes([0xAA]) * preamble + sync + bytes(data), complete=True)
+        self.air.frames.append(frame)
+        self.air.frames.sort(key=lambda f: f.start)
+        return frame
+
+
+def simulatedRadio(frequency=434400000, syncword="666A", air=None, **kwargs):
+    # A CC1101 driver on a simulated chip, returns (radio, chip)
+    chip = SimCC1101(air)
+    radio = CC1101(None, None, chip.gdo0, 50000, frequency, syncword, device=chip.device, **kwargs)
+    return radio, chip
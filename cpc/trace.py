@@ -0,0 +1,190 @@
+# SPI tracing: records every register, FIFO and strobe access of a radio -
+# header byte, address, length, start time and duration - in a fixed size
+# ring, with call / byte / time counters and a latency histogram per method.
+#
+#   trace = SpiTrace(512)
+#   trace.attach(radio)
+#   radio.sendBytes(b"hello")
+#   trace.detach()
+#   print(trace.summary()["strobe"])
+#   with open("trace.csv", "w") as f:
+#       trace.dump(f)
+#
+# attach() shadows the radio's SPI methods with timing wrappers (instance
+# attributes), detach() removes them again. The CC1101 methods themselves are
+# not touched, so an untraced radio runs exactly the same code as before.
+# Records survive detach(), so start times count from SpiTrace() or reset(),
+# not from attach(); a trace attached again continues the same timeline.
+# The ring keeps start times modulo TICKS_PERIOD like time.ticks_us(), so they
+# fit an unsigned 32 bit array; records() unwraps them from the oldest record,
+# which is fine as long as two accesses are less than ~71 minutes apart.
+
+import time
+from array import array
+
+from cpc.cpc import *
+
+try:
+    from time import monotonic_ns
+except ImportError:
+    def monotonic_ns():
+        return int(time.monotonic() * 1000000000)
+
+# Traced methods, indexed by the kind stored in the ring
+TRACED = ("writeSingleByte", "readSingleByte", "readBurst", "readBurstInto", "writeBurst", "strobe")
+# Histogram bucket upper bounds in us, the last bucket takes everything longer
+HISTOGRAM_BOUNDS = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TICKS_PERIOD = 1 << 32 # stored start times wrap around after this many us
+
+
+class SpiTrace:
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.kinds = array('B', [0] * capacity) # index into TRACED
+        self.headers = array('B', [0] * capacity) # header byte on the bus
+        self.lengths = array('H', [0] * capacity) # data bytes after the header
+        self.starts = array('L', [0] * capacity) # us since the trace was created or reset(), modulo TICKS_PERIOD
+        self.durations = array('L', [0] * capacity) # us
+        self.head = 0 # next slot
+        self.count = 0 # records in the ring
+        self.overwritten = 0
+        self.base = 0 # unwrapped start of the oldest record in us
+        self.calls = array('L', [0] * len(TRACED))
+        self.bytes = array('L', [0] * len(TRACED))
+        self.time = array('L', [0] * len(TRACED)) # us
+        self.maxTime = array('L', [0] * len(TRACED))
+        self.histograms = [array('L', [0] * (len(HISTOGRAM_BOUNDS) + 1)) for _ in TRACED]
+        self.epoch = monotonic_ns()
+        self.radio = None
+
+    def reset(self):
+        self.head = self.count = self.overwritten = self.base = 0
+        for i in range(len(TRACED)):
+            self.calls[i] = self.bytes[i] = self.time[i] = self.maxTime[i] = 0
+            histogram = self.histograms[i]
+            for j in range(len(histogram)):
+                histogram[j] = 0
+        self.epoch = monotonic_ns()
+
+    def record(self, kind, header, length, started):
+        duration = (monotonic_ns() - started) // 1000
+        start = (started - self.epoch) // 1000
+        index = self.head
+        following = (index + 1) % self.capacity
+        if self.count == self.capacity:
+            # The oldest record goes, the one after it becomes the oldest
+            if following == index:
+                self.base = start
+            else:
+                self.base += (self.starts[following] - self.starts[index]) % TICKS_PERIOD
+            self.overwritten += 1
+        else:
+            if self.count == 0:
+                self.base = start
+            self.count += 1
+        self.kinds[index] = kind
+        self.headers[index] = header
+        self.lengths[index] = length
+        self.starts[index] = start % TICKS_PERIOD
+        self.durations[index] = duration
+        self.head = following
+        self.calls[kind] += 1
+        self.bytes[kind] += length
+        self.time[kind] += duration
+        if duration > self.maxTime[kind]:
+            self.maxTime[kind] = duration
+        bucket = 0
+        for bound in HISTOGRAM_BOUNDS:
+            if duration < bound:
+                break
+            bucket += 1
+        self.histograms[kind][bucket] += 1
+
+    def attach(self, radio):
+        # Trace radio's SPI accesses until detach()
+        if self.radio is not None:
+            raise RuntimeError("already attached")
+        cls = type(radio)
+        record = self.record
+
+        def writeSingleByte(address, byte_data):
+            started = monotonic_ns()
+            cls.writeSingleByte(radio, address, byte_data)
+            record(0, WRITE_SINGLE_BYTE | address, 1, started)
+
+        def readSingleByte(address):
+            started = monotonic_ns()
+            value = cls.readSingleByte(radio, address)
+            record(1, READ_SINGLE_BYTE | address, 1, started)
+            return value
+
+        def readBurst(start_address, length):
+            started = monotonic_ns()
+            value = cls.readBurst(radio, start_address, length)
+            record(2, READ_BURST | start_address, length, started)
+            return value
+
+        def readBurstInto(start_address, buf, length):
+            started = monotonic_ns()
+            cls.readBurstInto(radio, start_address, buf, length)
+            record(3, READ_BURST | start_address, length, started)
+
+        def writeBurst(address, data):
+            started = monotonic_ns()
+            cls.writeBurst(radio, address, data)
+            record(4, WRITE_BURST | address, len(data), started)
+
+        def strobe(address):
+            started = monotonic_ns()
+            status = cls.strobe(radio, address)
+            record(5, address, 0, started)
+            return status
+
+        wrappers = (writeSingleByte, readSingleByte, readBurst, readBurstInto, writeBurst, strobe)
+        for name, wrapper in zip(TRACED, wrappers):
+            setattr(radio, name, wrapper)
+        self.radio = radio
+
+    def detach(self):
+        # Back to the plain methods; the records are kept
+        radio = self.radio
+        if radio is not None:
+            for name in TRACED:
+                delattr(radio, name)
+            self.radio = None
+
+    def records(self):
+        # (start us, method, header, length, duration us) oldest first
+        start = (self.head - self.count) % self.capacity
+        started = self.base
+        previous = self.starts[start]
+        for i in range(self.count):
+            index = (start + i) % self.capacity
+            started += (self.starts[index] - previous) % TICKS_PERIOD
+            previous = self.starts[index]
+            yield (started, TRACED[self.kinds[index]], self.headers[index],
+                   self.lengths[index], self.durations[index])
+
+    def summary(self):
+        # Per method: calls, bytes, total / mean / max time in us and the
+        # histogram counts (bucket i: below HISTOGRAM_BOUNDS[i] us)
+        result = {}
+        for kind, name in enumerate(TRACED):
+            calls = self.calls[kind]
+            result[name] = {
+                "calls": calls,
+                "bytes": self.bytes[kind],
+                "time": self.time[kind],
+                "mean": self.time[kind] / calls if calls else 0.0,
+                "max": self.maxTime[kind],
+                "histogram": list(self.histograms[kind]),
+            }
+        return result
+
+    def dump(self, stream):
+        # The ring as CSV, e.g. for a spreadsheet; the address is the header
+        # byte without the read / burst bits
+        stream.write("start_us,method,header,address,length,duration_us\n")
+        for started, name, header, length, duration in self.records():
+            address = header if name == "strobe" else header & 0x3F
+            stream.write("%d,%s,0x%02X,0x%02X,%d,%d\n" % (started, name, header, address, length, duration))
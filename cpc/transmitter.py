@@ -0,0 +1,147 @@
+# Batched transmission: a queue of frames sent one after the other without
+# going back through IDLE. The TX FIFO is kept topped up across frame
+# boundaries, so the next frame is already loaded while the current one
+# drains, and the chip goes on by itself after every packet (MCSM1.TXOFF_MODE):
+# straight into the next one with gap 0 (TXOFF_MODE TX), or it waits in FSTXON
+# with the synthesizer running and STX starts the next frame after gap seconds.
+#
+#   tx = Transmitter(radio, gap=0.01)
+#   tx.add(b"\x12\x34\x56", repeat=8) # e.g. a key fob code, sent 8 times
+#   tx.run()
+#   print(tx.stats["framesPerSecond"], tx.stats["utilization"])
+#
+# Frames are framed like sendBytes() (add()) or sent as-is (addFrame()), up to
+# 255 bytes each; with gap 0 they must all have the same length, PKTLEN cannot
+# change between two packets the chip starts on its own.
+
+import time
+
+from cpc.cpc import *
+
+REFILL_LEVEL = 16 # TX FIFO bytes at which run() tops it up
+
+
+class Transmitter:
+    def __init__(self, radio, gap=0.0):
+        self.radio = radio
+        self.gap = gap
+        self.frames = []
+        self.stats = {"frames": 0, "bytes": 0, "underflows": 0, "elapsed": 0.0, "airtime": 0.0,
+                      "framesPerSecond": 0.0, "utilization": 0.0}
+
+    def add(self, payload, repeat=1, syncword=None):
+        # Queue payload as a sendBytes() frame (preamble, sync word, payload), repeat times
+        self.addFrame(self.radio.buildFrame(payload, syncword), repeat)
+
+    def addFrame(self, frame, repeat=1):
+        # Queue frame as-is, repeat times
+        if not 0 < len(frame) <= 255:
+            raise ValueError("frames are 1..255 bytes")
+        frame = bytes(frame)
+        for _ in range(repeat):
+            self.frames.append(frame)
+
+    def run(self):
+        # Send all queued frames. Returns the number sent; stats holds
+        # framesPerSecond and utilization (share of the time from the first STX
+        # to the end of the last frame that was air time).
+        frames = self.frames
+        if not frames:
+            return 0
+        gap = self.gap
+        if gap <= 0 and any(len(frame) != len(frames[0]) for frame in frames):
+            raise ValueError("back to back frames must have the same length")
+        radio = self.radio
+        stream = memoryview(b"".join(frames))
+        total = len(stream)
+        ends = [] # end offset of every frame in stream
+        end = 0
+        for frame in frames:
+            end += len(frame)
+            ends.append(end)
+        byteTime = 8 / radio.getSampleRate()
+
+        pktctrl0 = radio.getRegister(PKTCTRL0)
+        pktlen = radio.getRegister(PKTLEN)
+        mcsm1 = radio.getRegister(MCSM1)
+        last = len(frames) - 1
+        # gap 0: TXOFF_MODE TX until the last frame is on air, then IDLE so the
+        # chip stops after it instead of sending preamble
+        stopping = gap <= 0 and last == 0
+        radio.idle()
+        radio.strobe(SFTX)
+        radio.setRegister(PKTCTRL0, pktctrl0 & 0xFC) # fixed length
+        radio.setRegister(PKTLEN, len(frames[0]))
+        radio.setRegister(MCSM1, (mcsm1 & 0xFC) | (OFFMODE_FSTXON if gap > 0 else OFFMODE_IDLE if stopping else OFFMODE_TX))
+        radio.flush()
+
+        sent = 0
+        written = min(total, 64)
+        radio.writeBurst(TXFIFO, stream[:written])
+        started = time.monotonic()
+        radio.strobe(STX)
+        try:
+            while sent <= last:
+                try:
+                    queued = radio.txFifoBytes()
+                except RuntimeError: # TX FIFO underflow, the frame on air is broken off
+                    self.stats["underflows"] += 1
+                    break
+                out = written - queued # bytes that left the FIFO
+                if written < total and queued < 64:
+                    count = min(64 - queued, total - written)
+                    radio.writeBurst(TXFIFO, stream[written:written + count])
+                    written += count
+                    queued += count
+
+                if gap > 0:
+                    if out >= ends[sent]:
+                        # the frame is in the modulator, FSTXON at the end of the packet
+                        if not radio.waitForState(STATE_FSTXON, 4 * byteTime + 0.01):
+                            break
+                        sent += 1
+                        if sent > last:
+                            break
+                        ended = time.monotonic()
+                        radio.setRegister(PKTLEN, len(frames[sent]))
+                        radio.flush()
+                        wait = ended + gap - time.monotonic()
+                        if wait > 0:
+                            time.sleep(wait)
+                        radio.strobe(STX)
+                        continue
+                    pending = ends[sent] - out
+                else:
+                    while sent < last and out > ends[sent]:
+                        sent += 1 # the next frame has started
+                    if not stopping and sent == last:
+                        radio.setRegister(MCSM1, (mcsm1 & 0xFC) | OFFMODE_IDLE)
+                        radio.flush()
+                        stopping = True
+                    if stopping and out >= total:
+                        if not radio.waitForState(STATE_IDLE, 4 * byteTime + 0.01):
+                            break
+                        sent += 1
+                        break
+                    pending = total - out if stopping else ends[sent] + 1 - out
+                if written < total:
+                    pending = min(pending, queued - REFILL_LEVEL)
+                time.sleep(max(pending * byteTime, radio.pollMinDelay))
+        finally:
+            elapsed = time.monotonic() - started
+            radio.idle()
+            radio.strobe(SFTX)
+            radio.setRegister(PKTCTRL0, pktctrl0)
+            radio.setRegister(PKTLEN, pktlen)
+            radio.setRegister(MCSM1, mcsm1)
+            radio.flush()
+
+        stats = self.stats
+        stats["frames"] += sent
+        stats["bytes"] += ends[sent - 1] if sent else 0
+        stats["elapsed"] += elapsed
+        stats["airtime"] += (ends[sent - 1] if sent else 0) * byteTime
+        stats["framesPerSecond"] = stats["frames"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        stats["utilization"] = stats["airtime"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        del frames[:sent]
+        return sent
@@ -0,0 +1,172 @@
+# Wake-on-Radio: the CC1101 sleeps and wakes itself up every Event0 period to
+# listen for a short while (its RX polling sequence, SWOR), and the host only
+# wakes up when a packet is in the RX FIFO. For battery nodes that otherwise
+# sit in receiveData() with the radio in RX all the time.
+#
+#   wor = WakeOnRadio(radio, dutyCycle=0.01, latency=0.5)
+#   print(wor.current, wor.latency) # average A, worst case s until in RX
+#   length = wor.receive(buf, 20)
+#
+# Event0 (the wake-up period) is the longest the latency budget allows, the RX
+# timeout (MCSM2.RX_TIME) the one closest to the requested duty cycle. A
+# transmitter has to send a preamble that covers a whole period, see
+# sendWakeup(). With RX_TIME_QUAL set, the radio stays in RX past the timeout
+# while it hears a preamble.
+
+import time
+
+from cpc.cpc import *
+
+WOR_EVENT1_PERIODS = (4, 6, 8, 12, 16, 24, 32, 48) # WORCTRL.EVENT1, RC oscillator periods
+RX_TIMEOUT_FACTOR = (3.6058, 18.0288, 32.4519, 46.8750) # MCSM2.RX_TIME 0 per WOR_RES, us per EVENT0 at 26 MHz
+
+# Typical supply currents at 433 MHz and 3 V (datasheet), in A
+CURRENT_SLEEP_WOR = 0.0000005 # SLEEP with the RC oscillator running
+CURRENT_IDLE = 0.0017 # crystal oscillator running (Event1)
+CURRENT_CALIBRATION = 0.0084 # synthesizer calibration
+CURRENT_RX = 0.016
+
+CALIBRATION_TIME = 0.000721 # IDLE -> RX with FS_AUTOCAL
+
+
+def worTiming(worevt, worctrl, mcsm2, freq_xosc=26000000):
+    # (Event0 period, Event1 timeout, RX timeout) in seconds for the WOREVT1:0,
+    # WORCTRL and MCSM2 values; the RX timeout is None for RX_TIME 7 (none)
+    res = worctrl & 0x03
+    event0 = 750.0 / freq_xosc * worevt * pow(2, 5 * res)
+    event1 = 750.0 / freq_xosc * WOR_EVENT1_PERIODS[(worctrl >> 4) & 0x07]
+    rxTime = mcsm2 & 0x07
+    if rxTime == 7:
+        return event0, event1, None
+    timeout = worevt * RX_TIMEOUT_FACTOR[res] / pow(2, rxTime) * 26000000 / freq_xosc / 1000000
+    return event0, event1, timeout
+
+
+class WakeOnRadio:
+    def __init__(self, radio, dutyCycle, latency, event1=2, minRxTime=None, hostPoll=None, freq_xosc=26000000):
+        # dutyCycle: share of time in RX (0.0002 to 0.125), latency: longest
+        # time in s from the start of a transmission until the radio listens.
+        # event1: WORCTRL.EVENT1, crystal start-up time (8 RC periods, ~230 us).
+        # minRxTime: shortest RX window, by default 4 bytes of air time.
+        # hostPoll: how often receive() checks GDO0 without a sleep function, by
+        # default once per Event0 period.
+        self.radio = radio
+        if minRxTime is None:
+            minRxTime = radio.packetTime(4)
+        autocal = (radio.getRegister(MCSM0) >> 4) & 0x03
+        # FS_AUTOCAL 1: calibration on every wake-up, 3: every fourth
+        self.calibrationTime = CALIBRATION_TIME if autocal == 1 else CALIBRATION_TIME / 4 if autocal == 3 else 0.0
+        self.event1 = 750.0 / freq_xosc * WOR_EVENT1_PERIODS[event1]
+        budget = latency - self.event1 - self.calibrationTime
+        best = None
+        for res in range(4):
+            evt0 = int(budget * freq_xosc / 750.0 / pow(2, 5 * res))
+            if not 1 <= evt0 <= 0xFFFF:
+                continue
+            for rxTime in range(7):
+                event0, _, timeout = worTiming(evt0, res, rxTime, freq_xosc) # EVENT1 does not matter here
+                if timeout < minRxTime:
+                    continue
+                error = abs(timeout / event0 - dutyCycle)
+                if best is None or error < best[0]:
+                    best = (error, res, evt0, rxTime)
+        if best is None:
+            raise ValueError("no WOR setting meets the latency with an RX window of %.1f ms" % (minRxTime * 1000))
+        error, res, evt0, rxTime = best
+
+        self.registers = {
+            WOREVT1: evt0 >> 8,
+            WOREVT0: evt0 & 0xFF,
+            WORCTRL: event1 << 4 | 0x08 | res, # RC_PD 0 (RC oscillator on), RC_CAL
+            MCSM2: 0x08 | rxTime, # RX_TIME_QUAL: stay in RX while a preamble is heard
+        }
+        self.event0, _, self.rxTime = worTiming(evt0, self.registers[WORCTRL], self.registers[MCSM2], freq_xosc)
+        self.dutyCycle = self.rxTime / self.event0
+        # average supply current and worst case time until the radio is in RX
+        self.current = CURRENT_SLEEP_WOR + (self.event1 * CURRENT_IDLE + self.calibrationTime * CURRENT_CALIBRATION
+                                            + self.rxTime * CURRENT_RX) / self.event0
+        self.latency = self.event0 + self.event1 + self.calibrationTime
+        self.hostPoll = self.event0 if hostPoll is None else hostPoll
+        self.stats = {"packets": 0, "timeouts": 0}
+
+    def preambleBytes(self):
+        # Preamble a transmitter needs so that a wake-up falls into it
+        return int((self.latency + self.rxTime) * self.radio.getSampleRate() / 8) + 1
+
+    def receive(self, buf, length=None, timeout=None, sleep=None):
+        # Receive one fixed length packet (up to 64 bytes) in WOR mode. The host
+        # must not access the radio while it sleeps (CSn low wakes it up), so
+        # GDO0 is switched to "RX FIFO not empty / end of packet", which stays
+        # asserted until the FIFO is read, and polled every hostPoll seconds -
+        # or sleep(pin, timeout) is called, e.g. a light sleep until a PinAlarm,
+        # which returns early when the pin is asserted. Returns the number of
+        # bytes received, or None on timeout.
+        radio = self.radio
+        view = memoryview(buf)
+        if length is None:
+            length = len(view)
+        if length > 64:
+            raise ValueError("WOR packets must fit the RX FIFO")
+        saved = {}
+        for address in (IOCFG0, PKTCTRL1, PKTCTRL0, PKTLEN, MCSM1) + tuple(self.registers):
+            saved[address] = radio.getRegister(address)
+        radio.idle()
+        radio.strobe(SFRX)
+        for address in self.registers:
+            radio.setRegister(address, self.registers[address])
+        radio.setRegister(IOCFG0, 0x01)
+        if not saved[PKTCTRL1] & 0xE0:
+            # RX_TIME_QUAL needs a preamble quality threshold, PQT 0 always passes
+            radio.setRegister(PKTCTRL1, saved[PKTCTRL1] | 0x20)
+        radio.setRegister(PKTCTRL0, saved[PKTCTRL0] & 0xFC) # fixed length
+        radio.setRegister(PKTLEN, length)
+        radio.setRegister(MCSM1, saved[MCSM1] & 0xF3) # RXOFF_MODE IDLE
+        radio.flush()
+        radio.strobe(SWORRST)
+        radio.strobe(SWOR)
+
+        received = None
+        pollMaxDelay = radio.pollMaxDelay
+        try:
+            if sleep is not None:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while not radio.gdo0.value:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    sleep(radio.gdo0, remaining)
+                woke = radio.gdo0.value
+            else:
+                radio.pollMaxDelay = max(pollMaxDelay, self.hostPoll)
+                woke = radio.waitForPin(radio.gdo0, True, timeout)
+                radio.pollMaxDelay = pollMaxDelay
+            if woke:
+                # the radio is awake now; wait for the rest of the packet
+                end = time.monotonic() + 2 * radio.packetTime(length) + 0.01
+                while radio.rxFifoBytes() < length and time.monotonic() < end:
+                    time.sleep(radio.pollMinDelay)
+                if radio.rxFifoBytes() >= length:
+                    radio.readBurstInto(RXFIFO, view, length)
+                    received = length
+        finally:
+            radio.pollMaxDelay = pollMaxDelay
+            radio.idle()
+            radio.strobe(SFRX)
+            for address in saved:
+                radio.setRegister(address, saved[address])
+            radio.flush()
+        self.stats["packets" if received is not None else "timeouts"] += 1
+        return received
+
+
+def sendWakeup(radio, payload, wor, syncword=None):
+    # sendBytes() with a preamble long enough to wake up a receiver in the
+    # WakeOnRadio configuration wor
+    frame = radio.buildFrame(payload, syncword)
+    start = len(frame) - len(payload) - 2
+    preamble = max(wor.preambleBytes(), start)
+    data = bytearray(preamble + len(payload) + 2)
+    for i in range(preamble):
+        data[i] = 0xAA
+    data[preamble:] = memoryview(frame)[start:]
+    return radio.sendStream(data)